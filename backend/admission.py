@@ -0,0 +1,144 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+import orjson
+from cachetools import TTLCache
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, detail: str, retry_after: float, reason: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """At most `limit` requests at a time; up to `max_waiting` more wait up
+    to `timeout` seconds for a slot. Anything beyond is rejected at once,
+    so a burst cannot build an unbounded queue in front of Mongo."""
+
+    def __init__(self, limit: int, max_waiting: int, timeout: float, retry_after: float = 1):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                raise Rejected(503, "Server busy, please retry", self.retry_after, "queue_full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise Rejected(503, "Server busy, please retry", self.retry_after, "queue_timeout")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+class RateLimiter:
+    """Token bucket per key: `burst` requests at once, refilled at `rate`
+    per second. Buckets idle long enough to be full again are dropped."""
+
+    def __init__(self, rate: float, burst: int, maxsize: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = TTLCache(maxsize=maxsize, ttl=burst / rate)
+
+    def acquire(self, key) -> float:
+        """Take a token for `key`; 0 when allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+
+class AdmissionControl:
+    """Per-path concurrency limits and per-client rate limits."""
+
+    def __init__(self, limits: Optional[dict] = None, rate_limits: Optional[dict] = None):
+        # path -> ConcurrencyLimiter / RateLimiter
+        self.limits: dict[str, ConcurrencyLimiter] = limits or {}
+        self.rate_limits: dict[str, RateLimiter] = rate_limits or {}
+        # (path, reason) -> count, once per request and under the route it
+        # was made to: AdmissionMiddleware counts, not admit(), so a batch
+        # turned away by its sub-queries' search limit is one batch rejection
+        self.rejected: dict[tuple, int] = {}
+
+    @asynccontextmanager
+    async def admit(self, path: str, client: str):
+        rate_limit = self.rate_limits.get(path)
+        if rate_limit is not None:
+            retry_after = rate_limit.acquire(client)
+            if retry_after:
+                raise Rejected(429, "Too many requests, please retry", retry_after, "rate_limited")
+
+        limiter = self.limits.get(path)
+        if limiter is None:
+            yield
+            return
+        async with limiter.slot():
+            yield
+
+    def count_rejected(self, path: str, reason: str):
+        key = (path, reason)
+        self.rejected[key] = self.rejected.get(key, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            path: {"active": limiter.active, "waiting": limiter.waiting, "limit": limiter.limit}
+            for path, limiter in self.limits.items()
+        }
+
+
+class AdmissionMiddleware:
+    """Answers requests that AdmissionControl turns away with 429/503 and a
+    Retry-After header, before they reach the route."""
+
+    def __init__(self, app, control: AdmissionControl):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # The peer address; uvicorn replaces it with the X-Forwarded-For client
+        # only for proxies listed in FORWARDED_ALLOW_IPS
+        client = scope["client"][0] if scope.get("client") else ""
+        try:
+            async with self.control.admit(scope["path"], client):
+                await self.app(scope, receive, send)
+        except Rejected as e:
+            self.control.count_rejected(scope["path"], e.reason)
+            await send({
+                "type": "http.response.start",
+                "status": e.status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(max(1, math.ceil(e.retry_after))).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": orjson.dumps({"detail": e.detail})})
@@ -1,14 +1,109 @@
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
-from jose import jwt, JWTError
-from config import settings
+from cachetools import TLRUCache, TTLCache
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from config import get_settings
+from database import db
+from models import TokenData, UserInDB
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def _until_expiry(_token, payload, now):
+    # TLRUCache runs on time.monotonic(), exp is wall clock seconds
+    return now + (payload["exp"] - time.time())
+
+# Sized from the settings on first use, not when this module is imported
+@lru_cache
+def _verified_tokens() -> TLRUCache:
+    # token -> verified payload, dropped at the token's exp or by LRU
+    return TLRUCache(maxsize=get_settings().TOKEN_CACHE_MAXSIZE, ttu=_until_expiry)
+
+@lru_cache
+def _users() -> TTLCache:
+    # user_id -> UserInDB
+    settings = get_settings()
+    return TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+# lookups per cache, for /metrics
+_lookups = {"tokens": {"hits": 0, "misses": 0}, "users": {"hits": 0, "misses": 0}}
+
+def _cached(name: str, cache, key):
+    value = cache.get(key)
+    _lookups[name]["misses" if value is None else "hits"] += 1
+    return value
+
+def cache_stats() -> dict:
+    stats = {}
+    for name, cache in (("tokens", _verified_tokens()), ("users", _users())):
+        hits, misses = _lookups[name]["hits"], _lookups[name]["misses"]
+        stats[name] = {
+            "size": len(cache),
+            "maxsize": cache.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
+    return stats
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    # jose pulls in the crypto stack, only load it once a token is needed
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    settings = get_settings()
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def verify_access_token(token: str) -> TokenData:
+    payload = _cached("tokens", _verified_tokens(), token)
+    if payload is None:
+        from jose import jwt, JWTError
+        settings = get_settings()
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            raise credentials_exception
+        if payload.get("sub") is None or payload.get("exp") is None:
+            raise credentials_exception
+        _verified_tokens()[token] = payload
+
+    return TokenData(user_id=payload["sub"])
+
+def cache_user(user: UserInDB):
+    _users()[user.user_id] = user
+
+def invalidate_user(user_id: str):
+    _users().pop(user_id, None)
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> UserInDB:
+    if credentials is None:
+        raise credentials_exception
+
+    token_data = verify_access_token(credentials.credentials)
+
+    user = _cached("users", _users(), token_data.user_id)
+    if user is None:
+        if not db.client:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database not connected")
+
+        doc = await db.auth_db()["users"].find_one({"user_id": token_data.user_id})
+        if doc is None:
+            raise credentials_exception
+        user = UserInDB(**doc)
+        cache_user(user)
+
+    return user
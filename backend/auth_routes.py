@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+from fastapi import APIRouter, Depends, HTTPException, status
+from auth import cache_user, create_access_token, get_current_user
+from config import get_settings
+from database import db
+from google_auth import looks_like_jwt
+from models import GoogleAuthRequest, Token, User, UserInDB
+import services
+
+router = APIRouter()
+
+@router.get("/users/me", response_model=User)
+async def read_current_user(user: UserInDB = Depends(get_current_user)):
+    return user
+
+@router.post("/auth/guest", response_model=Token)
+async def guest_auth():
+    user_id = str(uuid4())
+    current_time = datetime.now(timezone.utc)
+    
+    user_in_db = UserInDB(
+        user_id=user_id,
+        email=None,
+        display_name="Guest User",
+        is_guest=True,
+        created_at=current_time
+    )
+    
+    # Insert user into database
+    if not db.client:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database not connected")
+        
+    if get_settings().GUEST_WRITE_MODE == "write_behind":
+        try:
+            await services.guest_writer.put(user_in_db.model_dump())
+        except asyncio.TimeoutError:
+            # Queue stayed full: shed load rather than pile up sign-ins
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-ins, please retry",
+                headers={"Retry-After": "1"},
+            )
+        # The row may not be flushed yet, let get_current_user find it anyway
+        cache_user(user_in_db)
+    else:
+        await db.auth_db()["users"].insert_one(user_in_db.model_dump())
+    
+    # Create access token
+    access_token = create_access_token(data={"sub": user_id, "is_guest": True})
+    
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        user=user_in_db
+    )
+
+@router.post("/auth/google", response_model=Token)
+async def google_auth(request: GoogleAuthRequest):
+    if not db.client:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database not connected")
+
+    # Real Google Verification Logic
+    token = request.token
+    
+    try:
+        if looks_like_jwt(token):
+            # ID token: signature, audience (GOOGLE_CLIENT_ID), issuer and expiry
+            # are checked locally against Google's cached signing keys
+            user_info = await services.google_verifier.verify_id_token(token)
+        else:
+            # Verify the access token by calling Google's userinfo endpoint
+            user_info = await services.google_verifier.userinfo(token)
+        
+        google_id = user_info.get('sub')
+        email = user_info.get('email')
+        display_name = user_info.get('name', 'Google User')
+        
+    except ValueError as e:
+        # Invalid token
+        raise HTTPException(status_code=400, detail=f"Invalid Google token: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Google authentication failed: {str(e)}")
+
+    # Check if user exists
+    user = await db.auth_db()["users"].find_one({"google_id": google_id})
+
+    if user:
+        user_in_db = UserInDB(**user)
+    else:
+        # Create new user
+        current_time = datetime.now(timezone.utc)
+        user_id = str(uuid4())
+        
+        user_in_db = UserInDB(
+            user_id=user_id,
+            email=email,
+            display_name=display_name,
+            is_guest=False,
+            created_at=current_time,
+            google_id=google_id
+        )
+        await db.auth_db()["users"].insert_one(user_in_db.model_dump())
+
+    # Create access token
+    access_token = create_access_token(data={"sub": user_in_db.user_id, "is_guest": False})
+
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        user=user_in_db
+    )
@@ -1,6 +1,7 @@
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
+from indexes import missing_indexes, required_indexes
 import os
 
 # Ensure we use the same environment variables as the app
@@ -53,6 +54,13 @@ async def check_db():
             print("   ❌ Missing '2dsphere' index on 'location'! Geospatial queries will fail.")
             print("   💡 Run 'seed_db.py' (it usually creates indexes) or create it manually.")
 
+        # 4. Everything the API creates at startup
+        missing = await missing_indexes(db, required_indexes(settings.SEARCH_MENU_LAYOUT))
+        if missing:
+            print(f"   ❌ Missing required indexes: {', '.join(missing)} (created when the API starts)")
+        else:
+            print("   ✅ All required indexes found.")
+
     except Exception as e:
         print(f"❌ Error: {e}")
     finally:
@@ -1,3 +1,5 @@
+from functools import lru_cache
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 
 # Settings configuration
@@ -7,10 +9,118 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    # MongoDB connection pool (PyMongo client options, None keeps the driver default)
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    # Connections opened at startup so the first requests after a deploy don't wait
+    MONGO_WARMUP_CONNECTIONS: int = 10
+    # Read routing: search may go to secondaries, auth reads its own writes
+    SEARCH_READ_PREFERENCE: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] = "primary"
+    SEARCH_MAX_STALENESS_SECONDS: int = -1
+    AUTH_READ_PREFERENCE: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] = "primary"
+    # Background health monitor behind /livez, /readyz and /healthz
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 5
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2
+    # Not ready once this share of a server's pool is checked out
+    HEALTH_POOL_SATURATION: float = 0.9
+    # Prometheus /metrics, request timing middleware and Mongo command timings.
+    # Off by default: /metrics is unauthenticated, so only turn it on where the
+    # port is reachable by the scraper alone (e.g. behind the proxy's allowlist)
+    METRICS_ENABLED: bool = False
+    # Searches at least this slow (0 disables) are kept for /admin/slow-queries,
+    # with an explain("executionStats") summary of the query they ran
+    SLOW_SEARCH_THRESHOLD_MS: float = 500
+    SLOW_SEARCH_LOG_SIZE: int = 100
+    SLOW_SEARCH_EXPLAIN: bool = True
+    # Sent as X-Admin-Token; admin endpoints are off while unset
+    ADMIN_TOKEN: Optional[str] = None
+    # Honour the X-Profile: 1 request header (cProfile report instead of the body)
+    # on requests that also send X-Admin-Token; ignored while ADMIN_TOKEN is unset
+    PROFILING_ENABLED: bool = False
+    # Admission control: requests to a path beyond its concurrency limit wait
+    # (at most ADMISSION_MAX_WAITING of them, for ADMISSION_QUEUE_TIMEOUT_SECONDS),
+    # the rest get 503 + Retry-After instead of queueing for the Mongo pool.
+    # Every batch sub-query also takes a /restaurants/search slot
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: dict[str, int] = {
+        "/restaurants/search": 64,
+        "/restaurants/search/batch": 16,
+        "/auth/guest": 32,
+        "/auth/google": 32,
+    }
+    ADMISSION_MAX_WAITING: int = 100
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2
+    ADMISSION_RETRY_AFTER_SECONDS: float = 1
+    # Token bucket per client IP for /auth/guest, which inserts a user per call.
+    # Off (None) until FORWARDED_ALLOW_IPS trusts the proxy in front of the app,
+    # otherwise every visitor shares the proxy's address and so one bucket
+    GUEST_AUTH_RATE_PER_SECOND: Optional[float] = None
+    GUEST_AUTH_BURST: int = 10
+    # Proxies whose X-Forwarded-For is trusted for the client address
+    # (uvicorn's forwarded_allow_ips; "*" when only the proxy can reach the app)
+    FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    # Already-verified access tokens (entries never outlive the token's exp)
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    # User documents loaded for authenticated requests
+    USER_CACHE_TTL_SECONDS: float = 30
+    USER_CACHE_MAXSIZE: int = 10000
+
+    # Guest users: "sync" inserts before returning the token, "write_behind"
+    # queues them for batched insert_many (lost if the process dies first)
+    GUEST_WRITE_MODE: Literal["sync", "write_behind"] = "sync"
+    GUEST_WRITE_QUEUE_SIZE: int = 1000
+    GUEST_WRITE_BATCH_SIZE: int = 100
+    GUEST_WRITE_FLUSH_SECONDS: float = 0.05
+    GUEST_WRITE_ENQUEUE_TIMEOUT_SECONDS: float = 1
+
+    # Google sign-in; userinfo lookups use a pooled async client + short-lived cache
     GOOGLE_CLIENT_ID: str
+    GOOGLE_USERINFO_URL: str = "https://www.googleapis.com/oauth2/v3/userinfo"
+    GOOGLE_HTTP_TIMEOUT_SECONDS: float = 5
+    GOOGLE_HTTP_MAX_CONNECTIONS: int = 20
+    GOOGLE_USERINFO_CACHE_TTL_SECONDS: float = 60
+    GOOGLE_USERINFO_CACHE_MAXSIZE: int = 1024
+    # ID tokens are verified locally against Google's cached signing keys
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v3/certs"
+    GOOGLE_JWKS_MIN_REFRESH_SECONDS: float = 60
+
+    # Search: use the $geoNear aggregation instead of $near + Python filtering
+    SEARCH_USE_AGGREGATION: bool = True
+    # "normalized" resolves geo hits first, then fetches qualifying items from
+    # the menu_items collection (rebuilt by every import, or migrate_menu_items.py)
+    SEARCH_MENU_LAYOUT: Literal["embedded", "normalized"] = "embedded"
+    # Serve search from an in-memory index; False falls back to the Mongo query
+    SEARCH_INDEX_ENABLED: bool = False
+    SEARCH_INDEX_REFRESH_SECONDS: float = 60
+    # Map the index from this snapshot file (written by snapshot.py or the
+    # first worker) so every worker shares one copy; None builds it per process
+    SEARCH_SNAPSHOT_PATH: Optional[str] = None
+    # Pagination / NDJSON streaming
+    SEARCH_MAX_PAGE_SIZE: int = 500
+    SEARCH_STREAM_BATCH_SIZE: int = 100
+    # Result cache: searches in one cell of a SEARCH_CACHE_GRID_DEGREES grid
+    # share the cell's candidates (opt-in)
+    SEARCH_CACHE_ENABLED: bool = False
+    SEARCH_CACHE_MAXSIZE: int = 10000
+    SEARCH_CACHE_TTL_SECONDS: float = 60
+    SEARCH_CACHE_GRID_DEGREES: float = 0.001
+    SEARCH_CACHE_VERSION_POLL_SECONDS: float = 5
+    # POST /restaurants/search/batch
+    SEARCH_BATCH_MAX_QUERIES: int = 1000
+    SEARCH_BATCH_CONCURRENCY: int = 16
 
     class Config:
         env_file = ".env"
 
-# Initialize settings
-settings = Settings()
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+def __getattr__(name):
+    # `from config import settings` still works, but the environment is read
+    # on first use rather than as a side effect of importing this module
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
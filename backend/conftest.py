@@ -0,0 +1,59 @@
+import asyncio
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, Header, HTTPException, Response
+from google_auth import GoogleVerifier
+
+
+@pytest.fixture
+def google():
+    """Local stand-in for Google's userinfo and certs endpoints.
+
+    `state.users` maps access tokens to userinfo, `state.keys` holds the
+    (pem, public_jwk) pairs served as JWKS. `state.delay` slows userinfo
+    down, `state.max_age` is the certs' Cache-Control max-age and
+    `state.calls` counts requests.
+    """
+    google = FastAPI()
+    google.state.users = {
+        "good-token": {"sub": "1234567890", "email": "jane@example.com", "name": "Jane Doe"},
+    }
+    google.state.keys = []
+    google.state.delay = 0.0
+    google.state.max_age = 3600
+    google.state.calls = 0
+
+    @google.get("/oauth2/v3/userinfo")
+    async def userinfo(authorization: str = Header(...)):
+        google.state.calls += 1
+        await asyncio.sleep(google.state.delay)
+        token = authorization.removeprefix("Bearer ")
+        if token not in google.state.users:
+            raise HTTPException(status_code=401, detail="invalid_token")
+        return google.state.users[token]
+
+    @google.get("/oauth2/v3/certs")
+    async def certs(response: Response):
+        google.state.calls += 1
+        response.headers["Cache-Control"] = f"public, max-age={google.state.max_age}, must-revalidate"
+        return {"keys": [public_jwk for _, public_jwk in google.state.keys]}
+
+    return google
+
+
+@pytest_asyncio.fixture
+async def make_verifier(google):
+    """Build GoogleVerifiers talking to the `google` fixture; closed after the test."""
+    verifiers = []
+
+    def make(**kwargs):
+        verifier = GoogleVerifier(userinfo_url="http://google.test/oauth2/v3/userinfo",
+                                  certs_url="http://google.test/oauth2/v3/certs", **kwargs)
+        verifier.open(timeout=2, transport=httpx.ASGITransport(app=google))
+        verifiers.append(verifier)
+        return verifier
+
+    yield make
+    for verifier in verifiers:
+        await verifier.close()
@@ -0,0 +1,74 @@
+import asyncio
+from typing import TYPE_CHECKING
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from config import get_settings
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(mode: str, max_staleness: int = -1):
+    if mode == "primary":
+        # Staleness only applies to modes that may read from secondaries
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+
+def create_client(event_listeners=()) -> "AsyncIOMotorClient":
+    # Motor is imported with the first client, not with this module
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    settings = get_settings()
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "event_listeners": list(event_listeners),
+    }
+    if settings.MONGO_MAX_IDLE_TIME_MS is not None:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    return AsyncIOMotorClient(settings.MONGODB_URI, **options)
+
+
+async def warm_up(client: "AsyncIOMotorClient", connections: int, read_preferences=(Primary(),)):
+    # Concurrent pings each check out their own connection, so this leaves
+    # up to `connections` open sockets in the pool of every server the
+    # given read preferences route to
+    pings = [
+        client.admin.command("ping", read_preference=preference)
+        for preference in {repr(p): p for p in read_preferences}.values()
+        for _ in range(connections)
+    ]
+    await asyncio.gather(*pings)
+
+
+# Database setup
+class Database:
+    client: "AsyncIOMotorClient" = None
+    # Search is read-only and may be served by secondaries; auth reads the
+    # users it just wrote, so it stays on the primary by default
+    search_read_preference = Primary()
+    auth_read_preference = Primary()
+
+    def search_db(self):
+        return self.client[get_settings().DB_NAME].with_options(read_preference=self.search_read_preference)
+
+    def auth_db(self):
+        return self.client[get_settings().DB_NAME].with_options(read_preference=self.auth_read_preference)
+
+db = Database()
+
+def __getattr__(name):
+    # Settings are read on first use, not when this module is imported
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+
+# The restaurant dataset carries a version counter that every writer
+# (seed_db.py, importers, sync jobs) bumps, so in-process indexes and
+# caches can tell when they are stale.
+META_COLLECTION = "meta"
+RESTAURANTS_DATASET = "restaurants"
+
+
+async def get_dataset_version(database, name: str = RESTAURANTS_DATASET):
+    doc = await database[META_COLLECTION].find_one({"_id": name})
+    if not doc:
+        return None
+    return doc.get("version")
+
+
+async def bump_dataset_version(database, name: str = RESTAURANTS_DATASET) -> int:
+    doc = await database[META_COLLECTION].find_one_and_update(
+        {"_id": name},
+        {
+            "$inc": {"version": 1},
+            "$set": {"updated_at": datetime.now(timezone.utc)},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"]
@@ -0,0 +1,306 @@
+"""Restaurant factory and in-memory Motor stand-ins shared by the tests and
+the load test's memory backend (memory_db.py)."""
+import asyncio
+from types import SimpleNamespace
+from bson import ObjectId
+from pymongo import DeleteMany, IndexModel, ReplaceOne
+from pymongo.errors import AutoReconnect, BulkWriteError, OperationFailure
+from dataset import META_COLLECTION, RESTAURANTS_DATASET
+from search import apply_projection, distance_meters, to_miles
+
+LA = (34.052235, -118.243683)
+
+
+def make_restaurant(name, lat, lng, *calories, **fields):
+    """A restaurant as stored in Mongo with one menu item per calorie value
+    (None for an item without one); protein follows calories. `fields` are
+    added to the document."""
+    return {
+        **fields,
+        "_id": ObjectId(),
+        "name": name,
+        "latitude": lat,
+        "longitude": lng,
+        "location": {"type": "Point", "coordinates": [lng, lat]},
+        "menu_items": [
+            {"name": f"{name}-{i}", "calories": c, "protein_g": None if c is None else c / 20}
+            for i, c in enumerate(calories)
+        ],
+    }
+
+
+def matches(doc, query):
+    # The query subset the tests need: $or, $gt, $gte, $lte, $in and
+    # equality; like Mongo, a missing field satisfies no range
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict):
+            if "$in" in condition and doc.get(field) not in condition["$in"]:
+                return False
+            bounds = [(op, condition[op]) for op in ("$gt", "$gte", "$lte") if op in condition]
+            if bounds and doc.get(field) is None:
+                return False
+            for op, bound in bounds:
+                value = doc[field]
+                if not (value > bound if op == "$gt" else value >= bound if op == "$gte" else value <= bound):
+                    return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+def project(doc, projection):
+    # Inclusion projections, optionally with {"_id": 0}
+    paths = [path for path, include in (projection or {}).items() if include and path != "_id"]
+    doc = apply_projection(doc, paths) if paths else dict(doc)
+    if projection and not projection.get("_id", 1):
+        doc.pop("_id", None)
+    return doc
+
+
+# Just enough of a Motor database for GeoIndex.load, dataset versions, paged
+# $geoNear searches, the importer and index management
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.closed = False
+
+    async def to_list(self, length=None):
+        return [dict(doc) for doc in self.docs]
+
+    def batch_size(self, size):
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCollection:
+    """Documents in a list. Writes the tests check are logged to
+    `database.events` and insert_many batch sizes to `batches`. `delay`
+    slows insert_many down, its first `fail_inserts` calls fail as if the
+    connection dropped and restaurant_ids or user_ids in `reject` fail as
+    duplicates; `fail_indexes` fails create_indexes."""
+
+    def __init__(self, docs=(), name="restaurants", database=None, delay=0.0, reject=(), fail_inserts=0,
+                 fail_indexes=False):
+        self.docs = list(docs)
+        self.name = name
+        self.database = database
+        self.delay = delay
+        self.reject = set(reject)
+        self.fail_inserts = fail_inserts
+        self.fail_indexes = fail_indexes
+        self.batches = []
+        # In the shape pymongo's index_information() returns
+        self.info = {"_id_": {"key": [("_id", 1)], "v": 2}}
+        self.finds = 0
+        self.pipelines = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _log(self, *event):
+        if self.database is not None:
+            self.database.events.append(event)
+
+    def find(self, query=None, projection=None):
+        self.finds += 1
+        return FakeCursor([project(doc, projection) for doc in self.docs if matches(doc, query or {})])
+
+    async def find_one(self, query):
+        return next((dict(doc) for doc in self.docs if matches(doc, query)), None)
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        # Only used to bump dataset versions: $inc / $set on one document
+        self._log("bump", query["_id"])
+        if not self.docs:
+            self.docs.append(dict(query))
+        doc = self.docs[0]
+        for field, step in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + step
+        doc.update(update.get("$set", {}))
+        return dict(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        if self.fail_inserts:
+            self.fail_inserts -= 1
+            raise AutoReconnect("network hiccup")
+        self.batches.append(len(docs))
+        # The unique keys of the restaurants and users collections
+        accepted = [doc for doc in docs if doc.get("restaurant_id", doc.get("user_id")) not in self.reject]
+        for doc in accepted:
+            # pymongo fills in missing _ids on the documents passed in
+            doc.setdefault("_id", ObjectId())
+        self.docs.extend(accepted)
+        if len(accepted) < len(docs):
+            raise BulkWriteError({
+                "nInserted": len(accepted),
+                "writeErrors": [{"code": 11000}] * (len(docs) - len(accepted)),
+            })
+        return SimpleNamespace(inserted_ids=[None] * len(docs))
+
+    async def bulk_write(self, requests, ordered=True):
+        # ReplaceOne upserts keyed on restaurant_id and DeleteMany by _id
+        assert ordered is False
+        result = SimpleNamespace(upserted_count=0, matched_count=0, deleted_count=0)
+        for request in requests:
+            if isinstance(request, ReplaceOne):
+                restaurant_id = request._filter["restaurant_id"]
+                self._log("replace", restaurant_id)
+                found = [i for i, doc in enumerate(self.docs) if doc["restaurant_id"] == restaurant_id]
+                if found:
+                    self.docs[found[0]] = dict(request._doc, _id=self.docs[found[0]]["_id"])
+                    result.matched_count += 1
+                else:
+                    self.docs.append(dict(request._doc, _id=ObjectId()))
+                    result.upserted_count += 1
+            elif isinstance(request, DeleteMany):
+                doomed = request._filter["_id"]["$in"]
+                kept = [doc for doc in self.docs if doc["_id"] not in doomed]
+                result.deleted_count += len(self.docs) - len(kept)
+                self.docs = kept
+        return result
+
+    def aggregate(self, pipeline):
+        """$geoNear (near, maxDistance, minDistance), $match, the
+        distance_miles $set, $project and $unset; the other stages are
+        skipped. Like Mongo, nothing orders restaurants at the same
+        distance: they keep insertion order."""
+        self.pipelines.append(pipeline)
+        docs = self.docs
+        for stage in pipeline:
+            if "$geoNear" in stage:
+                spec = stage["$geoNear"]
+                lng, lat = spec["near"]["coordinates"]
+                found = []
+                for doc in docs:
+                    distance = distance_meters(lat, lng, doc["location"]["coordinates"])
+                    if spec.get("minDistance", 0) <= distance <= spec["maxDistance"]:
+                        found.append(dict(doc, **{spec["distanceField"]: distance}))
+                docs = sorted(found, key=lambda doc: doc[spec["distanceField"]])
+            elif "$match" in stage:
+                docs = [doc for doc in docs if matches(doc, stage["$match"])]
+            elif "distance_miles" in stage.get("$set", {}):
+                docs = [dict(doc, distance_miles=to_miles(doc["_distance"])) for doc in docs]
+            elif "$project" in stage:
+                docs = [project(doc, stage["$project"]) for doc in docs]
+            elif "$unset" in stage:
+                hidden = stage["$unset"]
+                hidden = [hidden] if isinstance(hidden, str) else hidden
+                docs = [{key: value for key, value in doc.items() if key not in hidden} for doc in docs]
+        return FakeCursor(docs)
+
+    async def create_indexes(self, models):
+        if self.fail_indexes:
+            raise OperationFailure("E11000 duplicate key error")
+        for model in models:
+            spec = dict(model.document)
+            name = spec.pop("name")
+            spec["key"] = list(spec["key"].items())
+            self.info[name] = spec
+
+    async def create_index(self, keys, **options):
+        await self.create_indexes([IndexModel(keys, **options)])
+
+    async def index_information(self):
+        return self.info
+
+    async def drop(self):
+        self._log("drop", self.name)
+        self.docs = []
+
+    async def rename(self, new_name, dropTarget=False):
+        assert dropTarget
+        self._log("rename", self.name, new_name)
+        del self.database[self.name]
+        self.database[new_name] = self
+        self.name = new_name
+
+
+class FakeAdmin:
+    """The admin database's ping. Each command takes `delay` seconds, then
+    raises `error` if set; concurrency and read preferences are recorded."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.error = None
+        self.pings = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.preferences = []
+
+    async def command(self, name, read_preference=None):
+        self.pings += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.preferences.append(read_preference)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.error:
+            raise self.error
+        return {"ok": 1}
+
+
+class FakeClient(dict):
+    """Databases are created on first use; `delay` slows down pings."""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.admin = FakeAdmin(delay)
+
+    def __missing__(self, name):
+        self[name] = FakeDatabase()
+        return self[name]
+
+    def close(self):
+        pass
+
+
+class FakeDatabase(dict):
+    """Collections are created on first use, with `options` passed to each.
+    `restaurants` and the meta document holding the dataset version
+    (version None leaves meta empty) can be filled in up front. Commands
+    are recorded in `commands` and answered with `explain` (refused when
+    None) after the `delay` option."""
+
+    def __init__(self, restaurants=(), version=None, explain=None, **options):
+        super().__init__()
+        self.options = options
+        self.explain = explain
+        self.commands = []
+        self.events = []
+        self["restaurants"].docs.extend(restaurants)
+        if version is not None:
+            self[META_COLLECTION].docs.append({"_id": RESTAURANTS_DATASET, "version": version})
+
+    def __missing__(self, name):
+        self[name] = FakeCollection(name=name, database=self, **self.options)
+        return self[name]
+
+    def with_options(self, **options):
+        return self
+
+    async def command(self, command):
+        self.commands.append(command)
+        await asyncio.sleep(self.options.get("delay", 0.0))
+        if self.explain is None:
+            raise OperationFailure("explain not allowed")
+        return self.explain
@@ -0,0 +1,141 @@
+import asyncio
+from typing import Optional
+import numpy as np
+from dataset import get_dataset_version
+from menu_store import MenuStore
+from search import EARTH_RADIUS_METERS, apply_projection, to_miles
+
+
+def haversine_meters(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray,
+                     cos_lats: Optional[np.ndarray] = None) -> np.ndarray:
+    # lat/lng in degrees, lats/lngs arrays already in radians
+    lat = np.radians(lat)
+    lng = np.radians(lng)
+    if cos_lats is None:
+        cos_lats = np.cos(lats)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * cos_lats * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _lowest_first(values: np.ndarray, limit: Optional[int] = None) -> np.ndarray:
+    """Indexes of the `limit` smallest values, smallest first.
+
+    Stable, so equal values keep their incoming (distance, _id) order. With
+    a limit only the candidates up to the k-th smallest value are sorted.
+    """
+    candidates = np.arange(len(values))
+    if limit is not None and limit < len(values):
+        threshold = np.partition(values, limit - 1)[limit - 1]
+        candidates = np.flatnonzero(values <= threshold)
+    order = candidates[np.argsort(values[candidates], kind="stable")]
+    return order[:limit]
+
+
+class GeoIndex:
+    """In-memory restaurant catalogue with coordinates held in NumPy arrays.
+
+    Answers radius searches with one vectorized haversine pass instead of a
+    $near round trip, and nutrient filters through a MenuStore built over the
+    same documents. Documents keep `_id` as stored, for continuation tokens;
+    ties are ordered on its string form in `ids`.
+    """
+
+    def __init__(self, docs, version=None):
+        self.version = version
+        self.docs = []
+        coordinates = []
+        for doc in docs:
+            coords = (doc.get("location") or {}).get("coordinates")
+            if not coords or len(coords) != 2:
+                continue
+            self.docs.append(doc)
+            coordinates.append(coords)
+
+        # MongoDB stores [longitude, latitude]
+        coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.lngs = np.radians(coords[:, 0])
+        self.lats = np.radians(coords[:, 1])
+        self.cos_lats = np.cos(self.lats)
+        self.ids = np.asarray([str(doc["_id"]) for doc in self.docs], dtype=str)
+        self.menus = MenuStore(self.docs)
+
+    @classmethod
+    def from_arrays(cls, docs, lngs: np.ndarray, lats: np.ndarray, cos_lats: np.ndarray, ids: np.ndarray,
+                    menus: MenuStore, version=None) -> "GeoIndex":
+        """Wrap prebuilt columns (e.g. a mapped snapshot) without copying them.
+        `docs` only needs len() and indexing."""
+        index = cls.__new__(cls)
+        index.version = version
+        index.docs = docs
+        index.lngs = lngs
+        index.lats = lats
+        index.cos_lats = cos_lats
+        index.ids = ids
+        index.menus = menus
+        return index
+
+    def __len__(self):
+        return len(self.docs)
+
+    def nearby(self, lat: float, lng: float, radius_in_meters: float,
+               after: Optional[tuple] = None):
+        """Return (positions, distances) inside the radius in (distance, _id)
+        order, optionally only those strictly after an (distance, _id) position."""
+        distances = haversine_meters(lat, lng, self.lats, self.lngs, self.cos_lats)
+        mask = distances <= radius_in_meters
+        if after is not None:
+            last_distance, last_id = after
+            mask &= (distances > last_distance) | ((distances == last_distance) & (self.ids > str(last_id)))
+
+        positions = np.flatnonzero(mask)
+        order = np.lexsort((self.ids[positions], distances[positions]))
+        return positions[order], distances[positions[order]]
+
+    def iter_search(self, lat: float, lng: float, radius_in_meters: float,
+                    ranges: Optional[dict] = None, after: Optional[tuple] = None,
+                    fields: Optional[tuple] = None, sort: str = "distance",
+                    limit: Optional[int] = None):
+        """Yield (distance, restaurant), same contract as search.iter_search."""
+        positions, distances = self.nearby(lat, lng, radius_in_meters, after)
+        if not ranges:
+            matched = [None] * len(positions)
+        else:
+            matched = self.menus.filter(positions, ranges)
+
+        if sort == "lowest_calorie_item":
+            if ranges:
+                kept = np.asarray([i for i, items in enumerate(matched) if items is not None], dtype=np.int64)
+            else:
+                kept = np.arange(len(positions))
+            order = kept[_lowest_first(self.menus.lowest(positions[kept], ranges), limit)]
+            positions, distances = positions[order], distances[order]
+            matched = [matched[i] for i in order.tolist()]
+
+        for position, distance, items in zip(positions, distances.tolist(), matched):
+            # Shallow copies so callers never touch the indexed documents
+            doc = dict(self.docs[position])
+            if ranges:
+                if items is None:
+                    continue
+                menu_items = doc["menu_items"]
+                doc["menu_items"] = [menu_items[i] for i in items]
+            doc["distance_miles"] = to_miles(distance)
+            if fields:
+                doc = apply_projection(doc, fields)
+            yield distance, doc
+
+    def search(self, lat: float, lng: float, radius_in_meters: float,
+               ranges: Optional[dict] = None, fields: Optional[tuple] = None,
+               sort: str = "distance") -> list:
+        return [doc for _, doc in self.iter_search(lat, lng, radius_in_meters, ranges, fields=fields, sort=sort)]
+
+    @classmethod
+    async def load(cls, database):
+        # Read the version first: a write racing the load only causes an
+        # extra rebuild on the next poll, never a stale index.
+        version = await get_dataset_version(database)
+        docs = await database["restaurants"].find({}).to_list(length=None)
+        # Building the columns takes seconds for large catalogues; keep the
+        # event loop serving requests meanwhile
+        return await asyncio.to_thread(cls, docs, version)
+
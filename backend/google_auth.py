@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import TYPE_CHECKING, Optional
+from cachetools import TTLCache
+
+if TYPE_CHECKING:
+    import httpx
+
+GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v3/userinfo"
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Used when Google's certs response has no usable Cache-Control max-age
+DEFAULT_JWKS_MAX_AGE = 3600
+
+
+def looks_like_jwt(token: str) -> bool:
+    # ID tokens are JWTs (header.payload.signature), access tokens are opaque
+    return token.count(".") == 2
+
+
+def _token_key(token: str) -> str:
+    # Keep digests rather than raw bearer tokens in memory
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class GoogleVerifier:
+    """Verifies Google tokens without blocking the event loop.
+
+    ID tokens are checked locally against Google's signing keys, which are
+    cached until their max-age runs out or an unknown key id shows up (key
+    rotation). Access tokens still go to the userinfo endpoint; successful
+    lookups are remembered for `cache_ttl` seconds and concurrent requests
+    for the same token share a single call. All calls go through one pooled
+    httpx.AsyncClient, opened by the first Google sign-in (most processes
+    never see one, so httpx and jose are only imported then).
+    """
+
+    def __init__(self, userinfo_url: str = GOOGLE_USERINFO_URL, cache_ttl: float = 60,
+                 cache_size: int = 1024, client_id: Optional[str] = None,
+                 certs_url: str = GOOGLE_CERTS_URL, jwks_min_refresh: float = 60,
+                 timeout: float = 5.0, max_connections: int = 20):
+        self.userinfo_url = userinfo_url
+        self.client_id = client_id
+        self.certs_url = certs_url
+        self.jwks_min_refresh = jwks_min_refresh
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.client: Optional["httpx.AsyncClient"] = None
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.hits = 0
+        self.misses = 0
+        self._inflight = {}
+        self._keys = {}
+        self._keys_expire_at = 0.0
+        self._keys_fetched_at = None
+        self._keys_lock = asyncio.Lock()
+
+    def open(self, timeout: Optional[float] = None, max_connections: Optional[int] = None, transport=None):
+        import httpx
+
+        timeout = self.timeout if timeout is None else timeout
+        max_connections = self.max_connections if max_connections is None else max_connections
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def _fetch(self, token: str, key: str) -> dict:
+        response = await self.client.get(self.userinfo_url, headers={"Authorization": f"Bearer {token}"})
+        if response.status_code != 200:
+            raise ValueError("Invalid access token")
+
+        user_info = response.json()
+        self._cache[key] = user_info
+        return user_info
+
+    async def userinfo(self, token: str) -> dict:
+        """Return Google's userinfo for an access token.
+
+        Raises ValueError when Google rejects the token.
+        """
+        key = _token_key(token)
+        user_info = self._cache.get(key)
+        if user_info is not None:
+            self.hits += 1
+            return user_info
+        self.misses += 1
+
+        if self.client is None:
+            self.open()
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(token, key))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: one caller disconnecting must not cancel the others' lookup
+        return await asyncio.shield(future)
+
+    async def _refresh_keys(self):
+        response = await self.client.get(self.certs_url)
+        response.raise_for_status()
+
+        max_age = DEFAULT_JWKS_MAX_AGE
+        match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+        if match:
+            max_age = int(match.group(1))
+
+        self._keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+        self._keys_fetched_at = time.monotonic()
+        self._keys_expire_at = self._keys_fetched_at + max_age
+
+    def _keys_stale(self, kid: str) -> bool:
+        now = time.monotonic()
+        if self._keys_fetched_at is None or now >= self._keys_expire_at:
+            return True
+        # An unknown kid usually means Google rotated keys; refetch, but not
+        # more often than jwks_min_refresh so forged kids can't hammer Google
+        return kid not in self._keys and now - self._keys_fetched_at >= self.jwks_min_refresh
+
+    async def _signing_key(self, kid: str) -> dict:
+        if self._keys_stale(kid):
+            async with self._keys_lock:
+                # Another request may have refreshed while we waited
+                if self._keys_stale(kid):
+                    if self.client is None:
+                        self.open()
+                    await self._refresh_keys()
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise ValueError("Unknown signing key")
+        return key
+
+    async def verify_id_token(self, token: str) -> dict:
+        """Verify a Google ID token locally and return its claims.
+
+        Raises ValueError when the token is malformed, expired, not signed by
+        Google, or issued for another client.
+        """
+        if not self.client_id:
+            raise ValueError("GOOGLE_CLIENT_ID is not configured")
+        from jose import jwt, JWTError
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            raise ValueError("Malformed ID token")
+        if header.get("alg") != "RS256":
+            raise ValueError("Unexpected signing algorithm")
+
+        key = await self._signing_key(header.get("kid"))
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.client_id,
+                options={"verify_at_hash": False},
+            )
+        except JWTError as e:
+            raise ValueError(str(e))
+
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError("Invalid issuer")
+        return claims
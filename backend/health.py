@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from pymongo import monitoring
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool usage per server, fed by PyMongo's pool events.
+
+    Events arrive from driver threads, hence the lock.
+    """
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def _update(self, address, counter: str, delta: int):
+        with self._lock:
+            server = self._servers.setdefault(address, {"in_use": 0, "open": 0, "wait_timeouts": 0})
+            server[counter] = max(server[counter] + delta, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                f"{host}:{port}": dict(server, max=self.max_pool_size)
+                for (host, port), server in self._servers.items()
+            }
+
+    def saturated(self, ratio: float) -> bool:
+        # Past this point new requests queue for a connection
+        with self._lock:
+            return any(server["in_use"] >= self.max_pool_size * ratio for server in self._servers.values())
+
+    def connection_created(self, event):
+        self._update(event.address, "open", 1)
+
+    def connection_closed(self, event):
+        self._update(event.address, "open", -1)
+
+    def connection_checked_out(self, event):
+        self._update(event.address, "in_use", 1)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, "in_use", -1)
+
+    def connection_check_out_failed(self, event):
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self._update(event.address, "wait_timeouts", 1)
+
+    def pool_cleared(self, event):
+        # Everything checked out is being discarded
+        with self._lock:
+            if event.address in self._servers:
+                self._servers[event.address]["in_use"] = 0
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._servers.pop(event.address, None)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+class HealthMonitor:
+    """Pings MongoDB every `interval` seconds so health endpoints can answer
+    from memory instead of adding a round trip per probe.
+
+    Readiness needs a recent successful ping, a pool below `pool_saturation`
+    of its maximum on every server, and the required indexes (created or
+    re-checked here while any are missing).
+    """
+
+    def __init__(self, interval: float = 5.0, timeout: float = 2.0, pool_saturation: float = 0.9,
+                 pool: Optional[PoolMonitor] = None, indexes=None):
+        self.interval = interval
+        self.timeout = timeout
+        self.pool_saturation = pool_saturation
+        self.pool = pool
+        self.indexes = indexes
+        self.connected = False
+        self.ping_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self, client, database=None):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), self.timeout)
+            self.ping_ms = (time.perf_counter() - started) * 1000
+            self.connected = True
+            self.error = None
+        except Exception as e:
+            self.connected = False
+            self.error = str(e) or type(e).__name__
+        self.checked_at = time.time()
+
+        if self.connected and self.indexes is not None and not self.indexes.ready and database is not None:
+            try:
+                if self.indexes.missing is None:
+                    # Mongo was down at startup, create them now
+                    await self.indexes.ensure(database)
+                else:
+                    await self.indexes.verify(database)
+            except Exception as e:
+                print(f"Index check failed: {e}")
+
+    @property
+    def stale(self) -> bool:
+        # A wedged monitor must not keep reporting an old success
+        return self.checked_at is None or time.time() - self.checked_at > 3 * self.interval + self.timeout
+
+    def readiness(self) -> tuple:
+        """Return (ready, body) from the last check, without any I/O."""
+        saturated = self.pool is not None and self.pool.saturated(self.pool_saturation)
+        missing = self.indexes.missing if self.indexes is not None else []
+        indexes_ready = self.indexes is None or self.indexes.ready
+        ready = self.connected and not self.stale and not saturated and indexes_ready
+
+        body = {
+            "status": "ok" if ready else "error",
+            "db": "connected" if self.connected else "disconnected",
+            "ping_ms": round(self.ping_ms, 2) if self.ping_ms is not None else None,
+            "checked_at": (datetime.fromtimestamp(self.checked_at, timezone.utc).isoformat()
+                           if self.checked_at else None),
+        }
+        if self.error:
+            body["details"] = self.error
+        if self.stale:
+            body["stale"] = True
+        if self.pool is not None:
+            body["pool"] = self.pool.stats()
+            body["pool_saturated"] = saturated
+        if missing is None or missing:
+            body["missing_indexes"] = missing
+        return ready, body
+
+    async def _run(self, client, database):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check(client, database)
+
+    async def start(self, client, database=None):
+        await self.check(client, database)
+        self._task = asyncio.create_task(self._run(client, database))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,376 @@
+"""Stream restaurants from a CSV or JSONL file into MongoDB.
+
+    python import_restaurants.py restaurants.jsonl [--sync] [--chunk-size 1000] [--concurrency 4]
+
+JSONL has one restaurant document per line. CSV has one restaurant per row
+with `menu_items` (if present) holding a JSON array. A full import loads
+into a staging collection that replaces `restaurants` in one rename once
+it is indexed, so searches never see a half-loaded or empty collection.
+`--sync` instead updates `restaurants` in place, writing only restaurants
+whose `last_modified_date` changed and deleting those missing from the feed.
+Either way the normalized `menu_items` collection is rebuilt to match.
+`created_date` / `last_modified_date` are ISO 8601 strings in either format
+and are stored as dates.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from pymongo import DeleteMany, ReplaceOne
+from pymongo.errors import BulkWriteError
+from dataset import bump_dataset_version
+from menu_items import MENU_ITEMS_COLLECTION, ensure_menu_item_indexes
+
+# Load environment variables
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME = os.getenv("DB_NAME")
+
+DATE_FIELDS = ("created_date", "last_modified_date")
+
+
+class Progress:
+    """Counters for an import, printed every `every` seconds."""
+
+    def __init__(self, every: float = 5.0):
+        self.every = every
+        self.read = 0
+        self.skipped = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.read / elapsed if elapsed else 0.0
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated + self.deleted
+
+    def summary(self) -> str:
+        counts = [f"{self.inserted} inserted"]
+        # Sync-only counters stay out of plain import reports
+        for name in ("updated", "unchanged", "deleted"):
+            if getattr(self, name):
+                counts.append(f"{getattr(self, name)} {name}")
+        counts += [f"{self.failed} failed", f"{self.skipped} skipped"]
+        return f"{', '.join(counts)} of {self.read} read ({self.rate:.0f} docs/s)"
+
+    def tick(self):
+        now = time.monotonic()
+        if now - self._last_report >= self.every:
+            self._last_report = now
+            print(f"   ⏳ {self.summary()}")
+
+
+def read_jsonl(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_csv(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("menu_items"):
+                row["menu_items"] = json.loads(row["menu_items"])
+            yield row
+
+
+def read_records(path: str):
+    if path.endswith(".csv"):
+        return read_csv(path)
+    return read_jsonl(path)
+
+
+def parse_date(value) -> Optional[datetime]:
+    """An ISO 8601 string or datetime as the naive UTC, millisecond precision
+    datetime MongoDB hands back for it, so feed and stored dates compare.
+    Empty values are None; raises ValueError for anything else."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        raise ValueError(f"Not a date: {value!r}")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def parse_dates(record: dict):
+    for doc in [record] + (record.get("menu_items") or []):
+        for field in DATE_FIELDS:
+            if field in doc:
+                doc[field] = parse_date(doc[field])
+
+
+def with_location(records, progress: Progress):
+    """Add the GeoJSON `location` search needs and parse the dates, skipping
+    rows without coordinates or with unreadable dates."""
+    for record in records:
+        progress.read += 1
+        try:
+            lat = float(record["latitude"])
+            lng = float(record["longitude"])
+            parse_dates(record)
+        except (KeyError, TypeError, ValueError):
+            progress.skipped += 1
+            continue
+        record["latitude"] = lat
+        record["longitude"] = lng
+        # MongoDB expects [longitude, latitude]
+        record["location"] = {"type": "Point", "coordinates": [lng, lat]}
+        yield record
+
+
+def chunked(records, size: int):
+    records = iter(records)
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+async def achunked(records, size: int):
+    # chunked() for async iterables such as Motor cursors
+    chunk = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def insert_chunk(collection, chunk: list, progress: Progress):
+    try:
+        result = await collection.insert_many(chunk, ordered=False)
+        progress.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        # Unordered: everything except the reported errors was written
+        progress.inserted += e.details.get("nInserted", 0)
+        progress.failed += len(e.details.get("writeErrors", []))
+    progress.tick()
+
+
+def is_newer(incoming: Optional[datetime], stored) -> bool:
+    # Without a date on either side we cannot tell, so write it; so are rows
+    # stored before dates were parsed, which still hold the string
+    if incoming is None or not isinstance(stored, datetime):
+        return True
+    return incoming > stored
+
+
+async def sync_chunk(collection, chunk: list, progress: Progress):
+    """Upsert the restaurants of `chunk` whose last_modified_date moved on."""
+    ids = [doc["restaurant_id"] for doc in chunk]
+    stored = {}
+    async for doc in collection.find({"restaurant_id": {"$in": ids}}, {"restaurant_id": 1, "last_modified_date": 1}):
+        stored[doc["restaurant_id"]] = doc.get("last_modified_date")
+
+    requests = []
+    for doc in chunk:
+        restaurant_id = doc["restaurant_id"]
+        if restaurant_id in stored and not is_newer(doc.get("last_modified_date"), stored[restaurant_id]):
+            progress.unchanged += 1
+            continue
+        requests.append(ReplaceOne({"restaurant_id": restaurant_id}, doc, upsert=True))
+
+    if requests:
+        try:
+            result = await collection.bulk_write(requests, ordered=False)
+            progress.inserted += result.upserted_count
+            progress.updated += result.matched_count
+        except BulkWriteError as e:
+            progress.inserted += e.details.get("nUpserted", 0)
+            progress.updated += e.details.get("nMatched", 0)
+            progress.failed += len(e.details.get("writeErrors", []))
+    progress.tick()
+
+
+async def write_chunks(collection, chunks, concurrency: int, progress: Progress, write=insert_chunk):
+    # At most `concurrency` chunks are held in memory at any time; `chunks`
+    # may be a plain or an async iterable
+    pending = set()
+
+    async def submit(chunk):
+        nonlocal pending
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        pending.add(asyncio.create_task(write(collection, chunk, progress)))
+
+    if hasattr(chunks, "__aiter__"):
+        async for chunk in chunks:
+            await submit(chunk)
+    else:
+        for chunk in chunks:
+            await submit(chunk)
+    if pending:
+        await asyncio.gather(*pending)
+
+
+async def menu_item_docs(restaurants, progress: Progress):
+    async for restaurant in restaurants:
+        progress.read += 1
+        restaurant_id = restaurant.get("restaurant_id")
+        if not restaurant_id:
+            progress.skipped += 1
+            continue
+        for position, item in enumerate(restaurant.get("menu_items") or []):
+            yield dict(item, restaurant_id=restaurant_id, position=position)
+
+
+async def rebuild_menu_items(database, source: str = "restaurants", chunk_size: int = 1000, concurrency: int = 4,
+                             progress: Optional[Progress] = None) -> Progress:
+    """Rebuild `menu_items` from the embedded menus in the `source`
+    collection: loaded into a staging collection and swapped in. Bumping the
+    dataset version is left to the caller."""
+    progress = progress or Progress()
+    staging = database[f"{MENU_ITEMS_COLLECTION}_import"]
+    await staging.drop()
+
+    restaurants = database[source].find({}, {"restaurant_id": 1, "menu_items": 1})
+    items = menu_item_docs(restaurants, progress)
+    await write_chunks(staging, achunked(items, chunk_size), concurrency, progress)
+
+    # Indexed after the load, then swapped in (creates the collection even
+    # when there are no items yet)
+    await ensure_menu_item_indexes(staging)
+    await staging.rename(MENU_ITEMS_COLLECTION, dropTarget=True)
+    return progress
+
+
+async def import_documents(database, records, chunk_size: int = 1000, concurrency: int = 4,
+                           progress: Optional[Progress] = None) -> Progress:
+    """Load `records` into a fresh `restaurants` collection and swap it in.
+
+    Raises ValueError, leaving the current collection alone, when nothing
+    could be imported; on any failure the staging collection is dropped.
+    """
+    progress = progress or Progress()
+    staging = database["restaurants_import"]
+    await staging.drop()
+
+    try:
+        await write_chunks(staging, chunked(with_location(records, progress), chunk_size), concurrency, progress)
+        if not progress.inserted:
+            raise ValueError(f"Nothing imported ({progress.summary()})")
+
+        # Building the index once after the load beats maintaining it per insert.
+        # restaurant_id is only required to be unique by sync_documents; a full
+        # import of rows without one must not fail here after the whole load
+        await staging.create_index([("location", "2dsphere")])
+        # Items from the staged restaurants, so both layouts switch together
+        await rebuild_menu_items(database, staging.name, chunk_size, concurrency)
+        await staging.rename("restaurants", dropTarget=True)
+    except BaseException:
+        # Never leave a half-built staging collection behind
+        await staging.drop()
+        raise
+
+    # Tell in-process search indexes and caches the data changed
+    await bump_dataset_version(database)
+    return progress
+
+
+def with_restaurant_id(records, seen: set, progress: Progress):
+    # Sync is keyed on restaurant_id, rows without one cannot be matched
+    for record in records:
+        restaurant_id = record.get("restaurant_id")
+        if not restaurant_id:
+            progress.read += 1
+            progress.skipped += 1
+            continue
+        seen.add(restaurant_id)
+        yield record
+
+
+async def sync_documents(database, records, chunk_size: int = 1000, concurrency: int = 4,
+                         delete_missing: bool = True, progress: Optional[Progress] = None) -> Progress:
+    """Bring `restaurants` in line with the feed in `records`, in place.
+
+    Only new or modified restaurants are written, and (unless
+    `delete_missing` is off) stored restaurants absent from the feed are
+    deleted. The feed's restaurant_ids are kept in memory for that. The
+    dataset version is only bumped when something changed. Raises
+    ValueError, changing nothing, for an empty feed.
+    """
+    progress = progress or Progress()
+    collection = database["restaurants"]
+    await collection.create_index("restaurant_id", unique=True)
+
+    seen = set()
+    records = with_location(with_restaurant_id(records, seen, progress), progress)
+    await write_chunks(collection, chunked(records, chunk_size), concurrency, progress, write=sync_chunk)
+    if not seen:
+        raise ValueError(f"Empty feed, nothing synced ({progress.summary()})")
+
+    if delete_missing:
+        stale = [
+            doc["_id"] async for doc in collection.find({}, {"restaurant_id": 1})
+            if doc.get("restaurant_id") not in seen
+        ]
+        if stale:
+            result = await collection.bulk_write(
+                [DeleteMany({"_id": {"$in": ids}}) for ids in chunked(stale, chunk_size)],
+                ordered=False,
+            )
+            progress.deleted += result.deleted_count
+
+    if progress.changed:
+        await rebuild_menu_items(database, "restaurants", chunk_size, concurrency)
+        await bump_dataset_version(database)
+    return progress
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import restaurants from CSV or JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sync", action="store_true", help="update in place, writing only changed restaurants")
+    parser.add_argument("--keep-missing", action="store_true", help="with --sync, keep restaurants missing from the feed")
+    args = parser.parse_args()
+
+    if not MONGODB_URI:
+        print("❌ Error: MONGODB_URI not found in .env")
+        return
+
+    client = AsyncIOMotorClient(MONGODB_URI)
+    try:
+        records = read_records(args.path)
+        if args.sync:
+            print(f"🔄 Syncing restaurants from {args.path}...")
+            progress = await sync_documents(client[DB_NAME], records, args.chunk_size, args.concurrency,
+                                            delete_missing=not args.keep_missing)
+            print(f"🎉 Sync finished: {progress.summary()}")
+        else:
+            print(f"📥 Importing restaurants from {args.path}...")
+            progress = await import_documents(client[DB_NAME], records, args.chunk_size, args.concurrency)
+            print(f"🎉 Import finished: {progress.summary()}")
+    except Exception as e:
+        print(f"\n❌ IMPORT FAILED: {str(e)}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
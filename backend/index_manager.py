@@ -0,0 +1,68 @@
+import asyncio
+from typing import TYPE_CHECKING, Optional
+from dataset import get_dataset_version
+
+if TYPE_CHECKING:
+    from geo_index import GeoIndex
+
+
+class GeoIndexManager:
+    """Holds the current GeoIndex and rebuilds it when the dataset changes.
+
+    geo_index (and NumPy with it) is imported by the first load, so
+    processes that never enable the index don't pay for it. With a
+    `snapshot_path` the index is mapped from a snapshot file shared by all
+    workers (see snapshot.py) instead of being built in every process.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, max_age: float = 60):
+        self.index: Optional["GeoIndex"] = None
+        self.snapshot_path = snapshot_path
+        # Snapshot reuse window when the dataset has no version counter
+        self.max_age = max_age
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self, database, force: bool = False) -> bool:
+        if not force and self.index is not None:
+            version = await get_dataset_version(database)
+            # Without a version counter there is nothing to compare, and a
+            # full reload every poll would cost far more than it could find
+            if version is None or version == self.index.version:
+                return False
+
+        if self.snapshot_path:
+            from snapshot import load_shared
+
+            # Swapping the reference is the whole refresh; requests holding
+            # the previous index keep their mapping of the replaced file
+            self.index = await load_shared(database, self.snapshot_path, self.max_age)
+            return True
+
+        from geo_index import GeoIndex
+
+        self.index = await GeoIndex.load(database)
+        return True
+
+    async def _poll(self, database, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await self.refresh(database):
+                    print(f"Search index refreshed: {len(self.index)} restaurants")
+            except Exception as e:
+                print(f"Search index refresh failed: {e}")
+
+    async def start(self, database, interval: float):
+        await self.refresh(database, force=True)
+        if self.index.version is None:
+            print("Search index: no dataset version in meta, refreshes wait until a writer bumps it")
+        self._task = asyncio.create_task(self._poll(database, interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,76 @@
+from typing import Optional
+from pymongo import ASCENDING, GEOSPHERE, IndexModel
+from menu_items import MENU_ITEMS_COLLECTION, MENU_ITEMS_INDEX
+
+
+def required_indexes(menu_layout: str = "embedded") -> dict:
+    """Indexes the API needs, by collection."""
+    indexes = {
+        # $near / $geoNear refuse to run without it
+        "restaurants": [IndexModel([("location", GEOSPHERE)])],
+        "users": [
+            # get_current_user and the guest / Google sign-in lookups
+            IndexModel([("user_id", ASCENDING)], unique=True),
+            # Guests store google_id: null, which a sparse index would still
+            # include (and reject as duplicates), so only real ids are indexed.
+            # A range filter, so equality lookups on a Google id can use it.
+            IndexModel([("google_id", ASCENDING)], unique=True,
+                       partialFilterExpression={"google_id": {"$gt": ""}}),
+        ],
+    }
+    if menu_layout == "normalized":
+        indexes[MENU_ITEMS_COLLECTION] = [IndexModel(MENU_ITEMS_INDEX)]
+    return indexes
+
+
+def _describe(collection: str, model: IndexModel) -> str:
+    return f"{collection}.{model.document['name']}"
+
+
+def _matches(model: IndexModel, info: dict) -> bool:
+    spec = model.document
+    return (
+        list(spec["key"].items()) == [tuple(key) for key in info["key"]]
+        and spec.get("unique", False) == info.get("unique", False)
+        and spec.get("partialFilterExpression") == info.get("partialFilterExpression")
+    )
+
+
+async def missing_indexes(database, indexes: dict) -> list:
+    """Names (`collection.index`) of the declared indexes that do not exist."""
+    missing = []
+    for collection, models in indexes.items():
+        existing = (await database[collection].index_information()).values()
+        for model in models:
+            if not any(_matches(model, info) for info in existing):
+                missing.append(_describe(collection, model))
+    return missing
+
+
+class RequiredIndexes:
+    """Creates the declared indexes at startup and remembers what is missing.
+
+    `missing` is None until checked; readiness requires it to be empty.
+    """
+
+    def __init__(self, indexes: dict):
+        self.indexes = indexes
+        self.missing: Optional[list] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.missing == []
+
+    async def ensure(self, database) -> list:
+        for collection, models in self.indexes.items():
+            try:
+                # No-op for indexes that already exist with the same options
+                await database[collection].create_indexes(models)
+            except Exception as e:
+                # e.g. duplicate user_ids or an existing index with other options
+                print(f"Failed to create indexes on {collection}: {e}")
+        return await self.verify(database)
+
+    async def verify(self, database) -> list:
+        self.missing = await missing_indexes(database, self.indexes)
+        return self.missing
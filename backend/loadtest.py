@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import json
+import platform
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Optional
+import httpx
+import numpy as np
+import main
+from config import settings
+from geo_index import GeoIndex
+from import_restaurants import import_documents
+from memory_db import load_memory
+from synthetic_data import DEFAULT_CENTER, generate_restaurants, random_point
+
+BENCH_DB_NAME = "calorie_quest_bench"
+# Relative weights of the request mix
+DEFAULT_MIX = {"search": 8, "guest": 1, "healthz": 1}
+
+
+async def load_mongo(records, use_index: bool = False) -> tuple:
+    """Replace the restaurants in settings.DB_NAME on a real MongoDB."""
+    client = main.create_client([main.pool_monitor])
+    progress = await import_documents(client[settings.DB_NAME], records)
+    print(f"📥 Loaded {progress.summary()}")
+    index = await GeoIndex.load(client[settings.DB_NAME]) if use_index else None
+    return client, index
+
+
+@asynccontextmanager
+async def bench_app(client, index: Optional[GeoIndex]):
+    """Point main's globals at the benchmark data for the duration."""
+    saved = main.db.client, main.search_index.index, main.admission.rate_limits
+    main.db.client, main.search_index.index = client, index
+    # Every simulated user shares one client address, so per-IP limits would
+    # only measure the rate limiter
+    main.admission.rate_limits = {}
+    main.search_cache.clear()
+    await main.health.start(client, client[settings.DB_NAME])
+    if settings.GUEST_WRITE_MODE == "write_behind":
+        main.guest_writer.start(main.db.auth_db()["users"])
+    try:
+        yield main.app
+    finally:
+        await main.guest_writer.stop()
+        await main.health.stop()
+        main.db.client, main.search_index.index, main.admission.rate_limits = saved
+
+
+def plan_requests(count: int, seed: int = 0, mix: Optional[dict] = None, center: tuple = DEFAULT_CENTER,
+                  radius_miles: float = 25) -> list:
+    """A reproducible list of (endpoint, method, path, params)."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    names, weights = list(mix), list(mix.values())
+    planned = []
+    for _ in range(count):
+        endpoint = rng.choices(names, weights)[0]
+        if endpoint == "search":
+            lat, lng = random_point(rng, center, radius_miles)
+            params = {"lat": round(lat, 6), "lng": round(lng, 6), "mileage": rng.choice([1, 2, 5, 10])}
+            if rng.random() < 0.5:
+                params["max_calories"] = rng.choice([300, 500, 800])
+            if rng.random() < 0.3:
+                params["limit"] = 20
+            params["profile"] = rng.choice(["card", "full"])
+            planned.append(("search", "GET", "/restaurants/search", params))
+        elif endpoint == "guest":
+            planned.append(("guest", "POST", "/auth/guest", None))
+        else:
+            planned.append(("healthz", "GET", "/healthz", None))
+    return planned
+
+
+def summarize(latencies: list, statuses: list, elapsed: float) -> dict:
+    latencies_ms = np.asarray(latencies, dtype=np.float64) * 1000
+    counts = {}
+    for code in statuses:
+        counts[str(code)] = counts.get(str(code), 0) + 1
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(latencies),
+        "errors": sum(1 for code in statuses if code >= 400),
+        "statuses": dict(sorted(counts.items())),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 3) if len(latencies_ms) else 0.0,
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(latencies_ms.max()), 3) if len(latencies_ms) else 0.0,
+        },
+    }
+
+
+async def run_load(app, planned: list, concurrency: int = 16, warmup: int = 0) -> dict:
+    """Send `planned` through the ASGI app from `concurrency` workers.
+
+    The first `warmup` requests are sent first and left out of the numbers.
+    """
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def send(request):
+            endpoint, method, path, params = request
+            started = time.perf_counter()
+            response = await client.request(method, path, params=params)
+            return endpoint, time.perf_counter() - started, response.status_code
+
+        for request in planned[:warmup]:
+            await send(request)
+
+        queue = iter(planned[warmup:])
+
+        async def worker():
+            for request in queue:
+                endpoint, latency, code = await send(request)
+                latencies, statuses = results.setdefault(endpoint, ([], []))
+                latencies.append(latency)
+                statuses.append(code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [latency for latencies, _ in results.values() for latency in latencies]
+    all_statuses = [code for _, statuses in results.values() for code in statuses]
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "total": summarize(all_latencies, all_statuses, elapsed),
+        "endpoints": {name: summarize(*results[name], elapsed) for name in sorted(results)},
+    }
+
+
+def compare(old: dict, new: dict) -> list:
+    """Lines with the throughput and p95 change per endpoint between two reports."""
+    lines = []
+    for name, stats in new["endpoints"].items():
+        before = old.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        rps_change = stats["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        p95_change = stats["latency_ms"]["p95"] / before["latency_ms"]["p95"] - 1 if before["latency_ms"]["p95"] else 0.0
+        lines.append(f"{name:8} throughput {rps_change:+.1%}  p95 {p95_change:+.1%}")
+    return lines
+
+
+async def benchmark(args) -> dict:
+    records = list(generate_restaurants(args.restaurants, args.seed, radius_miles=args.radius_miles))
+    settings.DB_NAME = args.db_name
+    if args.cache:
+        settings.SEARCH_CACHE_ENABLED = True
+
+    if args.backend == "memory":
+        client, index = await load_memory(records)
+    else:
+        settings.MONGODB_URI = args.mongodb_uri or settings.MONGODB_URI
+        client, index = await load_mongo(records, use_index=args.index)
+
+    planned = plan_requests(args.requests + args.warmup, args.seed, radius_miles=args.radius_miles)
+    try:
+        async with bench_app(client, index) as app:
+            results = await run_load(app, planned, args.concurrency, args.warmup)
+    finally:
+        client.close()
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "backend": args.backend,
+            "search": "memory index" if index is not None else "mongodb",
+            "restaurants": args.restaurants,
+            "menu_items": sum(len(record["menu_items"]) for record in records),
+            "seed": args.seed,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "search_cache": settings.SEARCH_CACHE_ENABLED,
+            "guest_write_mode": settings.GUEST_WRITE_MODE,
+        },
+        **results,
+    }
+
+
+async def run():
+    parser = argparse.ArgumentParser(description="Load test the API in-process against synthetic restaurants")
+    parser.add_argument("--restaurants", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--radius-miles", type=float, default=25)
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory",
+                        help="in-process stand-in, or a real MongoDB (its restaurants are replaced)")
+    parser.add_argument("--mongodb-uri", help="defaults to MONGODB_URI")
+    parser.add_argument("--db-name", default=BENCH_DB_NAME)
+    parser.add_argument("--index", action="store_true", help="with --backend mongo, search from the in-memory index")
+    parser.add_argument("--cache", action="store_true", help="enable the search result cache")
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--compare", help="previous report to compare against")
+    args = parser.parse_args()
+
+    print(f"🏁 {args.requests} requests against {args.restaurants} restaurants ({args.backend})...")
+    report = await benchmark(args)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    for name, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{name:8} {stats['throughput_rps']:>8} req/s  p50 {latency['p50']} ms  "
+              f"p95 {latency['p95']} ms  p99 {latency['p99']} ms  errors {stats['errors']}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            for line in compare(json.load(f), report):
+                print(line)
+    print(f"✅ Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
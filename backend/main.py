@@ -1,218 +1,190 @@
 import os
+import secrets
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Response, status, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, FastAPI, Header, Response, status, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic_settings import BaseSettings
-from uuid import uuid4
-from datetime import datetime, timezone
-from models import User, Token, UserInDB, GoogleAuthRequest
-from auth import create_access_token
-from config import settings
+from config import get_settings
+from database import create_client, db, read_preference, warm_up
+from search_cache import render_json
+import services
 
-# Database setup
-class Database:
-    client: AsyncIOMotorClient = None
-
-db = Database()
+# CORS configuration
+origins = [
+    "http://localhost:5173",
+    "http://127.0.0.1:5173",
+    "http://localhost:5137",
+    "http://127.0.0.1:5137",
+    "https://golden-starfish-wag.onrender.com",
+]
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
+    # Startup (the Google client is opened by the first Google sign-in)
+    settings = get_settings()
     try:
-        db.client = AsyncIOMotorClient(settings.MONGODB_URI)
+        listeners = [services.pool_monitor]
+        if settings.METRICS_ENABLED:
+            from metrics import CommandMetrics
+            listeners.append(CommandMetrics())
+        db.client = create_client(listeners)
+        db.search_read_preference = read_preference(settings.SEARCH_READ_PREFERENCE, settings.SEARCH_MAX_STALENESS_SECONDS)
+        db.auth_read_preference = read_preference(settings.AUTH_READ_PREFERENCE)
         # Verify connection
         await db.client.admin.command('ping')
         print("Connected to MongoDB")
+        try:
+            await warm_up(db.client, settings.MONGO_WARMUP_CONNECTIONS, [db.auth_read_preference, db.search_read_preference])
+        except Exception as e:
+            # Only costs the first requests some latency
+            print(f"MongoDB connection warm-up failed: {e}")
+        missing = await services.indexes.ensure(db.client[settings.DB_NAME])
+        if missing:
+            print(f"Missing required indexes: {', '.join(missing)}")
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
         # We might want to raise an error here or let the app start but fail health checks
         # For now, we'll let it start, but db.client might be usable or not depending on the error
         pass
+
+    if db.client:
+        # Keeps pinging after a failed start, readiness follows the database
+        await services.health.start(db.client, db.client[settings.DB_NAME])
+
+    if settings.GUEST_WRITE_MODE == "write_behind" and db.client:
+        services.guest_writer.start(db.auth_db()["users"])
+
+    if settings.SEARCH_INDEX_ENABLED and db.client:
+        try:
+            await services.search_index.start(db.search_db(), settings.SEARCH_INDEX_REFRESH_SECONDS)
+            print(f"Search index loaded: {len(services.search_index.index)} restaurants")
+        except Exception as e:
+            # Search keeps working through the $near/$geoNear path
+            print(f"Failed to load search index: {e}")
+
+    if settings.SEARCH_CACHE_ENABLED and db.client:
+        try:
+            await services.search_cache.start(db.search_db(), settings.SEARCH_CACHE_VERSION_POLL_SECONDS)
+        except Exception as e:
+            # Entries still expire by TTL, only version invalidation is lost
+            print(f"Failed to start search cache version watch: {e}")
         
     yield
     # Shutdown
+    # Drain queued guest users while the Mongo client is still open
+    await services.guest_writer.stop()
+    await services.search_cache.stop()
+    await services.search_index.stop()
+    await services.slow_queries.stop()
+    await services.health.stop()
+    await services.google_verifier.close()
     if db.client:
         db.client.close()
         print("Disconnected from MongoDB")
 
-app = FastAPI(lifespan=lifespan)
+core_router = APIRouter()
+
+@core_router.get("/livez")
+async def liveness_check():
+    # The process is up and its event loop answers; says nothing about Mongo
+    return {"status": "ok"}
+
+@core_router.get("/readyz")
+async def readiness_check():
+    # Answered from the health monitor's last check, no database round trip
+    ready, body = services.health.readiness()
+    return Response(
+        content=render_json(body),
+        media_type="application/json",
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
 
-# CORS configuration
-origins = [
-    "http://localhost:5173",
-    "http://127.0.0.1:5173",
-    "http://localhost:5137",
-    "http://127.0.0.1:5137",
-    "https://golden-starfish-wag.onrender.com",
-]
+@core_router.get("/healthz")
+async def health_check():
+    # Kept for existing probes, same answer as /readyz
+    return await readiness_check()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    settings = get_settings()
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
 
-@app.get("/healthz")
-async def health_check():
-    if not db.client:
-        return Response(content='{"status": "error", "db": "disconnected"}', media_type="application/json", status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
-    
-    try:
-        # Check if we can ping the database
-        await db.client.admin.command('ping')
-        return {"status": "ok", "db": "connected"}
-    except Exception as e:
-        return Response(content=f'{{"status": "error", "db": "error", "details": "{str(e)}"}}', media_type="application/json", status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+@core_router.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def slow_query_log():
+    return {"threshold_ms": services.slow_queries.threshold_ms, "entries": services.slow_queries.entries()}
 
-@app.get("/")
+@core_router.get("/")
 async def root():
     return {"message": "Welcome to CalorieQuest API"}
 
-@app.post("/auth/guest", response_model=Token)
-async def guest_auth():
-    user_id = str(uuid4())
-    current_time = datetime.now(timezone.utc)
-    
-    user_in_db = UserInDB(
-        user_id=user_id,
-        email=None,
-        display_name="Guest User",
-        is_guest=True,
-        created_at=current_time
-    )
-    
-    # Insert user into database
-    if not db.client:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database not connected")
-        
-    await db.client[settings.DB_NAME]["users"].insert_one(user_in_db.model_dump())
-    
-    # Create access token
-    access_token = create_access_token(data={"sub": user_id, "is_guest": True})
-    
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=user_in_db
+def create_app() -> FastAPI:
+    """Build the API. Routers and optional middleware are imported here
+    rather than at module import, and only when enabled."""
+    settings = get_settings()
+    app = FastAPI(lifespan=lifespan)
+    if settings.ADMISSION_ENABLED:
+        from admission import AdmissionMiddleware
+        # Added first so it sits inside CORS: rejections keep their CORS
+        # headers and preflights are never counted
+        app.add_middleware(AdmissionMiddleware, control=services.admission)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Cache"],
     )
 
+    if settings.PROFILING_ENABLED:
+        from profiling import ProfilingMiddleware
+        app.add_middleware(ProfilingMiddleware, admin_token=settings.ADMIN_TOKEN)
+
+    if settings.METRICS_ENABLED:
+        from auth import cache_stats
+        from metrics import MetricsMiddleware, register_stats, render_metrics
+        register_stats(
+            {
+                "search": services.search_cache.stats,
+                "google_userinfo": services.google_verifier.stats,
+                "access_tokens": lambda: cache_stats()["tokens"],
+                "users": lambda: cache_stats()["users"],
+            },
+            pool=services.pool_monitor,
+            admission=services.admission,
+        )
+        # Added last so it is outermost and also times CORS preflights
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            body, content_type = render_metrics()
+            return Response(content=body, media_type=content_type)
+
+    from auth_routes import router as auth_router
+    from search_routes import router as search_router
+    app.include_router(core_router)
+    app.include_router(auth_router)
+    app.include_router(search_router)
+    return app
+
+def __getattr__(name):
+    # `uvicorn main:app` (and tests) build the app on first access, so
+    # importing this module for its helpers stays cheap and reads no settings
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    if name == "settings":
+        return get_settings()
+    if name in services.SINGLETONS:
+        return getattr(services, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
-
-@app.get("/restaurants/search")
-async def search_restaurants(lat: float, lng: float, mileage: int = 5, max_calories: int = None):
-    if not db.client:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database not connected")
-    
-    # Convert mileage to meters (1 mile ≈ 1609.34 meters)
-    radius_in_meters = mileage * 1609.34
-    
-    try:
-        # Use $near operator for geospatial query
-        cursor = db.client[settings.DB_NAME]["restaurants"].find({
-            "location": {
-                "$near": {
-                    "$geometry": {
-                        "type": "Point",
-                        "coordinates": [lng, lat]
-                    },
-                    "$maxDistance": radius_in_meters
-                }
-            }
-        })
-        
-        restaurants = []
-        async for doc in cursor:
-            # Handle _id: convert to string
-            doc["_id"] = str(doc["_id"])
-            
-            # Calorie Filtering Logic
-            if max_calories is not None:
-                original_items = doc.get("menu_items", [])
-                filtered_items = [
-                    item for item in original_items
-                    if item.get("calories") is not None and item["calories"] <= max_calories
-                ]
-                
-                # If restaurant has matching items, keep it with filtered menu
-                if filtered_items:
-                    doc["menu_items"] = filtered_items
-                    restaurants.append(doc)
-            else:
-                # No filtering, include restaurant as is
-                restaurants.append(doc)
-            
-        return restaurants
-    except Exception as e:
-        print(f"Search error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.post("/auth/google", response_model=Token)
-async def google_auth(request: GoogleAuthRequest):
-    if not db.client:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database not connected")
-
-    # Real Google Verification Logic
-    token = request.token
-    
-    try:
-        import requests
-        
-        # Verify the access token by calling Google's userinfo endpoint
-        response = requests.get(
-            "https://www.googleapis.com/oauth2/v3/userinfo",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        
-        if response.status_code != 200:
-            raise ValueError("Invalid access token")
-            
-        user_info = response.json()
-        
-        # Verify that the token was issued to our client (optional but recommended if using id_token,
-        # but for access token, if we can get user info, it's valid for that user.
-        # Stricter checks might involve tokeninfo endpoint)
-        
-        google_id = user_info.get('sub')
-        email = user_info.get('email')
-        display_name = user_info.get('name', 'Google User')
-        
-    except ValueError as e:
-        # Invalid token
-        raise HTTPException(status_code=400, detail=f"Invalid Google token: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Google authentication failed: {str(e)}")
-
-    # Check if user exists
-    user = await db.client[settings.DB_NAME]["users"].find_one({"google_id": google_id})
-
-    if user:
-        user_in_db = UserInDB(**user)
-    else:
-        # Create new user
-        current_time = datetime.now(timezone.utc)
-        user_id = str(uuid4())
-        
-        user_in_db = UserInDB(
-            user_id=user_id,
-            email=email,
-            display_name=display_name,
-            is_guest=False,
-            created_at=current_time,
-            google_id=google_id
-        )
-        await db.client[settings.DB_NAME]["users"].insert_one(user_in_db.model_dump())
-
-    # Create access token
-    access_token = create_access_token(data={"sub": user_in_db.user_id, "is_guest": False})
-
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=user_in_db
-    )
\ No newline at end of file
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers,
+                proxy_headers=True, forwarded_allow_ips=get_settings().FORWARDED_ALLOW_IPS)
@@ -0,0 +1,18 @@
+from bson import ObjectId
+from config import get_settings
+from fakes import FakeClient
+from geo_index import GeoIndex
+from import_restaurants import Progress, with_location
+
+# In-process stand-in for MongoDB, used by loadtest.py (--backend memory) and
+# by tests that drive the app without a database. The collections are the
+# tests' fakes (fakes.py).
+
+
+async def load_memory(records) -> tuple:
+    """Load restaurants into the in-process stand-in; search is served by
+    the in-memory GeoIndex, as with SEARCH_INDEX_ENABLED."""
+    client = FakeClient()
+    docs = [dict(doc, _id=ObjectId()) for doc in with_location(records, Progress())]
+    client[get_settings().DB_NAME]["restaurants"].docs = docs
+    return client, GeoIndex(docs)
@@ -0,0 +1,113 @@
+from contextlib import aclosing
+from typing import Optional
+from search import NUTRIENT_FIELDS, apply_projection, iter_search, lowest_calories, projection_spec
+
+# Normalized layout: one document per menu item, next to the embedded
+# `restaurants.menu_items` arrays (see migrate_menu_items.py)
+MENU_ITEMS_COLLECTION = "menu_items"
+
+# Restaurant equality first, then calories for the common range filter; the
+# other macros ride along so every nutrient filter is answered from the index
+MENU_ITEMS_INDEX = [("restaurant_id", 1)] + [(field, 1) for field in NUTRIENT_FIELDS]
+
+# Restaurants resolved per menu_items query
+LOOKUP_BATCH_SIZE = 100
+
+
+async def ensure_menu_item_indexes(collection):
+    await collection.create_index(MENU_ITEMS_INDEX)
+
+
+def menu_item_query(restaurant_ids: list, ranges: Optional[dict] = None) -> dict:
+    # Same semantics as item_matches: a missing field never satisfies a bound
+    query = {"restaurant_id": {"$in": restaurant_ids}}
+    for field, (low, high) in (ranges or {}).items():
+        bounds = {}
+        if low is not None:
+            bounds["$gte"] = low
+        if high is not None:
+            bounds["$lte"] = high
+        query[field] = bounds
+    return query
+
+
+def split_fields(fields: Optional[tuple]) -> tuple:
+    """Split a search projection into (restaurant projection, item projection)."""
+    if not fields:
+        return None, {"_id": 0}
+
+    restaurant_paths = tuple(path for path in fields if path.split(".")[0] != "menu_items")
+    item_paths = tuple(path[len("menu_items."):] for path in fields if path.startswith("menu_items."))
+    # The join needs restaurant_id on both sides and position for menu order
+    restaurant_fields = restaurant_paths + ("restaurant_id",)
+    if "menu_items" in fields:
+        return restaurant_fields, {"_id": 0}
+    item_projection = projection_spec(item_paths + ("restaurant_id", "position", "calories"))
+    item_projection["_id"] = 0
+    return restaurant_fields, item_projection
+
+
+async def _with_menu_items(items, batch: list, ranges: Optional[dict], projection: dict, fields: Optional[tuple]):
+    ids = [doc["restaurant_id"] for _, doc in batch if doc.get("restaurant_id")]
+    menus = {}
+    if ids:
+        async for item in items.find(menu_item_query(ids, ranges), projection):
+            menus.setdefault(item["restaurant_id"], []).append(item)
+
+    for distance, doc in batch:
+        menu = sorted(menus.get(doc.get("restaurant_id"), []), key=lambda item: item.get("position", 0))
+        if ranges and not menu:
+            continue
+        for item in menu:
+            item.pop("position", None)
+        doc["menu_items"] = menu
+        yield distance, apply_projection(doc, fields) if fields else doc
+
+
+async def iter_search_normalized(restaurants, items, lat: float, lng: float, radius_in_meters: float,
+                                 ranges: Optional[dict] = None, after: Optional[tuple] = None,
+                                 batch_size: Optional[int] = None, fields: Optional[tuple] = None,
+                                 sort: str = "distance", limit: Optional[int] = None):
+    """search.iter_search for the normalized layout.
+
+    Geo hits come from $geoNear without their menus; every batch of hits
+    then costs one index-backed menu_items query for just the qualifying
+    items. Distance order stops as soon as the caller does; other orders
+    need every hit first.
+    """
+    restaurant_fields, item_projection = split_fields(fields)
+    hits = iter_search(restaurants, lat, lng, radius_in_meters, after=after, batch_size=batch_size,
+                       fields=restaurant_fields, without_menus=True)
+    size = batch_size or LOOKUP_BATCH_SIZE
+
+    async def matches(project):
+        async with aclosing(hits):
+            batch = []
+            async for pair in hits:
+                batch.append(pair)
+                if len(batch) == size:
+                    async for match in _with_menu_items(items, batch, ranges, item_projection, project):
+                        yield match
+                    batch = []
+            async for match in _with_menu_items(items, batch, ranges, item_projection, project):
+                yield match
+
+    if sort == "distance":
+        async with aclosing(matches(fields)) as results:
+            async for pair in results:
+                yield pair
+        return
+
+    # Same order as the pipeline's $sort for the embedded layout; trimmed
+    # afterwards since the sort needs calories
+    pairs = [pair async for pair in matches(None)]
+    pairs.sort(key=lambda pair: (lowest_calories(pair[1]), pair[0], pair[1]["_id"]))
+    for distance, doc in pairs[:limit]:
+        yield distance, apply_projection(doc, fields) if fields else doc
+
+
+async def search_normalized(restaurants, items, lat: float, lng: float, radius_in_meters: float,
+                            ranges: Optional[dict] = None, fields: Optional[tuple] = None,
+                            sort: str = "distance") -> list:
+    results = iter_search_normalized(restaurants, items, lat, lng, radius_in_meters, ranges, fields=fields, sort=sort)
+    return [doc async for _, doc in results]
@@ -0,0 +1,96 @@
+from typing import Optional
+import numpy as np
+from search import NUTRIENT_FIELDS
+
+
+class MenuStore:
+    """Menu item nutrients as NumPy columns, grouped by restaurant.
+
+    Items of restaurant `i` live at rows `offsets[i]:offsets[i + 1]` of every
+    column. Missing or non-numeric values are stored as NaN, which never
+    satisfies a range, same as the `item.get(field) is not None` check.
+    """
+
+    def __init__(self, docs):
+        offsets = [0]
+        values = {field: [] for field in NUTRIENT_FIELDS}
+        for doc in docs:
+            items = doc.get("menu_items") or []
+            for item in items:
+                for field in NUTRIENT_FIELDS:
+                    value = item.get(field)
+                    values[field].append(value if isinstance(value, (int, float)) else np.nan)
+            offsets.append(offsets[-1] + len(items))
+
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.counts = np.diff(self.offsets)
+        self.columns = {
+            field: np.asarray(column, dtype=np.float64)
+            for field, column in values.items()
+        }
+
+    @classmethod
+    def from_arrays(cls, offsets: np.ndarray, counts: np.ndarray, columns: dict) -> "MenuStore":
+        """Wrap prebuilt columns (e.g. a mapped snapshot) without copying them."""
+        store = cls.__new__(cls)
+        store.offsets = offsets
+        store.counts = counts
+        store.columns = columns
+        return store
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def item_rows(self, positions: np.ndarray):
+        """Return (rows, owners): item rows of the given restaurants and, for
+        each row, the index into `positions` it belongs to."""
+        positions = np.asarray(positions, dtype=np.int64)
+        lengths = self.counts[positions]
+        ends = np.cumsum(lengths)
+        starts = self.offsets[positions]
+        rows = np.arange(int(ends[-1]) if len(ends) else 0, dtype=np.int64)
+        rows += np.repeat(starts - (ends - lengths), lengths)
+        owners = np.repeat(np.arange(len(positions)), lengths)
+        return rows, owners
+
+    def match(self, rows: np.ndarray, ranges: dict) -> np.ndarray:
+        # One vectorized comparison per bound over the candidate rows
+        mask = np.ones(len(rows), dtype=bool)
+        for field, (low, high) in ranges.items():
+            column = self.columns[field][rows]
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        return mask
+
+    def lowest(self, positions: np.ndarray, ranges: Optional[dict] = None,
+               field: str = "calories") -> np.ndarray:
+        """For each restaurant position, the smallest `field` value among its
+        (matching) menu items, or inf when there is none."""
+        rows, owners = self.item_rows(positions)
+        values = self.columns[field][rows]
+        if ranges:
+            values = np.where(self.match(rows, ranges), values, np.inf)
+        lowest = np.full(len(positions), np.inf)
+        # fmin skips the NaNs of missing values
+        np.fmin.at(lowest, owners, values)
+        return lowest
+
+    def filter(self, positions: np.ndarray, ranges: dict) -> list:
+        """For each restaurant position, the local indexes of its matching
+        menu items, or None when nothing matches."""
+        if not ranges:
+            return [range(int(self.counts[p])) for p in positions]
+
+        rows, owners = self.item_rows(positions)
+        mask = self.match(rows, ranges)
+
+        matched = [None] * len(positions)
+        local = rows - self.offsets[positions][owners]
+        for owner, index in zip(owners[mask].tolist(), local[mask].tolist()):
+            if matched[owner] is None:
+                matched[owner] = []
+            matched[owner].append(index)
+        return matched
+
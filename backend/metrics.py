@@ -0,0 +1,163 @@
+import threading
+import time
+from typing import Callable
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Own registry, so /metrics only shows what the API records
+registry = CollectorRegistry()
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency until the last body chunk is sent",
+    ["method", "route", "status"], registry=registry,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being served",
+    ["method", "route"], registry=registry,
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trips as seen by the driver",
+    ["collection", "command", "status"], registry=registry,
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def route_template(app, scope) -> str:
+    # The path template keeps the label set bounded, raw paths would not
+    partial = None
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """Times every HTTP request, streamed bodies included."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope.get("app"), scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(time.perf_counter() - started)
+
+
+def command_collection(command_name: str, command) -> str:
+    target = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    # Database-level commands (ping, hello, ...) carry a 1 instead of a name
+    return target if isinstance(target, str) else ""
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Feeds MONGO_COMMAND_DURATION from PyMongo's command events.
+
+    Only started events carry the command document, so the collection is
+    kept until the matching reply. Events arrive from driver threads.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = command_collection(event.command_name, event.command)
+
+    def _observe(self, event, status: str):
+        with self._lock:
+            collection = self._pending.pop((event.request_id, event.connection_id), "")
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name, status).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+
+class StatsCollector:
+    """Exports cache and pool stats that are read at scrape time."""
+
+    def __init__(self, caches: dict, pool=None, admission=None):
+        # name -> callable returning a SearchCache.stats()-shaped dict
+        self.caches: dict[str, Callable[[], dict]] = caches
+        self.pool = pool
+        self.admission = admission
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache lookups answered from the cache", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache lookups that missed", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Hits over lookups since startup", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Entries currently cached", labels=["cache"])
+        for name, stats in self.caches.items():
+            stats = stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            ratio.add_metric([name], stats["hit_ratio"])
+            size.add_metric([name], stats["size"])
+        yield from (hits, misses, ratio, size)
+
+        if self.pool is not None:
+            in_use = GaugeMetricFamily("mongodb_pool_connections_in_use", "Checked out connections", labels=["server"])
+            opened = GaugeMetricFamily("mongodb_pool_connections_open", "Open connections", labels=["server"])
+            timeouts = CounterMetricFamily("mongodb_pool_wait_timeouts", "Connection check-outs that timed out",
+                                           labels=["server"])
+            for server, stats in self.pool.stats().items():
+                in_use.add_metric([server], stats["in_use"])
+                opened.add_metric([server], stats["open"])
+                timeouts.add_metric([server], stats["wait_timeouts"])
+            yield from (in_use, opened, timeouts)
+
+        if self.admission is not None:
+            active = GaugeMetricFamily("admission_active", "Requests holding a concurrency slot", labels=["route"])
+            waiting = GaugeMetricFamily("admission_waiting", "Requests waiting for a slot", labels=["route"])
+            rejected = CounterMetricFamily("admission_rejected", "Requests turned away with 429/503",
+                                           labels=["route", "reason"])
+            for route, stats in self.admission.stats().items():
+                active.add_metric([route], stats["active"])
+                waiting.add_metric([route], stats["waiting"])
+            for (route, reason), count in self.admission.rejected.items():
+                rejected.add_metric([route, reason], count)
+            yield from (active, waiting, rejected)
+
+
+_stats_collector = None
+
+
+def register_stats(caches: dict, pool=None, admission=None):
+    # Replaces the previous collector, so building the app twice is fine
+    global _stats_collector
+    if _stats_collector is not None:
+        registry.unregister(_stats_collector)
+    _stats_collector = StatsCollector(caches, pool, admission)
+    registry.register(_stats_collector)
+
+
+def render_metrics() -> tuple:
+    """Return (body, content type) in the Prometheus text format."""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,199 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from import_restaurants import Progress, with_location
+from search import PROFILES, apply_projection, distance_meters, filter_menu_items, to_miles
+from search_cache import render_json
+from synthetic_data import DEFAULT_CENTER, generate_restaurants
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+RANGES = {"calories": (None, 500)}
+LAT, LNG = DEFAULT_CENTER
+
+
+def make_docs(count: int, seed: int = 0, menu_size: tuple = (5, 60)) -> list:
+    """Restaurants as Motor returns them: ObjectId `_id`, GeoJSON location."""
+    records = generate_restaurants(count, seed, menu_size=menu_size)
+    return [dict(doc, _id=ObjectId()) for doc in with_location(records, Progress())]
+
+
+def _copies(docs):
+    # Stages that write to the documents get fresh ones every run
+    return [dict(doc) for doc in docs]
+
+
+def _response(docs):
+    docs = [filter_menu_items(dict(doc, _id=str(doc["_id"])), RANGES) for doc in docs]
+    return [doc for doc in docs if doc is not None]
+
+
+def stringify_ids(docs):
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+
+
+def filter_items(docs):
+    return [doc for doc in docs if filter_menu_items(doc, RANGES) is not None]
+
+
+def add_distances(docs):
+    for doc in docs:
+        doc["distance_miles"] = to_miles(distance_meters(LAT, LNG, doc["location"]["coordinates"]))
+
+
+def project_card(docs):
+    return [apply_projection(doc, PROFILES["card"]) for doc in docs]
+
+
+def encode_orjson(docs):
+    return render_json(docs)
+
+
+def encode_fastapi(docs):
+    # What returning the list from an endpoint would cost
+    return json.dumps(jsonable_encoder(docs)).encode()
+
+
+# name -> (input for one run, stage)
+STAGES = {
+    "stringify_ids": (_copies, stringify_ids),
+    "filter_menu_items": (_copies, filter_items),
+    "distance": (_copies, add_distances),
+    "projection": (lambda docs: docs, project_card),
+    "render_json": (_response, encode_orjson),
+    "jsonable_encoder": (_response, encode_fastapi),
+}
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Best time of a fixed dict / str workload, to scale the baseline by
+    how fast this machine is right now."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        docs = [{"_id": i, "name": str(i), "calories": i % 700} for i in range(100000)]
+        [doc for doc in docs if doc["calories"] <= 500]
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def measure(stage, prepare, docs: list, repeat: int = 5) -> dict:
+    """Best wall time of `repeat` runs and the peak traced allocation of one run."""
+    times = []
+    gc_enabled = gc.isenabled()
+    for _ in range(repeat):
+        data = prepare(docs)
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            stage(data)
+            times.append(time.perf_counter() - started)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    data = prepare(docs)
+    tracemalloc.start()
+    try:
+        stage(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        "seconds": round(best, 6),
+        "per_doc_us": round(best / len(docs) * 1e6, 3) if docs else 0.0,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run(sizes, repeat: int = 5, seed: int = 0, menu_size: tuple = (5, 60), stages=None) -> dict:
+    calibration = calibrate(repeat)
+    results = {"sizes": {}}
+    for size in sizes:
+        docs = make_docs(size, seed, menu_size)
+        results["sizes"][str(size)] = {
+            name: measure(stage, prepare, docs, repeat)
+            for name, (prepare, stage) in STAGES.items() if not stages or name in stages
+        }
+    # Before and after, in case the machine got busier or quieter meanwhile
+    results["calibration_seconds"] = round(min(calibration, calibrate(repeat)), 6)
+    return results
+
+
+def regressions(results: dict, baseline: dict, time_tolerance: float = 0.5, memory_tolerance: float = 0.2) -> list:
+    """Stages slower than baseline * (1 + time_tolerance), or allocating more
+    than baseline * (1 + memory_tolerance); sizes or stages missing from the
+    baseline are not checked.
+
+    Baseline times are scaled by the calibration ratio first, so a slower
+    or busier machine does not read as a regression.
+    """
+    speed = results["calibration_seconds"] / baseline["calibration_seconds"]
+    found = []
+    for size, stages in results["sizes"].items():
+        for name, current in stages.items():
+            stored = baseline["sizes"].get(size, {}).get(name)
+            if not stored:
+                continue
+            if current["seconds"] > stored["seconds"] * speed * (1 + time_tolerance):
+                found.append(f"{name} @ {size}: {current['seconds']:.4f}s vs baseline {stored['seconds']:.4f}s")
+            if current["peak_kib"] > stored["peak_kib"] * (1 + memory_tolerance):
+                found.append(f"{name} @ {size}: peak {current['peak_kib']} KiB vs baseline {stored['peak_kib']} KiB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the search post-processing stages on generated restaurants")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="candidate restaurants per run (100000 needs a few GB of memory)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--menu-size", type=int, nargs=2, default=[5, 60], metavar=("MIN", "MAX"))
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.5)
+    parser.add_argument("--memory-tolerance", type=float, default=0.2)
+    parser.add_argument("--out", help="also write the results here")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.seed, tuple(args.menu_size), args.stages)
+    for size, stages in results["sizes"].items():
+        print(f"📊 {size} restaurants")
+        for name, stats in stages.items():
+            print(f"   {name:18} {stats['seconds'] * 1000:9.2f} ms  {stats['per_doc_us']:8.2f} µs/doc  "
+                  f"peak {stats['peak_kib']:10.1f} KiB")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"✅ Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️  No baseline at {args.baseline}, run with --update-baseline first")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    found = regressions(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for line in found:
+        print(f"❌ {line}")
+    if found:
+        sys.exit(1)
+    print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Copy the embedded restaurants.menu_items arrays into a `menu_items` collection.
+
+    python migrate_menu_items.py [--chunk-size 1000] [--concurrency 4]
+
+Every item becomes its own document carrying its restaurant's
+`restaurant_id` and its `position` in the menu. The collection is rebuilt
+in a staging collection and swapped in. import_restaurants.py does the
+same after every import or sync; run this for restaurants loaded any other
+way before serving search with SEARCH_MENU_LAYOUT=normalized. The embedded
+arrays are left alone, the embedded layout keeps working.
+"""
+import argparse
+import asyncio
+import os
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from dataset import bump_dataset_version
+from import_restaurants import Progress, rebuild_menu_items
+
+# Load environment variables
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME = os.getenv("DB_NAME")
+
+
+async def migrate_menu_items(database, chunk_size: int = 1000, concurrency: int = 4,
+                             progress: Optional[Progress] = None) -> Progress:
+    progress = await rebuild_menu_items(database, "restaurants", chunk_size, concurrency, progress)
+    # Cached normalized search results are stale now
+    await bump_dataset_version(database)
+    return progress
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Build the normalized menu_items collection")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if not MONGODB_URI:
+        print("❌ Error: MONGODB_URI not found in .env")
+        return
+
+    client = AsyncIOMotorClient(MONGODB_URI)
+    try:
+        print("🍔 Migrating menu items...")
+        progress = await migrate_menu_items(client[DB_NAME], args.chunk_size, args.concurrency)
+        print(f"🎉 Migration finished: {progress.summary()}")
+    except Exception as e:
+        print(f"\n❌ MIGRATION FAILED: {str(e)}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
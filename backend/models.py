@@ -1,7 +1,8 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 from uuid import UUID
+from search import nutrient_ranges
 
 class User(BaseModel):
     user_id: str
@@ -26,4 +27,32 @@ class Token(BaseModel):
     user: User
 
 class TokenData(BaseModel):
-    user_id: Optional[str] = None
\ No newline at end of file
+    user_id: Optional[str] = None
+
+class NutrientFilters(BaseModel):
+    # Inclusive bounds on menu item nutrients; a restaurant is kept when at
+    # least one item satisfies all of them
+    min_calories: Optional[float] = None
+    max_calories: Optional[float] = None
+    min_fat_g: Optional[float] = None
+    max_fat_g: Optional[float] = None
+    min_carbs_g: Optional[float] = None
+    max_carbs_g: Optional[float] = None
+    min_protein_g: Optional[float] = None
+    max_protein_g: Optional[float] = None
+    min_sugar_g: Optional[float] = None
+    max_sugar_g: Optional[float] = None
+
+    def ranges(self) -> dict:
+        return nutrient_ranges(**self.model_dump())
+
+
+class SearchQuery(NutrientFilters):
+    lat: float
+    lng: float
+    mileage: int = 5
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery] = Field(..., min_length=1)
+    profile: Literal["card", "detail", "full"] = "full"
+    fields: Optional[str] = None
@@ -0,0 +1,71 @@
+import asyncio
+import cProfile
+import io
+import pstats
+import secrets
+from typing import Optional
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+
+
+class ProfilingMiddleware:
+    """Answers requests sent with `X-Profile: 1` with a cProfile report of
+    that request (top `limit` functions by cumulative time) instead of its
+    body; the original status comes back in X-Profiled-Status. The request
+    must also carry `admin_token` as X-Admin-Token; without a token
+    configured the header is ignored.
+
+    Only one profiler can be active at a time, so profiled requests take
+    turns. The report also covers whatever else the event loop ran while
+    the request was awaiting.
+    """
+
+    def __init__(self, app, admin_token: Optional[str], limit: int = 40):
+        self.app = app
+        self.admin_token = admin_token
+        self.limit = limit
+        self._lock = asyncio.Lock()
+
+    def wants_profile(self, scope) -> bool:
+        if scope["type"] != "http" or not self.admin_token:
+            return False
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) not in (b"1", b"true"):
+            return False
+        token = headers.get(ADMIN_TOKEN_HEADER, b"")
+        return secrets.compare_digest(token, self.admin_token.encode())
+
+    async def __call__(self, scope, receive, send):
+        if not self.wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        async with self._lock:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, capture)
+            finally:
+                profiler.disable()
+
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(self.limit)
+        body = report.getvalue().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
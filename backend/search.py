@@ -0,0 +1,433 @@
+import base64
+import hashlib
+import json
+import math
+import re
+from contextlib import aclosing
+from typing import Optional
+from bson import ObjectId
+
+# 1 mile ≈ 1609.34 meters
+METERS_PER_MILE = 1609.34
+
+# Same sphere radius MongoDB uses for 2dsphere queries, so distances and
+# radius cut-offs agree between the search paths.
+EARTH_RADIUS_METERS = 6378100.0
+
+# Result orders: nearest first, or cheapest (lowest calorie) matching item first
+SORTS = ("distance", "lowest_calorie_item")
+
+# Numeric menu item fields search can filter on with min_<field>/max_<field>
+NUTRIENT_FIELDS = ("calories", "fat_g", "carbs_g", "protein_g", "sugar_g")
+
+
+# Named projections for search results. "full" (None) returns whole documents.
+PROFILES = {
+    # What RestaurantCard / RestaurantList render
+    "card": (
+        "restaurant_id", "name", "chain_name",
+        "menu_items.menu_item_id", "menu_items.name", "menu_items.calories",
+    ),
+    # What RestaurantDetailPage renders
+    "detail": (
+        "restaurant_id", "name", "address", "chain_name", "latitude", "longitude",
+        "menu_items.menu_item_id", "menu_items.name", "menu_items.description",
+        "menu_items.calories", "menu_items.fat_g", "menu_items.carbs_g",
+        "menu_items.protein_g", "menu_items.sugar_g",
+    ),
+    "full": None,
+}
+
+FIELD_PATH = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+
+def miles_to_meters(mileage: float) -> float:
+    return mileage * METERS_PER_MILE
+
+
+def to_miles(meters: float) -> float:
+    # distance_miles as reported in search results
+    return round(meters / METERS_PER_MILE, 3)
+
+
+def distance_meters(lat: float, lng: float, coordinates) -> float:
+    # Haversine distance to a GeoJSON [longitude, latitude] pair
+    lat1, lat2 = math.radians(lat), math.radians(coordinates[1])
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin(math.radians(coordinates[0] - lng) / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def lowest_calories(doc: dict) -> float:
+    # Calories of the restaurant's lightest menu item, inf when none has any
+    values = [item.get("calories") for item in doc.get("menu_items") or []]
+    return min((v for v in values if isinstance(v, (int, float))), default=math.inf)
+
+
+def nutrient_ranges(**bounds: Optional[float]) -> dict:
+    """Turn `min_<field>` / `max_<field>` keyword arguments into
+    `{field: (low, high)}`, skipping fields without any bound."""
+    ranges = {}
+    for field in NUTRIENT_FIELDS:
+        low = bounds.get(f"min_{field}")
+        high = bounds.get(f"max_{field}")
+        if low is not None or high is not None:
+            ranges[field] = (low, high)
+    return ranges
+
+
+def near_query(lat: float, lng: float, radius_in_meters: float) -> dict:
+    # MongoDB expects [longitude, latitude]
+    return {
+        "location": {
+            "$near": {
+                "$geometry": {
+                    "type": "Point",
+                    "coordinates": [lng, lat]
+                },
+                "$maxDistance": radius_in_meters
+            }
+        }
+    }
+
+
+def resolve_fields(profile: str = "full", fields: Optional[str] = None) -> Optional[tuple]:
+    """Return the field paths to keep, or None for whole documents.
+
+    `fields` is a comma separated list of (dotted) paths and wins over
+    `profile`. Raises ValueError for unknown profiles or invalid paths.
+    """
+    if fields:
+        paths = tuple(path.strip() for path in fields.split(",") if path.strip())
+        for path in paths:
+            if not FIELD_PATH.match(path):
+                raise ValueError(f"Invalid field: {path}")
+        return paths or None
+
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile: {profile}")
+    return PROFILES[profile]
+
+
+def _projection_tree(paths) -> dict:
+    tree = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is True:
+                # A parent is already included whole
+                break
+            node = child
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def _flatten(tree: dict, prefix: str = ""):
+    for key, sub in tree.items():
+        if sub is True:
+            yield prefix + key
+        else:
+            yield from _flatten(sub, f"{prefix}{key}.")
+
+
+def projection_spec(paths) -> dict:
+    # Mongo rejects overlapping paths like "menu_items" + "menu_items.name"
+    return {path: 1 for path in _flatten(_projection_tree(paths))}
+
+
+def _project(value: dict, tree: dict) -> dict:
+    projected = {}
+    for key, sub in tree.items():
+        if key not in value:
+            continue
+        if sub is True:
+            projected[key] = value[key]
+        elif isinstance(value[key], dict):
+            projected[key] = _project(value[key], sub)
+        elif isinstance(value[key], list):
+            projected[key] = [_project(v, sub) for v in value[key] if isinstance(v, dict)]
+    return projected
+
+
+def apply_projection(doc: dict, paths) -> dict:
+    """Python equivalent of a Mongo inclusion projection (keeps `_id` and
+    `distance_miles`)."""
+    projected = _project(doc, _projection_tree(paths))
+    for key in ("_id", "distance_miles"):
+        if key in doc:
+            projected[key] = doc[key]
+    return projected
+
+
+def item_matches(item: dict, ranges: dict) -> bool:
+    for field, (low, high) in ranges.items():
+        value = item.get(field)
+        if value is None:
+            return False
+        if low is not None and value < low:
+            return False
+        if high is not None and value > high:
+            return False
+    return True
+
+
+def filter_menu_items(doc: dict, ranges: Optional[dict]) -> Optional[dict]:
+    """Apply the nutrient filters to a restaurant document in Python.
+
+    Returns the document with only matching menu items, or None when no
+    item matches. This is the reference behaviour the aggregation
+    pipeline and the in-memory index have to reproduce.
+    """
+    if not ranges:
+        return doc
+
+    filtered_items = [
+        item for item in doc.get("menu_items", [])
+        if item_matches(item, ranges)
+    ]
+    if not filtered_items:
+        return None
+
+    doc["menu_items"] = filtered_items
+    return doc
+
+
+def query_fingerprint(lat: float, lng: float, radius_in_meters: float,
+                      ranges: Optional[dict] = None) -> str:
+    # Ties a continuation token to the search it was issued for
+    key = json.dumps([lat, lng, radius_in_meters, sorted((ranges or {}).items())])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def encode_cursor(distance: float, doc_id, fingerprint: str) -> str:
+    # ObjectIds are marked as such, so the _id decodes to exactly the type
+    # Mongo compares it against
+    if isinstance(doc_id, ObjectId):
+        doc_id = {"$oid": str(doc_id)}
+    payload = json.dumps({"d": distance, "id": doc_id, "q": fingerprint})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_id(value):
+    if isinstance(value, dict) and set(value) == {"$oid"}:
+        return ObjectId(value["$oid"])
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return value
+    raise ValueError(f"Unsupported _id {value!r}")
+
+
+def decode_cursor(token: str, fingerprint: str) -> tuple:
+    """Return the (distance, _id) position a page ended at, the _id as the
+    type it was issued with.
+
+    Raises ValueError for malformed tokens or tokens issued for another search.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        distance, doc_id, issued_for = float(payload["d"]), _decode_id(payload["id"]), payload["q"]
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if issued_for != fingerprint:
+        raise ValueError("Cursor does not belong to this search")
+    return distance, doc_id
+
+
+def build_search_pipeline(lat: float, lng: float, radius_in_meters: float,
+                          ranges: Optional[dict] = None, after: Optional[tuple] = None,
+                          keep_distance: bool = False, fields: Optional[tuple] = None,
+                          sort: str = "distance", limit: Optional[int] = None,
+                          without_menus: bool = False) -> list:
+    """Build the $geoNear pipeline that does the nutrient filtering server side.
+
+    `after` is a (distance, _id) position from a continuation token, the
+    _id as stored; only restaurants strictly after it in (distance, _id)
+    order are returned.
+    With `sort="lowest_calorie_item"` results are ordered by their lightest
+    matching item instead, and `limit` caps them so Mongo keeps only the
+    top k while sorting. Distance order needs no $limit: the caller simply
+    stops reading the cursor. `without_menus` drops the embedded menus for
+    callers that fetch items elsewhere.
+    """
+    geo_near = {
+        "near": {"type": "Point", "coordinates": [lng, lat]},
+        "distanceField": "_distance",
+        "maxDistance": radius_in_meters,
+        "spherical": True,
+    }
+    pipeline = [{"$geoNear": geo_near}]
+
+    if after is not None:
+        distance, doc_id = after
+        # minDistance prunes the index scan, the $match breaks distance ties
+        geo_near["minDistance"] = distance
+        pipeline.append({
+            "$match": {
+                "$or": [
+                    {"_distance": {"$gt": distance}},
+                    {"_distance": distance, "_id": {"$gt": doc_id}},
+                ]
+            }
+        })
+
+    if ranges:
+        element_query = {}
+        conditions = []
+        for field, (low, high) in ranges.items():
+            bounds = {}
+            conditions.append({"$isNumber": f"$$item.{field}"})
+            if low is not None:
+                bounds["$gte"] = low
+                conditions.append({"$gte": [f"$$item.{field}", low]})
+            if high is not None:
+                bounds["$lte"] = high
+                conditions.append({"$lte": [f"$$item.{field}", high]})
+            element_query[field] = bounds
+
+        # "Has matching item" stage: evaluated by $geoNear before documents
+        # leave the index scan, so restaurants without a qualifying item are
+        # never shipped back.
+        geo_near["query"] = {"menu_items": {"$elemMatch": element_query}}
+        pipeline.append({
+            "$set": {
+                "menu_items": {
+                    "$filter": {
+                        "input": {"$ifNull": ["$menu_items", []]},
+                        "as": "item",
+                        "cond": {"$and": conditions},
+                    }
+                }
+            }
+        })
+        pipeline.append({"$match": {"menu_items.0": {"$exists": True}}})
+
+    pipeline.append({
+        "$set": {"distance_miles": {"$round": [{"$divide": ["$_distance", METERS_PER_MILE]}, 3]}}
+    })
+
+    hidden = [] if keep_distance else ["_distance"]
+    if sort == "lowest_calorie_item":
+        pipeline.append({
+            "$set": {"_lowest_calories": {"$ifNull": [{"$min": "$menu_items.calories"}, math.inf]}}
+        })
+        pipeline.append({"$sort": {"_lowest_calories": 1, "_distance": 1, "_id": 1}})
+        if limit is not None:
+            pipeline.append({"$limit": limit})
+        hidden.append("_lowest_calories")
+    if without_menus:
+        hidden.append("menu_items")
+
+    if fields:
+        # Inclusion projection, also drops the helper fields unless needed
+        projection = projection_spec(fields)
+        projection["distance_miles"] = 1
+        if keep_distance:
+            projection["_distance"] = 1
+        pipeline.append({"$project": projection})
+    elif hidden:
+        pipeline.append({"$unset": hidden[0] if len(hidden) == 1 else hidden})
+    return pipeline
+
+
+async def search_with_find(collection, lat: float, lng: float, radius_in_meters: float,
+                           ranges: Optional[dict] = None, fields: Optional[tuple] = None,
+                           sort: str = "distance") -> list:
+    # Fallback path: $near query and nutrient filtering in Python
+    projection = None
+    trim = False
+    if fields:
+        # The filter, distance and sort need their fields even if the caller
+        # doesn't, those are trimmed again afterwards
+        extra = tuple(f"menu_items.{field}" for field in (ranges or {})) + ("location",)
+        if sort == "lowest_calorie_item":
+            extra += ("menu_items.calories",)
+        projection = projection_spec(fields + extra)
+        trim = projection != projection_spec(fields)
+
+    cursor = collection.find(near_query(lat, lng, radius_in_meters), projection)
+
+    restaurants = []
+    async for doc in cursor:
+        doc["_id"] = str(doc["_id"])
+        doc = filter_menu_items(doc, ranges)
+        if doc is not None:
+            distance = distance_meters(lat, lng, doc["location"]["coordinates"])
+            doc["distance_miles"] = to_miles(distance)
+            restaurants.append((distance, doc))
+
+    if sort == "lowest_calorie_item":
+        # Same order as the pipeline's $sort
+        restaurants.sort(key=lambda pair: (lowest_calories(pair[1]), pair[0], pair[1]["_id"]))
+    return [apply_projection(doc, fields) if trim else doc for _, doc in restaurants]
+
+
+async def search_with_aggregation(collection, lat: float, lng: float, radius_in_meters: float,
+                                  ranges: Optional[dict] = None, fields: Optional[tuple] = None,
+                                  sort: str = "distance") -> list:
+    pipeline = build_search_pipeline(lat, lng, radius_in_meters, ranges, fields=fields, sort=sort)
+    cursor = collection.aggregate(pipeline)
+
+    restaurants = []
+    async for doc in cursor:
+        doc["_id"] = str(doc["_id"])
+        restaurants.append(doc)
+    return restaurants
+
+
+async def iter_search(collection, lat: float, lng: float, radius_in_meters: float,
+                      ranges: Optional[dict] = None, after: Optional[tuple] = None,
+                      batch_size: Optional[int] = None, fields: Optional[tuple] = None,
+                      sort: str = "distance", limit: Optional[int] = None,
+                      without_menus: bool = False):
+    """Yield (distance, restaurant) in (distance, _id) order as the cursor produces them.
+
+    $geoNear already sorts by distance; only restaurants at exactly the same
+    distance are buffered so ties come out in a stable order. Other sorts
+    are done by Mongo, top `limit` only, and yielded as they arrive. `_id`
+    keeps its stored type for continuation tokens, render_json prints it.
+    """
+    pipeline = build_search_pipeline(lat, lng, radius_in_meters, ranges, after, keep_distance=True,
+                                     fields=fields, sort=sort, limit=limit, without_menus=without_menus)
+    cursor = collection.aggregate(pipeline)
+    if batch_size:
+        cursor = cursor.batch_size(batch_size)
+
+    try:
+        ties = []
+        async for doc in cursor:
+            distance = doc.pop("_distance")
+            if sort != "distance":
+                yield distance, doc
+                continue
+            if ties and distance != ties[0][0]:
+                ties.sort(key=lambda pair: pair[1]["_id"])
+                for pair in ties:
+                    yield pair
+                ties = []
+            ties.append((distance, doc))
+
+        ties.sort(key=lambda pair: pair[1]["_id"])
+        for pair in ties:
+            yield pair
+    finally:
+        await cursor.close()
+
+
+async def take_page(results, limit: Optional[int]) -> tuple:
+    """Consume up to `limit` (distance, restaurant) pairs from `results`.
+
+    Returns the page and the (distance, _id) position to continue after, or
+    None when there is nothing left. Stops reading as soon as it knows.
+    """
+    page = []
+    last = None
+    async with aclosing(results):
+        async for distance, doc in results:
+            if limit is not None and len(page) == limit:
+                return page, last
+            page.append(doc)
+            last = (distance, doc["_id"])
+    return page, None
@@ -0,0 +1,109 @@
+import asyncio
+from typing import Optional
+import orjson
+from cachetools import TTLCache
+from dataset import get_dataset_version
+from search import distance_meters
+
+
+def render_json(content) -> bytes:
+    # orjson handles dicts, lists and datetimes natively; anything else
+    # (ObjectId, Decimal128) falls back to str like the old manual _id handling
+    return orjson.dumps(content, default=str)
+
+
+class SearchCache:
+    """Search candidates keyed on a quantized location.
+
+    Locations are snapped to the centre of a `grid_degrees` cell, so everyone
+    in the same cell shares one entry: the restaurants a search from the
+    centre finds within the radius widened by `reach()`, a superset of what
+    any point in the cell would find. Callers narrow it back down to their
+    own point. Entries expire after `ttl` seconds, the least recently used
+    ones are evicted past `maxsize`, and the whole cache is dropped when the
+    restaurant dataset version changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, grid_degrees: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.grid_degrees = grid_degrees
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def snap(self, lat: float, lng: float) -> tuple:
+        if not self.grid_degrees:
+            return lat, lng
+        # round() again to drop float noise like 34.052000000000004
+        return (
+            round(round(lat / self.grid_degrees) * self.grid_degrees, 9),
+            round(round(lng / self.grid_degrees) * self.grid_degrees, 9),
+        )
+
+    def reach(self, lat: float, lng: float) -> float:
+        # Meters from the centre (lat, lng) of a cell to its farthest corner,
+        # plus one for rounding
+        if not self.grid_degrees:
+            return 0.0
+        half = self.grid_degrees / 2
+        corners = [(lng + dx, lat + dy) for dx in (-half, half) for dy in (-half, half)]
+        return max(distance_meters(lat, lng, corner) for corner in corners) + 1.0
+
+    def key(self, lat: float, lng: float, mileage: float, ranges: Optional[dict] = None) -> tuple:
+        # Callers pass already snapped coordinates
+        return (lat, lng, mileage, tuple(sorted((ranges or {}).items())), self.version)
+
+    def get(self, key) -> Optional[list]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def set(self, key, candidates: list):
+        self._entries[key] = candidates
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self._entries.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "version": self.version,
+        }
+
+    def set_version(self, version) -> bool:
+        if version == self.version:
+            return False
+        self.version = version
+        self.clear()
+        return True
+
+    async def _watch(self, database, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.set_version(await get_dataset_version(database)):
+                    print(f"Search cache invalidated: dataset version {self.version}")
+            except Exception as e:
+                print(f"Search cache version check failed: {e}")
+
+    async def start(self, database, interval: float):
+        self.set_version(await get_dataset_version(database))
+        self._task = asyncio.create_task(self._watch(database, interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,301 @@
+import asyncio
+import time
+from contextlib import aclosing
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from admission import Rejected
+from config import get_settings
+from database import db
+from menu_items import MENU_ITEMS_COLLECTION, iter_search_normalized, search_normalized, split_fields
+from models import BatchSearchRequest, NutrientFilters
+from search import (
+    apply_projection,
+    build_search_pipeline,
+    decode_cursor,
+    distance_meters,
+    encode_cursor,
+    iter_search,
+    lowest_calories,
+    miles_to_meters,
+    near_query,
+    query_fingerprint,
+    resolve_fields,
+    search_with_aggregation,
+    search_with_find,
+    take_page,
+    to_miles,
+)
+from search_cache import render_json
+import services
+
+router = APIRouter()
+
+async def _search_results(collection, lat, lng, radius_in_meters, ranges, after, batch_size, fields,
+                          sort="distance", limit=None):
+    # (distance, restaurant) pairs in `sort` order from whichever backend is
+    # active. Paging needs distances, so the Mongo side always uses
+    # $geoNear here, even when SEARCH_USE_AGGREGATION is off.
+    index = services.search_index.index
+    if index is not None:
+        for pair in index.iter_search(lat, lng, radius_in_meters, ranges, after, fields, sort, limit):
+            yield pair
+        return
+
+    if get_settings().SEARCH_MENU_LAYOUT == "normalized":
+        items = collection.database[MENU_ITEMS_COLLECTION]
+        results = iter_search_normalized(collection, items, lat, lng, radius_in_meters, ranges, after, batch_size,
+                                         fields, sort, limit)
+    else:
+        results = iter_search(collection, lat, lng, radius_in_meters, ranges, after, batch_size, fields, sort, limit)
+    async with aclosing(results):
+        async for pair in results:
+            yield pair
+
+async def _search_all(collection, lat, lng, radius_in_meters, ranges, fields, sort="distance"):
+    index = services.search_index.index
+    if index is not None:
+        # In-process index: no Mongo round trip
+        return index.search(lat, lng, radius_in_meters, ranges, fields, sort)
+
+    settings = get_settings()
+    if settings.SEARCH_MENU_LAYOUT == "normalized":
+        # Menus come from the menu_items collection, qualifying items only
+        items = collection.database[MENU_ITEMS_COLLECTION]
+        return await search_normalized(collection, items, lat, lng, radius_in_meters, ranges, fields, sort)
+
+    if settings.SEARCH_USE_AGGREGATION:
+        # $geoNear + $filter: Mongo only returns matching restaurants and items
+        return await search_with_aggregation(collection, lat, lng, radius_in_meters, ranges, fields, sort)
+
+    # Fallback: $near query with nutrient filtering in Python
+    return await search_with_find(collection, lat, lng, radius_in_meters, ranges, fields, sort)
+
+async def _stream_ndjson(results, limit, fingerprint):
+    # One restaurant per line; when the page is cut by `limit` the last line
+    # is {"next_cursor": "..."} instead of a restaurant.
+    count = 0
+    last = None
+    try:
+        async with aclosing(results):
+            async for distance, doc in results:
+                if limit is not None and count == limit:
+                    yield render_json({"next_cursor": encode_cursor(*last, fingerprint)}) + b"\n"
+                    return
+                yield render_json(doc) + b"\n"
+                count += 1
+                last = (distance, doc["_id"])
+    except Exception as e:
+        # Headers are already sent, all we can do is end the stream
+        print(f"Search stream error: {e}")
+
+def _from_point(candidates, lat, lng, radius_in_meters, projection, sort):
+    # A cell's candidates as the search from (lat, lng) itself returns them:
+    # its radius, its distances and the same order as the backends
+    pairs = []
+    for doc in candidates:
+        distance = distance_meters(lat, lng, doc["location"]["coordinates"])
+        if distance <= radius_in_meters:
+            pairs.append((distance, dict(doc, distance_miles=to_miles(distance))))
+    if sort == "lowest_calorie_item":
+        pairs.sort(key=lambda pair: (lowest_calories(pair[1]), pair[0], str(pair[1]["_id"])))
+    else:
+        pairs.sort(key=lambda pair: (pair[0], str(pair[1]["_id"])))
+    return [apply_projection(doc, projection) if projection else doc for _, doc in pairs]
+
+async def _search_body(collection, lat, lng, mileage, ranges, projection, sort="distance") -> tuple:
+    # Rendered JSON for a whole (non-paged) search, the X-Cache state and the
+    # (lat, lng, radius) the backend was queried with
+    radius_in_meters = miles_to_meters(mileage)
+    if not get_settings().SEARCH_CACHE_ENABLED:
+        results = await _search_all(collection, lat, lng, radius_in_meters, ranges, projection, sort)
+        return render_json(results), None, (lat, lng, radius_in_meters)
+
+    # Everyone in the same grid cell shares one candidate set, whole documents
+    # so any projection and order can be applied per request
+    cache = services.search_cache
+    cell_lat, cell_lng = cache.snap(lat, lng)
+    searched = (cell_lat, cell_lng, radius_in_meters + cache.reach(cell_lat, cell_lng))
+    key = cache.key(cell_lat, cell_lng, mileage, ranges)
+    candidates = cache.get(key)
+    cache_state = "HIT"
+    if candidates is None:
+        candidates = await _search_all(collection, *searched, ranges, None)
+        cache.set(key, candidates)
+        cache_state = "MISS"
+
+    results = _from_point(candidates, lat, lng, radius_in_meters, projection, sort)
+    return render_json(results), cache_state, searched
+
+def _json_bytes(body: bytes, headers: Optional[dict] = None) -> Response:
+    # Search bodies are rendered with orjson up front, skip FastAPI's encoder
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _log_slow_search(started, collection, lat, lng, radius_in_meters, mileage, ranges, after, projection, sort,
+                     limit, stream):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if not services.slow_queries.is_slow(elapsed_ms):
+        return
+
+    # Rebuild the command the active backend ran so it can be explained
+    settings = get_settings()
+    paged = limit is not None or after is not None or stream
+    command = None
+    if services.search_index.index is not None:
+        backend = "memory"
+    elif settings.SEARCH_MENU_LAYOUT == "normalized":
+        # The geo half; menu items are a separate index-backed query
+        backend = "normalized"
+        pipeline = build_search_pipeline(lat, lng, radius_in_meters, after=after, keep_distance=True,
+                                         fields=split_fields(projection)[0], without_menus=True)
+        command = {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}}
+    elif paged or settings.SEARCH_USE_AGGREGATION:
+        backend = "geoNear"
+        pipeline = build_search_pipeline(lat, lng, radius_in_meters, ranges, after, keep_distance=paged,
+                                         fields=projection, sort=sort, limit=limit if paged else None)
+        command = {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}}
+    else:
+        backend = "near"
+        command = {"find": collection.name, "filter": near_query(lat, lng, radius_in_meters)}
+
+    shape = {"backend": backend, "filters": sorted(ranges), "sort": sort, "paged": paged, "stream": stream,
+             "projected": projection is not None}
+    params = {"lat": lat, "lng": lng, "mileage": mileage, "ranges": ranges, "limit": limit, "cursor": after is not None,
+              "fields": list(projection) if projection else None}
+    services.slow_queries.record(elapsed_ms, shape, params, collection.database, command)
+
+async def _timed_stream(chunks, done):
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        done()
+
+@router.get("/restaurants/search")
+async def search_restaurants(
+    lat: float,
+    lng: float,
+    mileage: int = 5,
+    filters: NutrientFilters = Depends(),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    profile: Literal["card", "detail", "full"] = "full",
+    fields: Optional[str] = None,
+    sort: Literal["distance", "lowest_calorie_item"] = "distance",
+):
+    settings = get_settings()
+    # The cap is a setting, so it is checked here rather than in Query()
+    if limit is not None and limit > settings.SEARCH_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=422, detail=f"limit must be at most {settings.SEARCH_MAX_PAGE_SIZE}")
+    if not db.client:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database not connected")
+    started = time.perf_counter()
+    
+    # Convert mileage to meters (1 mile ≈ 1609.34 meters)
+    radius_in_meters = miles_to_meters(mileage)
+    ranges = filters.ranges()
+    collection = db.search_db()["restaurants"]
+
+    # card / detail / full profile, or an explicit comma separated field list
+    try:
+        projection = resolve_fields(profile, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Continuation tokens are bound to the exact search they came from
+    fingerprint = query_fingerprint(lat, lng, radius_in_meters, ranges)
+    after = None
+    if cursor:
+        if sort != "distance":
+            raise HTTPException(status_code=400, detail="Cursors are only supported with sort=distance")
+        try:
+            after = decode_cursor(cursor, fingerprint)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    def log_if_slow(searched=(lat, lng, radius_in_meters)):
+        # Explain the search as it ran, the cache queries its cell's centre
+        _log_slow_search(started, collection, *searched, mileage, ranges, after, projection, sort, limit, stream)
+
+    try:
+        if limit is not None or after is not None or stream:
+            # Top k: the distance order stops reading the cursor after k + 1
+            # (one more tells whether there is a next page), other orders are
+            # cut to k by the sort itself and have no next page
+            batch_size = limit + 1 if limit is not None else settings.SEARCH_STREAM_BATCH_SIZE
+            results = _search_results(collection, lat, lng, radius_in_meters, ranges, after, batch_size, projection,
+                                      sort, limit)
+
+            if stream:
+                # Timed until the last line is sent
+                lines = _timed_stream(_stream_ndjson(results, limit, fingerprint), log_if_slow)
+                return StreamingResponse(lines, media_type="application/x-ndjson")
+
+            page, next_after = await take_page(results, limit)
+            headers = {}
+            if next_after is not None:
+                headers["X-Next-Cursor"] = encode_cursor(*next_after, fingerprint)
+            log_if_slow()
+            return _json_bytes(render_json(page), headers)
+
+        body, cache_state, searched = await _search_body(collection, lat, lng, mileage, ranges, projection, sort)
+        log_if_slow(searched)
+        return _json_bytes(body, {"X-Cache": cache_state} if cache_state else None)
+    except Exception as e:
+        print(f"Search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/restaurants/search/batch")
+async def search_restaurants_batch(request: BatchSearchRequest, http_request: Request):
+    settings = get_settings()
+    if not db.client:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database not connected")
+
+    if len(request.queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.SEARCH_BATCH_MAX_QUERIES} queries per batch")
+
+    try:
+        projection = resolve_fields(request.profile, request.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    collection = db.search_db()["restaurants"]
+    semaphore = asyncio.Semaphore(settings.SEARCH_BATCH_CONCURRENCY)
+
+    client = http_request.client.host if http_request.client else ""
+
+    async def run(query, ranges):
+        # Each sub-query takes a /restaurants/search slot like a single search
+        # would, so batches cannot fan out past the search limit
+        async with semaphore, services.admission.admit("/restaurants/search", client):
+            body, _, _ = await _search_body(collection, query.lat, query.lng, query.mileage, ranges, projection)
+            return body
+
+    # Identical sub-queries run once; different points in one grid cell still
+    # share the cell's cached candidates
+    tasks = {}
+    keys = []
+    for query in request.queries:
+        ranges = query.ranges()
+        key = (query.lat, query.lng, query.mileage, tuple(sorted(ranges.items())))
+        if key not in tasks:
+            tasks[key] = asyncio.create_task(run(query, ranges))
+        keys.append(key)
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except Rejected:
+        # Search is at capacity: AdmissionMiddleware answers 503 + Retry-After
+        for task in tasks.values():
+            task.cancel()
+        raise
+    except Exception as e:
+        for task in tasks.values():
+            task.cancel()
+        print(f"Batch search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # {"results": {"<request index>": [...]}} spliced from pre-rendered bodies
+    parts = [b'"%d":%s' % (index, tasks[key].result()) for index, key in enumerate(keys)]
+    return _json_bytes(b'{"results":{' + b",".join(parts) + b"}}")
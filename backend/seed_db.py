@@ -5,6 +5,7 @@ import string
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
+from import_restaurants import import_documents
 
 # Load environment variables
 load_dotenv()
@@ -317,37 +318,14 @@ async def seed_db():
     collection = db['restaurants']
 
     try:
-        # 1. Clear existing data
-        print("🧹 Clearing existing restaurants...")
-        await collection.delete_many({})
-        print("   ✅ Cleared!")
-
-        # 2. Prepare data with GeoJSON
-        print("🛠️  Preparing data...")
+        # 1. Load into a staging collection and swap it in, searches keep
+        # seeing the old data until the new one is indexed
         restaurants = get_mock_data()
+        print(f"📥 Importing {len(restaurants)} restaurants...")
+        progress = await import_documents(db, restaurants)
+        print(f"   ✅ {progress.summary()}")
         
-        for r in restaurants:
-            # Create GeoJSON location field
-            # MongoDB expects [longitude, latitude]
-            r['location'] = {
-                'type': 'Point',
-                'coordinates': [r['longitude'], r['latitude']]
-            }
-            # Ensure proper typing for lat/long if they exist
-            r['latitude'] = float(r['latitude'])
-            r['longitude'] = float(r['longitude'])
-
-        # 3. Insert data
-        print(f"📥 Inserting {len(restaurants)} restaurants...")
-        result = await collection.insert_many(restaurants)
-        print(f"   ✅ Successfully inserted {len(result.inserted_ids)} restaurants!")
-
-        # 4. Create Geospatial Index
-        print("📍 Creating geospatial index...")
-        await collection.create_index([("location", "2dsphere")])
-        print("   ✅ Index created!")
-        
-        # 5. Verify Insertion (Optional but good)
+        # 2. Verify Insertion (Optional but good)
         count = await collection.count_documents({})
         print(f"\n🎉 Database successfully seeded with {count} restaurants!")
 
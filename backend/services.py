@@ -0,0 +1,94 @@
+from admission import AdmissionControl, ConcurrencyLimiter, RateLimiter
+from config import get_settings
+from google_auth import GoogleVerifier
+from health import HealthMonitor, PoolMonitor
+from index_manager import GeoIndexManager
+from indexes import RequiredIndexes, required_indexes
+from search_cache import SearchCache
+from slow_queries import SlowQueryLog
+from write_behind import WriteBehindBuffer
+
+# Process-wide state shared by the app (main.py) and its routers. Nothing
+# here does I/O or imports a heavy dependency until it is first used, and
+# the singletons (and the settings they read) are only built on first access.
+
+SINGLETONS = (
+    "search_index", "search_cache", "google_verifier", "indexes", "pool_monitor",
+    "health", "slow_queries", "guest_writer", "admission",
+)
+
+
+def _build() -> dict:
+    settings = get_settings()
+    search_index = GeoIndexManager(settings.SEARCH_SNAPSHOT_PATH, settings.SEARCH_INDEX_REFRESH_SECONDS)
+    search_cache = SearchCache(
+        maxsize=settings.SEARCH_CACHE_MAXSIZE,
+        ttl=settings.SEARCH_CACHE_TTL_SECONDS,
+        grid_degrees=settings.SEARCH_CACHE_GRID_DEGREES,
+    )
+    google_verifier = GoogleVerifier(
+        userinfo_url=settings.GOOGLE_USERINFO_URL,
+        cache_ttl=settings.GOOGLE_USERINFO_CACHE_TTL_SECONDS,
+        cache_size=settings.GOOGLE_USERINFO_CACHE_MAXSIZE,
+        client_id=settings.GOOGLE_CLIENT_ID,
+        certs_url=settings.GOOGLE_CERTS_URL,
+        jwks_min_refresh=settings.GOOGLE_JWKS_MIN_REFRESH_SECONDS,
+        timeout=settings.GOOGLE_HTTP_TIMEOUT_SECONDS,
+        max_connections=settings.GOOGLE_HTTP_MAX_CONNECTIONS,
+    )
+    indexes = RequiredIndexes(required_indexes(settings.SEARCH_MENU_LAYOUT))
+    pool_monitor = PoolMonitor(settings.MONGO_MAX_POOL_SIZE)
+    health = HealthMonitor(
+        interval=settings.HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+        pool_saturation=settings.HEALTH_POOL_SATURATION,
+        pool=pool_monitor,
+        indexes=indexes,
+    )
+    slow_queries = SlowQueryLog(
+        threshold_ms=settings.SLOW_SEARCH_THRESHOLD_MS,
+        maxsize=settings.SLOW_SEARCH_LOG_SIZE,
+        explain=settings.SLOW_SEARCH_EXPLAIN,
+    )
+    guest_writer = WriteBehindBuffer(
+        maxsize=settings.GUEST_WRITE_QUEUE_SIZE,
+        batch_size=settings.GUEST_WRITE_BATCH_SIZE,
+        flush_interval=settings.GUEST_WRITE_FLUSH_SECONDS,
+        enqueue_timeout=settings.GUEST_WRITE_ENQUEUE_TIMEOUT_SECONDS,
+    )
+    # Batch search also takes /restaurants/search slots, so there are no
+    # limits at all when admission control is off
+    admission = AdmissionControl(
+        limits={
+            path: ConcurrencyLimiter(
+                limit,
+                max_waiting=settings.ADMISSION_MAX_WAITING,
+                timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+            )
+            for path, limit in settings.ADMISSION_LIMITS.items()
+        } if settings.ADMISSION_ENABLED else {},
+        rate_limits={
+            "/auth/guest": RateLimiter(settings.GUEST_AUTH_RATE_PER_SECOND, settings.GUEST_AUTH_BURST),
+        } if settings.GUEST_AUTH_RATE_PER_SECOND else {},
+    )
+    return {
+        "search_index": search_index,
+        "search_cache": search_cache,
+        "google_verifier": google_verifier,
+        "indexes": indexes,
+        "pool_monitor": pool_monitor,
+        "health": health,
+        "slow_queries": slow_queries,
+        "guest_writer": guest_writer,
+        "admission": admission,
+    }
+
+
+def __getattr__(name):
+    if name in SINGLETONS:
+        # setdefault keeps anything a test put in place before the first build
+        for key, value in _build().items():
+            globals().setdefault(key, value)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,115 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def _plan_nodes(plan):
+    # Winning plans are trees of inputStage / inputStages; SBE plans nest the
+    # classic tree under queryPlan
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        yield node
+        stack.extend(reversed(node.get("inputStages", [])))
+        for key in ("queryPlan", "inputStage"):
+            if key in node:
+                stack.append(node[key])
+
+
+def _query_layers(explain: dict):
+    # find explains, and aggregations pushed down whole, report at the top
+    # level; otherwise the query part sits in the first stage, $cursor or,
+    # for pipelines starting with $geoNear, $geoNearCursor
+    if "queryPlanner" in explain:
+        yield explain
+    for stage in explain.get("stages", [])[:1]:
+        for name, layer in stage.items():
+            if name.endswith("Cursor") and isinstance(layer, dict):
+                yield layer
+
+
+def summarize_explain(explain: dict) -> dict:
+    """Index used, keys / documents examined and result count of an
+    explain("executionStats") reply."""
+    stages, indexes = [], []
+    keys = docs = returned = millis = 0
+    for layer in _query_layers(explain):
+        for node in _plan_nodes(layer.get("queryPlanner", {}).get("winningPlan", {})):
+            if "stage" in node:
+                stages.append(node["stage"])
+            if node.get("indexName") and node["indexName"] not in indexes:
+                indexes.append(node["indexName"])
+        stats = layer.get("executionStats", {})
+        keys += stats.get("totalKeysExamined", 0)
+        docs += stats.get("totalDocsExamined", 0)
+        returned = stats.get("nReturned", returned)
+        millis += stats.get("executionTimeMillis", 0)
+    return {
+        "indexes": indexes,
+        "stages": stages,
+        "collection_scan": "COLLSCAN" in stages,
+        "keys_examined": keys,
+        "docs_examined": docs,
+        "returned": returned,
+        "execution_ms": millis,
+    }
+
+
+class SlowQueryLog:
+    """The last `maxsize` searches that took `threshold_ms` or longer.
+
+    Entries hold the query shape and parameters; when given the command
+    that served them, explain("executionStats") runs in the background
+    (one at a time, it re-executes the query) and its summary is filled in
+    afterwards.
+    """
+
+    def __init__(self, threshold_ms: float, maxsize: int = 100, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._entries = deque(maxlen=maxsize)
+        self._task: Optional[asyncio.Task] = None
+
+    def is_slow(self, elapsed_ms: float) -> bool:
+        return self.threshold_ms > 0 and elapsed_ms >= self.threshold_ms
+
+    def record(self, elapsed_ms: float, shape: dict, params: dict, database=None, command: Optional[dict] = None) -> dict:
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "elapsed_ms": round(elapsed_ms, 1),
+            "shape": shape,
+            "params": params,
+            "explain": None,
+        }
+        self._entries.append(entry)
+        print(f"Slow search ({elapsed_ms:.0f} ms): {shape} {params}")
+
+        if self.explain and database is not None and command is not None:
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._explain(entry, database, command))
+            else:
+                entry["explain"] = {"skipped": "another explain is running"}
+        return entry
+
+    async def _explain(self, entry: dict, database, command: dict):
+        try:
+            result = await database.command({"explain": command, "verbosity": "executionStats"})
+            entry["explain"] = summarize_explain(result)
+        except Exception as e:
+            entry["explain"] = {"error": str(e)}
+
+    def entries(self) -> list:
+        # Newest first
+        return list(reversed(self._entries))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,256 @@
+"""Restaurant catalogue snapshot shared by every worker on the box.
+
+    python snapshot.py [--path restaurants.snapshot]
+
+The search index columns (coordinates, ids, which ids are ObjectIds, menu
+offsets and nutrient columns) and the restaurant documents as JSON are
+written to one binary file, which every worker maps read-only. The pages
+live in the OS page cache once, however many workers map them; documents
+are decoded only for the restaurants a search returns.
+
+Layout: 8 byte magic, little-endian uint64 header length, JSON header
+(version, created_at, arrays as name -> [dtype, shape, offset]), then the
+arrays, each aligned to 64 bytes from the end of the header.
+
+A rewrite goes to a temporary file that is renamed over the old one, so
+workers still mapping the old file keep reading it until they swap.
+"""
+import argparse
+import asyncio
+import json
+import mmap
+import os
+import struct
+import time
+from collections.abc import Sequence
+from contextlib import asynccontextmanager
+from typing import Optional
+import numpy as np
+import orjson
+from bson import ObjectId
+from dataset import get_dataset_version
+from geo_index import GeoIndex
+from menu_store import MenuStore
+from search import NUTRIENT_FIELDS
+from search_cache import render_json
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: msvcrt byte-range locks instead of flock
+    fcntl = None
+    import msvcrt
+
+MAGIC = b"RSNAP002"
+ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+class SnapshotDocs(Sequence):
+    """Restaurant documents decoded from the mapped JSON blob on access.
+
+    Values orjson cannot encode natively (ObjectId, Decimal128) come back as
+    strings, which is how search responses render them anyway; only `_id`
+    is turned back into an ObjectId where `object_ids` says it was one, for
+    continuation tokens.
+    """
+
+    def __init__(self, buffer, offsets: np.ndarray, start: int, object_ids: np.ndarray):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.start = start
+        self.object_ids = object_ids
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("snapshot document index out of range")
+        begin, end = self.offsets[position], self.offsets[position + 1]
+        doc = orjson.loads(self.buffer[self.start + begin:self.start + end])
+        if self.object_ids[position]:
+            doc["_id"] = ObjectId(doc["_id"])
+        return doc
+
+
+def index_arrays(index: GeoIndex) -> dict:
+    docs = [render_json(doc) for doc in index.docs]
+    doc_offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    np.cumsum([len(doc) for doc in docs], out=doc_offsets[1:])
+    arrays = {
+        "lngs": index.lngs,
+        "lats": index.lats,
+        "cos_lats": index.cos_lats,
+        "ids": index.ids,
+        "object_ids": np.asarray([isinstance(doc["_id"], ObjectId) for doc in index.docs], dtype=np.bool_),
+        "menu_offsets": index.menus.offsets,
+        "menu_counts": index.menus.counts,
+        "doc_offsets": doc_offsets,
+        "docs": np.frombuffer(b"".join(docs), dtype=np.uint8),
+    }
+    for field in NUTRIENT_FIELDS:
+        arrays[f"menu_{field}"] = index.menus.columns[field]
+    return arrays
+
+
+def write_snapshot(path: str, index: GeoIndex):
+    """Write `index` to `path`, replacing any previous snapshot atomically."""
+    arrays = {name: np.ascontiguousarray(array) for name, array in index_arrays(index).items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({"version": index.version, "created_at": time.time(), "arrays": layout}).encode()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            start = _aligned(f.tell())
+            for name, array in arrays.items():
+                f.seek(start + layout[name][2])
+                f.write(array.tobytes())
+            # Empty trailing arrays still need their offset inside the file
+            f.truncate(start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Snapshot:
+    """A snapshot file mapped read-only. The arrays are views of the mapping,
+    which stays open for as long as any of them is referenced."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a restaurant snapshot")
+        (length,) = struct.unpack_from("<Q", self.buffer, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self.buffer[header_start:header_start + length])
+        self.version = header["version"]
+        self.created_at = header["created_at"]
+        self.start = _aligned(header_start + length)
+        self.layout = header["arrays"]
+        self.arrays = {
+            name: np.frombuffer(self.buffer, dtype=np.dtype(dtype), count=int(np.prod(shape)),
+                                offset=self.start + offset).reshape(shape)
+            for name, (dtype, shape, offset) in self.layout.items()
+        }
+
+    def is_fresh(self, version, max_age: float) -> bool:
+        # Without a dataset version counter, fall back to the snapshot's age
+        if version is None:
+            return self.version is None and time.time() - self.created_at < max_age
+        return self.version == version
+
+    def to_index(self) -> GeoIndex:
+        arrays = self.arrays
+        menus = MenuStore.from_arrays(
+            arrays["menu_offsets"], arrays["menu_counts"],
+            {field: arrays[f"menu_{field}"] for field in NUTRIENT_FIELDS},
+        )
+        docs = SnapshotDocs(self.buffer, arrays["doc_offsets"], self.start + self.layout["docs"][2],
+                            arrays["object_ids"])
+        return GeoIndex.from_arrays(docs, arrays["lngs"], arrays["lats"], arrays["cos_lats"], arrays["ids"],
+                                    menus, self.version)
+
+
+def open_snapshot(path: str) -> Optional[Snapshot]:
+    try:
+        return Snapshot(path)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    # LK_LOCK gives up after ~10 s, keep waiting like flock does
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@asynccontextmanager
+async def snapshot_lock(path: str):
+    # One writer per box: a lock on a sidecar file, waited for off the event loop
+    with open(f"{path}.lock", "a") as f:
+        await asyncio.to_thread(_lock, f)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+async def build_snapshot(database, path: str) -> Snapshot:
+    index = await GeoIndex.load(database)
+    await asyncio.to_thread(write_snapshot, path, index)
+    return Snapshot(path)
+
+
+async def load_shared(database, path: str, max_age: float) -> GeoIndex:
+    """Map the snapshot at `path`, rebuilding it first when it is missing or
+    older than the dataset. Only one worker rebuilds; the others wait for
+    the lock and then map what it wrote."""
+    version = await get_dataset_version(database)
+    snapshot = open_snapshot(path)
+    if snapshot is None or not snapshot.is_fresh(version, max_age):
+        async with snapshot_lock(path):
+            snapshot = open_snapshot(path)
+            if snapshot is None or not snapshot.is_fresh(version, max_age):
+                snapshot = await build_snapshot(database, path)
+    return snapshot.to_index()
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from config import settings
+
+    parser = argparse.ArgumentParser(description="Write the restaurant snapshot the API workers map")
+    parser.add_argument("--path", default=settings.SEARCH_SNAPSHOT_PATH or "restaurants.snapshot")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.MONGODB_URI)
+    try:
+        print("📦 Writing restaurant snapshot...")
+        async with snapshot_lock(args.path):
+            snapshot = await build_snapshot(client[settings.DB_NAME], args.path)
+        size = os.path.getsize(args.path) / 1024 / 1024
+        print(f"🎉 {len(snapshot.arrays['lngs'])} restaurants, version {snapshot.version}, {size:.1f} MiB "
+              f"written to {args.path}")
+    except Exception as e:
+        print(f"\n❌ SNAPSHOT FAILED: {str(e)}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
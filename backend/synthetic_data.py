@@ -0,0 +1,124 @@
+import argparse
+import json
+import math
+import random
+from datetime import datetime, timezone
+
+# Los Angeles area, as in seed_db.py
+DEFAULT_CENTER = (34.052235, -118.243683)
+
+# name -> (calorie range, share of calories from fat, carbs, protein, sugar share of carbs)
+DISHES = {
+    "Burger": ((450, 1100), (0.50, 0.32, 0.18, 0.20)),
+    "Cheeseburger": ((500, 1200), (0.52, 0.30, 0.18, 0.20)),
+    "Chicken Sandwich": ((400, 800), (0.40, 0.35, 0.25, 0.15)),
+    "Grilled Chicken Salad": ((250, 550), (0.45, 0.20, 0.35, 0.30)),
+    "Caesar Salad": ((300, 700), (0.65, 0.20, 0.15, 0.10)),
+    "Fries": ((220, 550), (0.45, 0.50, 0.05, 0.02)),
+    "Burrito": ((600, 1300), (0.35, 0.47, 0.18, 0.05)),
+    "Tacos": ((300, 700), (0.45, 0.35, 0.20, 0.05)),
+    "Burrito Bowl": ((450, 900), (0.35, 0.40, 0.25, 0.05)),
+    "Pepperoni Pizza Slice": ((280, 450), (0.40, 0.45, 0.15, 0.08)),
+    "Pasta": ((550, 1100), (0.30, 0.55, 0.15, 0.10)),
+    "Sushi Roll": ((250, 500), (0.20, 0.65, 0.15, 0.10)),
+    "Poke Bowl": ((400, 800), (0.25, 0.50, 0.25, 0.10)),
+    "Ramen": ((450, 900), (0.35, 0.50, 0.15, 0.05)),
+    "Fried Rice": ((500, 900), (0.30, 0.58, 0.12, 0.05)),
+    "Smoothie": ((180, 550), (0.05, 0.85, 0.10, 0.80)),
+    "Milkshake": ((500, 1100), (0.40, 0.52, 0.08, 0.85)),
+    "Cookie": ((150, 450), (0.45, 0.50, 0.05, 0.55)),
+    "Latte": ((100, 350), (0.35, 0.45, 0.20, 0.80)),
+    "Soda": ((0, 400), (0.0, 1.0, 0.0, 1.0)),
+    "Oatmeal": ((150, 400), (0.15, 0.70, 0.15, 0.35)),
+    "Egg Sandwich": ((300, 650), (0.45, 0.35, 0.20, 0.10)),
+}
+SIZES = ("", "Small ", "Medium ", "Large ", "Double ", "Kids ")
+CHAINS = ("Burger Barn", "Taco Town", "Green Bowl", "Slice House", "Noodle Bar", "Morning Cup", "Roll Call", "Shake Shed")
+
+
+def _macros(rng: random.Random, calories: int, shares: tuple) -> dict:
+    fat, carbs, protein, sugar = shares
+    # Jitter the split a little, then convert kcal to grams (9 per g of fat, 4 otherwise)
+    weights = [max(share * rng.uniform(0.85, 1.15), 0.0) for share in (fat, carbs, protein)]
+    total = sum(weights) or 1.0
+    fat_g, carbs_g, protein_g = (calories * weight / total / per_gram for weight, per_gram in zip(weights, (9, 4, 4)))
+    return {
+        "fat_g": round(fat_g),
+        "carbs_g": round(carbs_g),
+        "protein_g": round(protein_g),
+        "sugar_g": round(carbs_g * sugar * rng.uniform(0.8, 1.2)),
+    }
+
+
+def menu_item(rng: random.Random, restaurant_id: str, number: int, now: str) -> dict:
+    dish = rng.choice(list(DISHES))
+    (low, high), shares = DISHES[dish]
+    size = rng.choice(SIZES)
+    calories = round(rng.uniform(low, high) * {"Small ": 0.7, "Large ": 1.3, "Double ": 1.6, "Kids ": 0.5}.get(size, 1))
+    return {
+        "menu_item_id": f"{restaurant_id}-{number}",
+        "restaurant_id": restaurant_id,
+        "name": f"{size}{dish}",
+        "description": f"{size}{dish.lower()} made to order.",
+        "calories": calories,
+        **_macros(rng, calories, shares),
+        "created_date": now,
+        "last_modified_date": now,
+    }
+
+
+def random_point(rng: random.Random, center: tuple, radius_miles: float) -> tuple:
+    # Offset in miles from a neighbourhood centre, converted to degrees
+    distance = min(abs(rng.gauss(0, radius_miles / 2)), radius_miles)
+    bearing = rng.uniform(0, 2 * math.pi)
+    miles_per_degree = 69.0
+    lat = center[0] + distance * math.cos(bearing) / miles_per_degree
+    lng = center[1] + distance * math.sin(bearing) / (miles_per_degree * math.cos(math.radians(center[0])))
+    return lat, lng
+
+
+def generate_restaurants(count: int, seed: int = 0, center: tuple = DEFAULT_CENTER, radius_miles: float = 25,
+                         menu_size: tuple = (5, 60), neighbourhoods: int = 40):
+    """Yield `count` restaurants shaped like seed_db.py's mock data.
+
+    Restaurants cluster around `neighbourhoods` random centres within
+    `radius_miles` of `center`, like real ones do, and each gets a menu of
+    `menu_size` items with macros consistent with its calories. The same
+    seed always produces the same data.
+    """
+    rng = random.Random(seed)
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
+    centres = [random_point(rng, center, radius_miles) for _ in range(max(neighbourhoods, 1))]
+    for i in range(count):
+        restaurant_id = f"bench{i:07d}"
+        chain = rng.choice(CHAINS)
+        lat, lng = random_point(rng, rng.choice(centres), 3)
+        yield {
+            "restaurant_id": restaurant_id,
+            "name": f"{chain} #{i}",
+            "address": f"{rng.randint(1, 9999)} Main St, Anytown, USA",
+            "latitude": round(lat, 6),
+            "longitude": round(lng, 6),
+            "chain_name": chain,
+            "created_date": now,
+            "last_modified_date": now,
+            "menu_items": [menu_item(rng, restaurant_id, j, now) for j in range(rng.randint(*menu_size))],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic restaurants as JSONL (see import_restaurants.py)")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--out", default="restaurants.jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--radius-miles", type=float, default=25)
+    args = parser.parse_args()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        for restaurant in generate_restaurants(args.count, args.seed, radius_miles=args.radius_miles):
+            f.write(json.dumps(restaurant) + "\n")
+    print(f"✅ Wrote {args.count} restaurants to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
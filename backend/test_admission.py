@@ -0,0 +1,154 @@
+import asyncio
+import httpx
+import pytest
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+import admission
+import main
+from admission import AdmissionControl, ConcurrencyLimiter, RateLimiter, Rejected
+from memory_db import load_memory
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_per_client(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    limiter = RateLimiter(rate=0.5, burst=2)
+
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == pytest.approx(2)
+    # Other clients have their own bucket
+    assert limiter.acquire("b") == 0
+
+    clock.now += 1
+    assert limiter.acquire("a") == pytest.approx(1)
+    clock.now += 1
+    assert limiter.acquire("a") == 0
+    # Idle clients are back to a full burst
+    clock.now += 60
+    assert limiter.acquire("a") == limiter.acquire("a") == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter_queues_then_sheds():
+    limiter = ConcurrencyLimiter(limit=1, max_waiting=1, timeout=0.05, retry_after=3)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert (limiter.active, limiter.waiting) == (1, 1)
+
+    # Queue is full: turned away without waiting
+    with pytest.raises(Rejected) as rejected:
+        async with limiter.slot():
+            pass
+    assert (rejected.value.status, rejected.value.reason, rejected.value.retry_after) == (503, "queue_full", 3)
+
+    # The queued request gives up after the timeout
+    with pytest.raises(Rejected) as rejected:
+        await waiter
+    assert rejected.value.reason == "queue_timeout"
+
+    release.set()
+    await holder
+    assert (limiter.active, limiter.waiting) == (0, 0)
+    async with limiter.slot():
+        assert limiter.active == 1
+
+
+@pytest.mark.asyncio
+async def test_guest_sign_ins_are_rate_limited_per_client(monkeypatch):
+    mongo, _ = await load_memory([])
+    monkeypatch.setattr(main.db, "client", mongo)
+    monkeypatch.setattr(main.admission, "rate_limits", {"/auth/guest": RateLimiter(rate=0.1, burst=2)})
+    monkeypatch.setattr(main.admission, "rejected", {})
+
+    headers = {"Origin": "http://localhost:5173"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        statuses = [(await client.post("/auth/guest", headers=headers)).status_code for _ in range(2)]
+        response = await client.post("/auth/guest", headers=headers)
+        # Other routes are not rate limited
+        assert (await client.get("/livez")).status_code == 200
+
+    assert statuses == [200, 200]
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "10"
+    assert response.json() == {"detail": "Too many requests, please retry"}
+    # The browser can read the rejection
+    assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+    assert main.admission.rejected == {("/auth/guest", "rate_limited"): 1}
+
+
+@pytest.mark.asyncio
+async def test_busy_route_answers_503_with_retry_after(monkeypatch):
+    control = AdmissionControl(limits={"/restaurants/search": ConcurrencyLimiter(1, max_waiting=0, timeout=1)})
+    monkeypatch.setattr(main.admission, "limits", control.limits)
+    monkeypatch.setattr(main.admission, "rejected", {})
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        async with control.limits["/restaurants/search"].slot():
+            response = await client.get("/restaurants/search", params={"lat": 34.05, "lng": -118.24, "mileage": 1})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert main.admission.rejected == {("/restaurants/search", "queue_full"): 1}
+
+
+@pytest.mark.asyncio
+async def test_batch_sub_queries_share_the_search_limit(monkeypatch):
+    mongo, index = await load_memory([])
+    monkeypatch.setattr(main.db, "client", mongo)
+    monkeypatch.setattr(main.search_index, "index", index)
+    control = AdmissionControl(limits={"/restaurants/search": ConcurrencyLimiter(1, max_waiting=0, timeout=1)})
+    monkeypatch.setattr(main.admission, "limits", control.limits)
+    monkeypatch.setattr(main.admission, "rejected", {})
+
+    batch = {"queries": [{"lat": 34.05, "lng": -118.24, "mileage": 1}]}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        async with control.limits["/restaurants/search"].slot():
+            shed = await client.post("/restaurants/search/batch", json=batch)
+        served = await client.post("/restaurants/search/batch", json=batch)
+
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "1"
+    # One refused request, counted once under the route it was made to
+    assert main.admission.rejected == {("/restaurants/search/batch", "queue_full"): 1}
+    assert served.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_clients_behind_one_proxy_get_their_own_buckets(monkeypatch):
+    mongo, _ = await load_memory([])
+    monkeypatch.setattr(main.db, "client", mongo)
+    monkeypatch.setattr(main.admission, "rate_limits", {"/auth/guest": RateLimiter(rate=0.1, burst=1)})
+    monkeypatch.setattr(main.admission, "rejected", {})
+
+    # What uvicorn serves with FORWARDED_ALLOW_IPS set to the proxy's address
+    app = ProxyHeadersMiddleware(main.app, trusted_hosts="10.0.0.1")
+    transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 40000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as proxy:
+        async def sign_in(visitor):
+            response = await proxy.post("/auth/guest", headers={"X-Forwarded-For": visitor})
+            return response.status_code
+
+        statuses = [await sign_in("203.0.113.7"), await sign_in("198.51.100.4"), await sign_in("203.0.113.7")]
+
+    assert statuses == [200, 200, 429]
+
+
+def test_guest_rate_limit_is_off_by_default():
+    assert main.settings.GUEST_AUTH_RATE_PER_SECOND is None
+    assert main.admission.rate_limits == {}
@@ -0,0 +1,77 @@
+import time
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+import auth
+from auth import cache_user, create_access_token, get_current_user, invalidate_user, verify_access_token
+from models import UserInDB
+
+
+def make_user(user_id):
+    return UserInDB(
+        user_id=user_id,
+        display_name="Guest User",
+        is_guest=True,
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(user: UserInDB = Depends(get_current_user)):
+        return {"user_id": user.user_id}
+
+    return app
+
+
+def test_valid_token_is_verified_once():
+    token = create_access_token({"sub": "user-1", "is_guest": True}, timedelta(minutes=5))
+
+    assert verify_access_token(token).user_id == "user-1"
+    assert token in auth._verified_tokens()
+    assert verify_access_token(token).user_id == "user-1"
+
+
+def test_cached_token_does_not_outlive_exp():
+    token = create_access_token({"sub": "user-2"}, timedelta(seconds=1))
+    assert verify_access_token(token).user_id == "user-2"
+
+    # exp has whole-second precision
+    time.sleep(2.1)
+    assert token not in auth._verified_tokens()
+    with pytest.raises(HTTPException) as exc:
+        verify_access_token(token)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.parametrize("token", [
+    "not-a-jwt",
+    create_access_token({"sub": "user-3"}, timedelta(minutes=5))[:-4] + "abcd",
+    create_access_token({"is_guest": True}, timedelta(minutes=5)),
+])
+def test_invalid_tokens_are_rejected(token):
+    with pytest.raises(HTTPException) as exc:
+        verify_access_token(token)
+    assert exc.value.status_code == 401
+    assert token not in auth._verified_tokens()
+
+
+@pytest.mark.asyncio
+async def test_current_user_served_from_user_cache():
+    cache_user(make_user("user-4"))
+    token = create_access_token({"sub": "user-4"}, timedelta(minutes=5))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app()), base_url="http://test") as client:
+        response = await client.get("/me", headers={"Authorization": f"Bearer {token}"})
+        missing = await client.get("/me")
+
+    assert response.status_code == 200
+    assert response.json() == {"user_id": "user-4"}
+    assert missing.status_code == 401
+    assert missing.headers["www-authenticate"] == "Bearer"
+
+    invalidate_user("user-4")
+    assert "user-4" not in auth._users()
@@ -0,0 +1,46 @@
+import pytest
+from pymongo.read_preferences import Primary, SecondaryPreferred
+import database
+from database import Database, create_client, read_preference, warm_up
+from fakes import FakeClient
+
+
+def test_read_preference():
+    assert read_preference("primary") == Primary()
+    assert read_preference("secondaryPreferred", 120) == SecondaryPreferred(max_staleness=120)
+
+
+def test_create_client_applies_pool_settings(monkeypatch):
+    monkeypatch.setattr(database.settings, "MONGO_MAX_POOL_SIZE", 7)
+    monkeypatch.setattr(database.settings, "MONGO_MAX_IDLE_TIME_MS", 30000)
+    monkeypatch.setattr(database.settings, "MONGO_WAIT_QUEUE_TIMEOUT_MS", 500)
+
+    client = create_client()
+    try:
+        pool = client.options.pool_options
+        assert pool.max_pool_size == 7
+        assert pool.max_idle_time_seconds == 30
+        assert pool.wait_queue_timeout == 0.5
+    finally:
+        client.close()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_connections_per_read_preference():
+    client = FakeClient(delay=0.01)
+
+    await warm_up(client, 5, [Primary(), SecondaryPreferred(), Primary()])
+
+    assert client.admin.max_in_flight == 10
+    assert client.admin.preferences.count(Primary()) == 5
+
+
+def test_search_and_auth_use_their_own_read_preference():
+    db = Database()
+    db.client = create_client()
+    db.search_read_preference = SecondaryPreferred()
+    try:
+        assert db.search_db()["restaurants"].read_preference == SecondaryPreferred()
+        assert db.auth_db()["users"].read_preference == Primary()
+    finally:
+        db.client.close()
@@ -0,0 +1,133 @@
+import threading
+import pytest
+from bson import ObjectId
+from fakes import LA, FakeDatabase, make_restaurant
+from geo_index import GeoIndex, haversine_meters
+from index_manager import GeoIndexManager
+from search import distance_meters, miles_to_meters
+import numpy as np
+
+
+def make_index():
+    return GeoIndex([
+        make_restaurant("far", 34.20, -118.243683, 200),       # ~10 miles north
+        make_restaurant("here", *LA, 250, 550),
+        make_restaurant("near", 34.07, -118.243683, 700),      # ~1.2 miles north
+        make_restaurant("nowhere", 40.0, -74.0, 100),
+        {"_id": ObjectId(), "name": "no location", "menu_items": []},
+    ], version=3)
+
+
+def test_haversine_matches_known_distance():
+    # One degree of latitude on MongoDB's sphere
+    lats = np.radians(np.array([1.0]))
+    lngs = np.radians(np.array([0.0]))
+    distance = haversine_meters(0.0, 0.0, lats, lngs)[0]
+    assert abs(distance - 111318.8) < 1
+
+
+def test_scalar_haversine_agrees_with_vectorized():
+    lats = np.radians(np.array([34.07, 40.0]))
+    lngs = np.radians(np.array([-118.243683, -74.0]))
+    expected = haversine_meters(*LA, lats, lngs)
+    actual = [distance_meters(*LA, [-118.243683, 34.07]), distance_meters(*LA, [-74.0, 40.0])]
+    assert np.allclose(actual, expected)
+
+
+def test_index_skips_documents_without_location():
+    index = make_index()
+    assert len(index) == 4
+    assert index.version == 3
+    # Documents keep their ObjectIds, ties are ordered on the string form
+    assert all(isinstance(doc["_id"], ObjectId) for doc in index.docs)
+    assert index.ids.tolist() == [str(doc["_id"]) for doc in index.docs]
+
+
+def test_search_returns_restaurants_in_radius_nearest_first():
+    results = make_index().search(*LA, miles_to_meters(5))
+    assert [r["name"] for r in results] == ["here", "near"]
+
+    results = make_index().search(*LA, miles_to_meters(50))
+    assert [r["name"] for r in results] == ["here", "near", "far"]
+
+
+def test_search_applies_nutrient_filter_without_mutating_index():
+    index = make_index()
+    results = index.search(*LA, miles_to_meters(5), {"calories": (None, 300)})
+
+    assert [r["name"] for r in results] == ["here"]
+    assert [item["calories"] for item in results[0]["menu_items"]] == [250]
+    # The indexed document keeps its full menu
+    here = next(doc for doc in index.docs if doc["name"] == "here")
+    assert len(here["menu_items"]) == 2
+
+
+def test_empty_index():
+    index = GeoIndex([])
+    assert len(index) == 0
+    assert index.search(*LA, miles_to_meters(5)) == []
+
+
+def test_results_report_distance_in_miles():
+    results = make_index().search(*LA, miles_to_meters(50))
+    assert [r["distance_miles"] for r in results][0] == 0
+    assert 1.1 < results[1]["distance_miles"] < 1.3
+    assert 10 < results[2]["distance_miles"] < 11
+
+
+def test_sort_by_lowest_calorie_item():
+    index = make_index()
+    results = index.search(*LA, miles_to_meters(50), sort="lowest_calorie_item")
+    assert [r["name"] for r in results] == ["far", "here", "near"]
+
+    # Only matching items count: "here" drops its 250 calorie item
+    results = index.search(*LA, miles_to_meters(50), {"calories": (300, None)}, sort="lowest_calorie_item")
+    assert [r["name"] for r in results] == ["here", "near"]
+    assert [item["calories"] for item in results[0]["menu_items"]] == [550]
+
+
+def test_top_k_keeps_distance_order_for_ties():
+    index = GeoIndex([
+        make_restaurant(f"r{i}", LA[0] + i * 0.001, LA[1], 100 * (i % 3))
+        for i in range(9)
+    ])
+    pairs = list(index.iter_search(*LA, miles_to_meters(5), sort="lowest_calorie_item", limit=4))
+
+    assert [doc["name"] for _, doc in pairs] == ["r0", "r3", "r6", "r1"]
+    assert [doc["name"] for _, doc in index.iter_search(*LA, miles_to_meters(5), sort="lowest_calorie_item", limit=20)] == [
+        "r0", "r3", "r6", "r1", "r4", "r7", "r2", "r5", "r8",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_index_is_built_off_the_event_loop(monkeypatch):
+    threads = []
+    build = GeoIndex.__init__
+
+    def record_thread(self, docs, version=None):
+        threads.append(threading.current_thread())
+        build(self, docs, version)
+
+    monkeypatch.setattr(GeoIndex, "__init__", record_thread)
+    index = await GeoIndex.load(FakeDatabase([make_restaurant("here", *LA, 250)], version=2))
+
+    assert (len(index), index.version) == (1, 2)
+    assert threads and threads[0] is not threading.main_thread()
+
+
+@pytest.mark.asyncio
+async def test_manager_rebuilds_only_when_the_version_changes():
+    database = FakeDatabase([make_restaurant("here", *LA, 250)], version=None)
+    manager = GeoIndexManager()
+
+    await manager.refresh(database, force=True)
+    # No version counter: polls keep the loaded index instead of reloading
+    assert not await manager.refresh(database)
+    assert database["restaurants"].finds == 1
+
+    database["meta"].docs.append({"_id": "restaurants", "version": 1})
+    database["restaurants"].docs.append(make_restaurant("near", 34.07, -118.243683, 700))
+    assert await manager.refresh(database)
+    assert not await manager.refresh(database)
+    assert database["restaurants"].finds == 2
+    assert (len(manager.index), manager.index.version) == (2, 1)
@@ -0,0 +1,118 @@
+import time
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from google_auth import looks_like_jwt
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_jwk = jwk.construct(pem, "RS256").public_key().to_dict()
+    public_jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return pem, public_jwk
+
+
+KEY_1 = make_key("key-1")
+KEY_2 = make_key("key-2")
+
+
+def sign(key, **overrides):
+    pem, public_jwk = key
+    now = int(time.time())
+    claims = {
+        "iss": "https://accounts.google.com",
+        "aud": CLIENT_ID,
+        "sub": "1234567890",
+        "email": "jane@example.com",
+        "name": "Jane Doe",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, pem, algorithm="RS256", headers={"kid": public_jwk["kid"]})
+
+
+def test_looks_like_jwt():
+    assert looks_like_jwt(sign(KEY_1))
+    assert not looks_like_jwt("ya29.a0AfH6SMBx")
+
+
+@pytest.fixture
+def verifier_for(google, make_verifier):
+    # A verifier for our client id against certs serving `keys`
+    def make(keys, **kwargs):
+        google.state.keys = keys
+        return make_verifier(client_id=CLIENT_ID, **kwargs)
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_valid_id_token_is_verified_with_one_certs_fetch(google, verifier_for):
+    verifier = verifier_for([KEY_1])
+    for _ in range(3):
+        claims = await verifier.verify_id_token(sign(KEY_1))
+        assert claims["sub"] == "1234567890"
+        assert claims["email"] == "jane@example.com"
+
+    assert google.state.calls == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("overrides", [
+    {"aud": "someone-else.apps.googleusercontent.com"},
+    {"iss": "https://evil.example.com"},
+    {"exp": int(time.time()) - 600},
+])
+async def test_bad_claims_are_rejected(verifier_for, overrides):
+    verifier = verifier_for([KEY_1])
+    with pytest.raises(ValueError):
+        await verifier.verify_id_token(sign(KEY_1, **overrides))
+
+
+@pytest.mark.asyncio
+async def test_token_signed_by_unknown_key_is_rejected(verifier_for):
+    pem, _ = make_key("key-1")  # same kid, different key
+    verifier = verifier_for([KEY_1])
+    with pytest.raises(ValueError):
+        await verifier.verify_id_token(sign((pem, KEY_1[1])))
+
+
+@pytest.mark.asyncio
+async def test_key_rotation_refetches_certs(google, verifier_for):
+    verifier = verifier_for([KEY_1], jwks_min_refresh=0)
+    await verifier.verify_id_token(sign(KEY_1))
+    google.state.keys = [KEY_1, KEY_2]
+    claims = await verifier.verify_id_token(sign(KEY_2))
+
+    assert claims["sub"] == "1234567890"
+    assert google.state.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_kids_do_not_hammer_google(google, verifier_for):
+    verifier = verifier_for([KEY_1], jwks_min_refresh=60)
+    await verifier.verify_id_token(sign(KEY_1))
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            await verifier.verify_id_token(sign(KEY_2))
+
+    assert google.state.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_are_refetched(google, verifier_for):
+    google.state.max_age = 0
+    verifier = verifier_for([KEY_1])
+    await verifier.verify_id_token(sign(KEY_1))
+    await verifier.verify_id_token(sign(KEY_1))
+
+    assert google.state.calls == 2
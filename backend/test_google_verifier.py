@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_valid_token_returns_userinfo_and_is_cached(google, make_verifier):
+    verifier = make_verifier()
+    first = await verifier.userinfo("good-token")
+    second = await verifier.userinfo("good-token")
+
+    assert first == second == google.state.users["good-token"]
+    assert google.state.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_token_raises_and_is_not_cached(google, make_verifier):
+    verifier = make_verifier()
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await verifier.userinfo("mock-google-token-123")
+
+    assert google.state.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_lookup(google, make_verifier):
+    google.state.delay = 0.05
+    verifier = make_verifier()
+    results = await asyncio.gather(*[verifier.userinfo("good-token") for _ in range(5)])
+
+    assert all(result == google.state.users["good-token"] for result in results)
+    assert google.state.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_entries_expire(google, make_verifier):
+    verifier = make_verifier(cache_ttl=0.05)
+    await verifier.userinfo("good-token")
+    await asyncio.sleep(0.1)
+    await verifier.userinfo("good-token")
+
+    assert google.state.calls == 2
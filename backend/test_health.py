@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from pymongo.monitoring import ConnectionCheckOutFailedReason
+import main
+import services
+from fakes import FakeClient, FakeDatabase
+from health import HealthMonitor, PoolMonitor
+from indexes import RequiredIndexes, required_indexes
+
+SERVER = ("db.example", 27017)
+
+
+def event(**fields):
+    return SimpleNamespace(address=SERVER, **fields)
+
+
+def test_pool_monitor_tracks_checkouts_and_saturation():
+    pool = PoolMonitor(max_pool_size=4)
+    for _ in range(4):
+        pool.connection_created(event())
+    for _ in range(3):
+        pool.connection_checked_out(event())
+    pool.connection_check_out_failed(event(reason=ConnectionCheckOutFailedReason.TIMEOUT))
+
+    assert pool.stats() == {"db.example:27017": {"in_use": 3, "open": 4, "wait_timeouts": 1, "max": 4}}
+    assert pool.saturated(0.75) and not pool.saturated(1.0)
+
+    pool.connection_checked_in(event())
+    assert not pool.saturated(0.75)
+    pool.pool_closed(event())
+    assert pool.stats() == {}
+
+
+@pytest.mark.asyncio
+async def test_readiness_follows_last_check():
+    client = FakeClient()
+    database = FakeDatabase()
+    database["users"].fail_indexes = True
+    monitor = HealthMonitor(interval=60, timeout=0.05, pool=PoolMonitor(10),
+                            indexes=RequiredIndexes(required_indexes()))
+
+    ready, body = monitor.readiness()
+    assert not ready and body["db"] == "disconnected"
+
+    # Indexes were never checked (Mongo down at startup), so they are created
+    await monitor.check(client, database=database)
+    ready, body = monitor.readiness()
+    assert not ready and body["db"] == "connected" and body["ping_ms"] >= 0
+    assert body["missing_indexes"] == ["users.user_id_1", "users.google_id_1"]
+    assert "location_2dsphere" in database["restaurants"].info
+
+    client.admin.delay = 1
+    await monitor.check(client)
+    ready, body = monitor.readiness()
+    assert not ready and body["details"] == "TimeoutError"
+
+    # Built out of band: the next check finds them
+    client.admin.delay = 0
+    database["users"].fail_indexes = False
+    await database["users"].create_indexes(required_indexes()["users"])
+    await monitor.check(client, database=database)
+    ready, body = monitor.readiness()
+    assert ready and body["status"] == "ok" and "missing_indexes" not in body
+
+
+@pytest.mark.asyncio
+async def test_background_checks_and_stale_state():
+    client = FakeClient()
+    monitor = HealthMonitor(interval=0.01, timeout=0.01)
+
+    await monitor.start(client)
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    assert client.admin.pings > 2
+    assert monitor.readiness()[0]
+
+    monitor.checked_at -= 60
+    ready, body = monitor.readiness()
+    assert not ready and body["stale"] is True
+
+
+@pytest.mark.asyncio
+async def test_probe_endpoints_do_not_touch_mongo(monkeypatch):
+    monitor = HealthMonitor(interval=60)
+    monkeypatch.setattr(services, "health", monitor)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        live = await client.get("/livez")
+        not_ready = await client.get("/readyz")
+        await monitor.check(FakeClient())
+        ready = await client.get("/readyz")
+        legacy = await client.get("/healthz")
+
+    assert live.status_code == 200
+    assert not_ready.status_code == 503
+    assert ready.status_code == 200 and ready.json()["db"] == "connected"
+    assert legacy.json() == ready.json()
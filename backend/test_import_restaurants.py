@@ -0,0 +1,199 @@
+import json
+from datetime import datetime, timezone
+import pytest
+from fakes import FakeDatabase
+from import_restaurants import (
+    Progress,
+    chunked,
+    import_documents,
+    is_newer,
+    parse_date,
+    read_records,
+    sync_documents,
+    with_location,
+    write_chunks,
+)
+
+
+def make_rows(count):
+    return [
+        {"restaurant_id": f"r{i}", "name": f"Restaurant {i}", "latitude": "34.05", "longitude": str(-118 - i / 1000)}
+        for i in range(count)
+    ]
+
+
+def test_readers_stream_jsonl_and_csv(tmp_path):
+    jsonl = tmp_path / "restaurants.jsonl"
+    jsonl.write_text("\n".join(json.dumps(row) for row in make_rows(3)) + "\n\n")
+    csv_path = tmp_path / "restaurants.csv"
+    csv_path.write_text(
+        "restaurant_id,name,latitude,longitude,menu_items\n"
+        'r0,Zero,34.05,-118.24,"[{""name"": ""Salad"", ""calories"": 120}]"\n'
+    )
+
+    assert [row["restaurant_id"] for row in read_records(str(jsonl))] == ["r0", "r1", "r2"]
+    rows = list(read_records(str(csv_path)))
+    assert rows[0]["menu_items"] == [{"name": "Salad", "calories": 120}]
+
+
+def test_with_location_builds_geojson_and_skips_bad_rows():
+    progress = Progress()
+    rows = make_rows(2) + [{"restaurant_id": "bad", "latitude": "n/a", "longitude": "1"}, {"restaurant_id": "none"}]
+
+    docs = list(with_location(rows, progress))
+
+    assert [doc["restaurant_id"] for doc in docs] == ["r0", "r1"]
+    assert docs[1]["location"] == {"type": "Point", "coordinates": [-118.001, 34.05]}
+    assert isinstance(docs[0]["latitude"], float)
+    assert (progress.read, progress.skipped) == (4, 2)
+
+
+@pytest.mark.asyncio
+async def test_write_chunks_bounds_concurrency_and_counts_rejects():
+    progress = Progress()
+    collection = FakeDatabase(delay=0.01, reject={"r3"})["restaurants"]
+
+    await write_chunks(collection, chunked(make_rows(95), 10), 3, progress)
+
+    assert collection.max_in_flight == 3
+    assert (progress.inserted, progress.failed) == (94, 1)
+
+
+@pytest.mark.asyncio
+async def test_import_swaps_in_indexed_staging_collection():
+    database = FakeDatabase()
+
+    progress = await import_documents(database, iter(make_rows(25)), chunk_size=10)
+
+    restaurants = database["restaurants"]
+    assert progress.inserted == 25
+    assert len(restaurants.docs) == 25
+    assert list(restaurants.info) == ["_id_", "location_2dsphere"]
+    assert "restaurants_import" not in database
+    assert database.events == [
+        ("drop", "restaurants_import"),
+        ("drop", "menu_items_import"),
+        ("rename", "menu_items_import", "menu_items"),
+        ("rename", "restaurants_import", "restaurants"),
+        ("bump", "restaurants"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_import_and_sync_rebuild_menu_items():
+    database = FakeDatabase()
+    rows = [dict(row, menu_items=[{"name": "salad", "calories": 100 * i}]) for i, row in enumerate(make_rows(3))]
+
+    await import_documents(database, iter(rows))
+    assert [(doc["restaurant_id"], doc["calories"]) for doc in database["menu_items"].docs] == [
+        ("r0", 0), ("r1", 100), ("r2", 200),
+    ]
+
+    feed = [dict(rows[0], menu_items=[{"name": "soup", "calories": 50}, {"name": "salad", "calories": 0}])]
+    await sync_documents(database, iter(feed))
+    assert [(doc["name"], doc["position"]) for doc in database["menu_items"].docs] == [("soup", 0), ("salad", 1)]
+    assert database.events[-2:] == [("rename", "menu_items_import", "menu_items"), ("bump", "restaurants")]
+
+
+@pytest.mark.asyncio
+async def test_empty_import_keeps_current_collection():
+    database = FakeDatabase()
+
+    with pytest.raises(ValueError):
+        await import_documents(database, iter([{"restaurant_id": "none"}]))
+
+    assert ("rename", "restaurants_import", "restaurants") not in database.events
+    assert database.events[-1] == ("drop", "restaurants_import")
+
+
+@pytest.mark.asyncio
+async def test_failed_import_drops_staging_collection():
+    database = FakeDatabase()
+    staging = database["restaurants_import"]
+
+    async def fail(keys, **options):
+        raise RuntimeError("index build failed")
+
+    staging.create_index = fail
+    with pytest.raises(RuntimeError):
+        await import_documents(database, iter(make_rows(5)))
+
+    assert ("rename", "restaurants_import", "restaurants") not in database.events
+    assert database.events[-1] == ("drop", "restaurants_import")
+    assert staging.docs == []
+
+
+def test_parse_date_matches_stored_dates():
+    # Mongo returns naive UTC datetimes truncated to milliseconds
+    stored = datetime(2024, 1, 1, 8, 30, 0, 123000)
+    assert parse_date("2024-01-01T08:30:00.123456Z") == stored
+    assert parse_date("2024-01-01T09:30:00.123+01:00") == stored
+    assert parse_date(datetime(2024, 1, 1, 8, 30, 0, 123999, tzinfo=timezone.utc)) == stored
+    assert parse_date("") is None and parse_date(None) is None
+    with pytest.raises(ValueError):
+        parse_date("yesterday")
+
+
+def test_is_newer():
+    january, february = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    assert is_newer(february, january)
+    assert not is_newer(january, january)
+    assert not is_newer(january, february)
+    assert is_newer(None, january)
+    # Stored before dates were parsed
+    assert is_newer(january, "2024-01-01T00:00:00Z")
+
+
+@pytest.mark.asyncio
+async def test_sync_writes_only_changed_restaurants_and_deletes_missing():
+    database = FakeDatabase()
+    restaurants = database["restaurants"]
+    for i, row in enumerate(make_rows(4)):
+        restaurants.docs.append(dict(row, _id=i, last_modified_date=datetime(2024, 1, 1)))
+
+    feed = [
+        dict(make_rows(4)[0], last_modified_date="2024-01-01T00:00:00Z"),      # unchanged
+        dict(make_rows(4)[1], last_modified_date="2024-03-01T00:00:00Z"),      # modified
+        dict(make_rows(6)[5], last_modified_date="2024-03-01T00:00:00Z"),      # new
+        {"name": "no id", "latitude": 1, "longitude": 2},                      # skipped
+    ]
+    progress = await sync_documents(database, iter(feed), chunk_size=2)
+
+    assert (progress.inserted, progress.updated, progress.unchanged, progress.deleted) == (1, 1, 1, 2)
+    assert progress.skipped == 1
+    assert sorted(doc["restaurant_id"] for doc in restaurants.docs) == ["r0", "r1", "r5"]
+    assert [event for event in database.events if event[0] == "replace"] == [("replace", "r1"), ("replace", "r5")]
+    assert database.events[-1] == ("bump", "restaurants")
+
+
+@pytest.mark.asyncio
+async def test_sync_without_changes_keeps_dataset_version():
+    database = FakeDatabase()
+    row = dict(make_rows(1)[0], last_modified_date="2024-01-01T00:00:00Z")
+    database["restaurants"].docs.append(dict(row, _id=0, last_modified_date=datetime(2024, 1, 1)))
+
+    progress = await sync_documents(database, iter([dict(row)]))
+
+    assert progress.unchanged == 1 and progress.changed == 0
+    assert ("bump", "restaurants") not in database.events
+
+    with pytest.raises(ValueError):
+        await sync_documents(database, iter([]))
+    assert len(database["restaurants"].docs) == 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_sync_of_the_same_file_writes_nothing(tmp_path):
+    jsonl = tmp_path / "restaurants.jsonl"
+    rows = [dict(row, created_date="2024-01-01T00:00:00Z", last_modified_date="2024-03-01T12:00:00.250Z")
+            for row in make_rows(3)]
+    jsonl.write_text("\n".join(json.dumps(row) for row in rows))
+    database = FakeDatabase()
+
+    first = await sync_documents(database, read_records(str(jsonl)))
+    events = len(database.events)
+    second = await sync_documents(database, read_records(str(jsonl)))
+
+    assert first.inserted == 3 and database["restaurants"].docs[0]["created_date"] == datetime(2024, 1, 1)
+    assert (second.unchanged, second.changed) == (3, 0)
+    assert database.events[events:] == []
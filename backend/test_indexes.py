@@ -0,0 +1,41 @@
+import pytest
+from fakes import FakeDatabase
+from indexes import RequiredIndexes, missing_indexes, required_indexes
+
+
+def test_required_indexes():
+    indexes = required_indexes()
+    assert set(indexes) == {"restaurants", "users"}
+    google_id = indexes["users"][1].document
+    assert google_id["unique"] is True
+    assert google_id["partialFilterExpression"] == {"google_id": {"$gt": ""}}
+    assert "menu_items" in required_indexes("normalized")
+
+
+@pytest.mark.asyncio
+async def test_ensure_creates_everything():
+    database = FakeDatabase()
+    indexes = RequiredIndexes(required_indexes())
+    assert not indexes.ready
+
+    assert await indexes.ensure(database) == []
+    assert indexes.ready
+    assert database["restaurants"].info["location_2dsphere"]["key"] == [("location", "2dsphere")]
+
+
+@pytest.mark.asyncio
+async def test_failed_or_mismatched_indexes_are_reported():
+    database = FakeDatabase()
+    database["users"].fail_indexes = True
+    # A non-unique index on the same key does not count
+    database["users"].info["user_id_1"] = {"key": [("user_id", 1)], "v": 2}
+    indexes = RequiredIndexes(required_indexes())
+
+    assert await indexes.ensure(database) == ["users.user_id_1", "users.google_id_1"]
+    assert not indexes.ready
+
+    database["users"].fail_indexes = False
+    del database["users"].info["user_id_1"]
+    await database["users"].create_indexes(indexes.indexes["users"])
+    assert await indexes.verify(database) == []
+    assert await missing_indexes(database, required_indexes()) == []
@@ -0,0 +1,46 @@
+import pytest
+from config import settings
+from import_restaurants import Progress, with_location
+from loadtest import bench_app, compare, plan_requests, run_load
+from memory_db import load_memory
+from synthetic_data import generate_restaurants
+
+
+def test_synthetic_restaurants_are_reproducible():
+    first = list(generate_restaurants(20, seed=7, menu_size=(3, 8)))
+    assert first == list(generate_restaurants(20, seed=7, menu_size=(3, 8)))
+    assert first != list(generate_restaurants(20, seed=8, menu_size=(3, 8)))
+
+    restaurant = first[0]
+    assert all(3 <= len(r["menu_items"]) <= 8 for r in first)
+    item = restaurant["menu_items"][0]
+    assert item["restaurant_id"] == restaurant["restaurant_id"]
+    assert {"calories", "fat_g", "carbs_g", "protein_g", "sugar_g"} <= set(item)
+    # Macros add up to roughly the calories
+    assert abs(9 * item["fat_g"] + 4 * (item["carbs_g"] + item["protein_g"]) - item["calories"]) <= 15
+    # The importer accepts them as they are
+    assert len(list(with_location(first, Progress()))) == 20
+
+
+def test_request_plan_is_reproducible():
+    planned = plan_requests(200, seed=3)
+    assert planned == plan_requests(200, seed=3)
+    assert {endpoint for endpoint, *_ in planned} == {"search", "guest", "healthz"}
+
+
+@pytest.mark.asyncio
+async def test_load_run_reports_each_endpoint():
+    client, index = await load_memory(generate_restaurants(200, menu_size=(2, 6)))
+
+    async with bench_app(client, index) as app:
+        report = await run_load(app, plan_requests(60, seed=1), concurrency=4, warmup=5)
+
+    assert report["total"]["requests"] == 55
+    assert report["total"]["errors"] == 0
+    search = report["endpoints"]["search"]
+    assert set(search["latency_ms"]) == {"mean", "p50", "p95", "p99", "max"}
+    assert search["latency_ms"]["p50"] <= search["latency_ms"]["p99"]
+    # Guest sign-ins landed in the stand-in
+    assert client[settings.DB_NAME]["users"].docs
+
+    assert compare(report, report)[0].endswith("throughput +0.0%  p95 +0.0%")
@@ -0,0 +1,105 @@
+import copy
+import pytest
+from fakes import LA, FakeDatabase, make_restaurant
+from geo_index import GeoIndex
+from import_restaurants import Progress, menu_item_docs, rebuild_menu_items
+from menu_items import (
+    MENU_ITEMS_COLLECTION,
+    MENU_ITEMS_INDEX,
+    iter_search_normalized,
+    menu_item_query,
+    search_normalized,
+    split_fields,
+)
+from search import PROFILES, miles_to_meters, take_page
+
+def make_restaurants(count=12):
+    restaurants = []
+    for i in range(count):
+        calories = [50 * (i + j) % 700 for j in range(i % 5)]
+        restaurant = make_restaurant(f"Restaurant {i}", LA[0], LA[1] + (i % 4) * 0.002, *calories,
+                                     restaurant_id=f"r{i}", chain_name="Chain")
+        for j, item in enumerate(restaurant["menu_items"]):
+            item.update(menu_item_id=f"r{i}-{j}", restaurant_id=f"r{i}")
+        restaurants.append(restaurant)
+    return restaurants
+
+
+async def make_database(restaurants):
+    # menu_items as every import builds them, stored in reverse so the
+    # search has to put menus back in order
+    database = FakeDatabase(copy.deepcopy(restaurants))
+    await rebuild_menu_items(database)
+    database[MENU_ITEMS_COLLECTION].docs.reverse()
+    return database
+
+
+def without_ids(docs):
+    return [{key: value for key, value in doc.items() if key != "_id"} for doc in docs]
+
+
+def reference(restaurants, *args, **kwargs):
+    # The embedded layout as served by the in-memory index
+    return without_ids(GeoIndex(copy.deepcopy(restaurants)).search(*args, **kwargs))
+
+
+def test_menu_item_query_uses_index_fields():
+    query = menu_item_query(["r1", "r2"], {"calories": (None, 300), "protein_g": (10, None)})
+    assert query == {
+        "restaurant_id": {"$in": ["r1", "r2"]},
+        "calories": {"$lte": 300},
+        "protein_g": {"$gte": 10},
+    }
+    assert [key for key, _ in MENU_ITEMS_INDEX][:2] == ["restaurant_id", "calories"]
+
+
+def test_split_fields():
+    assert split_fields(None) == (None, {"_id": 0})
+    restaurant, items = split_fields(("name", "menu_items.name"))
+    assert restaurant == ("name", "restaurant_id")
+    assert items == {"name": 1, "restaurant_id": 1, "position": 1, "calories": 1, "_id": 0}
+    assert split_fields(("name", "menu_items")) == (("name", "restaurant_id"), {"_id": 0})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ranges", [None, {"calories": (None, 300)}, {"calories": (100, None), "protein_g": (1, None)}])
+@pytest.mark.parametrize("fields", [None, PROFILES["card"]])
+@pytest.mark.parametrize("sort", ["distance", "lowest_calorie_item"])
+async def test_normalized_search_matches_embedded(ranges, fields, sort):
+    restaurants = make_restaurants()
+    database = await make_database(restaurants)
+    radius = miles_to_meters(5)
+
+    actual = await search_normalized(database["restaurants"], database[MENU_ITEMS_COLLECTION], *LA, radius, ranges,
+                                     fields, sort)
+
+    assert without_ids(actual) == reference(restaurants, *LA, radius, ranges, fields, sort)
+
+
+@pytest.mark.asyncio
+async def test_items_fetched_per_batch_and_only_until_caller_stops():
+    database = await make_database(make_restaurants(40))
+    items = database[MENU_ITEMS_COLLECTION]
+    results = iter_search_normalized(database["restaurants"], items, *LA, miles_to_meters(5), batch_size=10)
+
+    page, after = await take_page(results, 5)
+
+    assert len(page) == 5 and after is not None
+    assert items.finds == 1
+
+
+@pytest.mark.asyncio
+async def test_migration_flattens_menus_in_order():
+    restaurants = make_restaurants(4) + [{"name": "no id", "menu_items": [{"name": "x"}]}]
+
+    async def cursor():
+        for doc in restaurants:
+            yield doc
+
+    progress = Progress()
+    docs = [doc async for doc in menu_item_docs(cursor(), progress)]
+
+    assert [(doc["restaurant_id"], doc["position"]) for doc in docs] == [
+        ("r1", 0), ("r2", 0), ("r2", 1), ("r3", 0), ("r3", 1), ("r3", 2),
+    ]
+    assert (progress.read, progress.skipped) == (5, 1)
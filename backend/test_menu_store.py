@@ -0,0 +1,100 @@
+import random
+import numpy as np
+from menu_store import MenuStore
+from search import NUTRIENT_FIELDS, filter_menu_items, lowest_calories, nutrient_ranges
+
+
+def make_docs(count, seed=7):
+    rng = random.Random(seed)
+    docs = []
+    for r in range(count):
+        items = []
+        for i in range(rng.randint(0, 30)):
+            item = {"name": f"{r}-{i}"}
+            for field in NUTRIENT_FIELDS:
+                # Some items miss a nutrient entirely
+                if rng.random() > 0.05:
+                    item[field] = rng.randint(0, 900) if field == "calories" else rng.randint(0, 60)
+            items.append(item)
+        docs.append({"name": f"restaurant-{r}", "menu_items": items})
+    return docs
+
+
+def python_filter(docs, positions, ranges):
+    results = []
+    for position in positions:
+        doc = filter_menu_items(dict(docs[position]), ranges)
+        results.append(None if doc is None else [item["name"] for item in doc["menu_items"]])
+    return results
+
+
+def store_filter(store, docs, positions, ranges):
+    results = []
+    for position, items in zip(positions, store.filter(np.asarray(positions), ranges)):
+        menu_items = docs[position]["menu_items"]
+        results.append(None if items is None else [menu_items[i]["name"] for i in items])
+    return results
+
+
+def test_columns_are_laid_out_by_restaurant():
+    docs = [
+        {"menu_items": [{"calories": 100}, {"calories": 200, "fat_g": 3}]},
+        {"menu_items": []},
+        {},
+        {"menu_items": [{"calories": None}]},
+    ]
+    store = MenuStore(docs)
+
+    assert len(store) == 3
+    assert store.offsets.tolist() == [0, 2, 2, 2, 3]
+    assert store.columns["calories"][:2].tolist() == [100, 200]
+    assert np.isnan(store.columns["calories"][2])
+    assert np.isnan(store.columns["fat_g"][0])
+
+
+def test_item_rows_gathers_selected_restaurants():
+    store = MenuStore([
+        {"menu_items": [{}, {}]},
+        {"menu_items": [{}]},
+        {"menu_items": [{}, {}, {}]},
+    ])
+    rows, owners = store.item_rows(np.array([2, 0]))
+    assert rows.tolist() == [3, 4, 5, 0, 1]
+    assert owners.tolist() == [0, 0, 0, 1, 1]
+
+    rows, owners = store.item_rows(np.array([], dtype=np.int64))
+    assert len(rows) == 0 and len(owners) == 0
+
+
+def test_vectorized_filter_matches_python_filter():
+    docs = make_docs(300)
+    store = MenuStore(docs)
+    positions = list(range(0, 300, 3))
+
+    for ranges in [
+        nutrient_ranges(max_calories=300),
+        nutrient_ranges(min_calories=200, max_calories=500, min_protein_g=20),
+        nutrient_ranges(max_fat_g=10, max_carbs_g=30, max_sugar_g=5, min_protein_g=5),
+        nutrient_ranges(min_calories=2000),
+    ]:
+        assert store_filter(store, docs, positions, ranges) == python_filter(docs, positions, ranges)
+
+
+def test_filter_without_ranges_keeps_every_item():
+    docs = make_docs(5)
+    store = MenuStore(docs)
+    matched = store.filter(np.arange(5), {})
+    assert [len(items) for items in matched] == [len(doc["menu_items"]) for doc in docs]
+
+
+def test_lowest_matches_python_lowest_calories():
+    docs = make_docs(200)
+    store = MenuStore(docs)
+    positions = np.arange(0, 200, 2)
+
+    for ranges in [{}, nutrient_ranges(min_calories=300), nutrient_ranges(max_fat_g=10)]:
+        expected = []
+        for position in positions.tolist():
+            doc = filter_menu_items(dict(docs[position]), ranges)
+            expected.append(np.inf if doc is None else lowest_calories(doc))
+        assert store.lowest(positions, ranges).tolist() == expected
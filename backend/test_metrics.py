@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+import httpx
+import pytest
+import auth
+import main
+from config import get_settings
+from metrics import CommandMetrics, StatsCollector, command_collection, registry
+
+
+def sample(name, **labels):
+    return registry.get_sample_value(name, labels) or 0
+
+
+def command_event(request_id, command_name, command=None, **fields):
+    return SimpleNamespace(request_id=request_id, connection_id=("db.example", 27017),
+                           command_name=command_name, command=command, **fields)
+
+
+def test_command_collection():
+    assert command_collection("find", {"find": "restaurants", "filter": {}}) == "restaurants"
+    assert command_collection("aggregate", {"aggregate": "menu_items"}) == "menu_items"
+    assert command_collection("getMore", {"getMore": 12345, "collection": "restaurants"}) == "restaurants"
+    assert command_collection("ping", {"ping": 1}) == ""
+
+
+def test_command_durations_by_collection_and_operation():
+    listener = CommandMetrics()
+    labels = {"collection": "restaurants", "command": "aggregate"}
+    before = sample("mongodb_command_duration_seconds_count", status="ok", **labels)
+    failed_before = sample("mongodb_command_duration_seconds_count", status="error", **labels)
+
+    listener.started(command_event(1, "aggregate", {"aggregate": "restaurants"}))
+    listener.started(command_event(2, "aggregate", {"aggregate": "restaurants"}))
+    listener.succeeded(command_event(1, "aggregate", duration_micros=1500))
+    listener.failed(command_event(2, "aggregate", duration_micros=800))
+
+    assert sample("mongodb_command_duration_seconds_count", status="ok", **labels) == before + 1
+    assert sample("mongodb_command_duration_seconds_count", status="error", **labels) == failed_before + 1
+    assert listener._pending == {}
+
+
+def test_stats_collector_reports_hit_ratio():
+    stats = {"size": 3, "maxsize": 10, "hits": 3, "misses": 1, "hit_ratio": 0.75}
+    families = {family.name: family for family in StatsCollector({"example": lambda: stats}).collect()}
+
+    assert families["cache_hit_ratio"].samples[0].value == 0.75
+    assert families["cache_hits"].samples[0].value == 3
+    assert families["cache_misses"].samples[0].labels == {"cache": "example"}
+
+
+def test_auth_cache_lookups_are_counted():
+    token = auth.create_access_token({"sub": "metrics-user"})
+    before = auth.cache_stats()["tokens"]
+
+    auth.verify_access_token(token)
+    auth.verify_access_token(token)
+
+    after = auth.cache_stats()["tokens"]
+    assert (after["misses"], after["hits"]) == (before["misses"] + 1, before["hits"] + 1)
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_latency(monkeypatch):
+    monkeypatch.setattr(get_settings(), "METRICS_ENABLED", True)
+    app = main.create_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/livez")
+        await client.get("/no-such-route")
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/livez",status="200"}' in body
+    assert 'route="unmatched",status="404"' in body
+    assert 'cache_hit_ratio{cache="search"}' in body
+    # The scrape itself is still in flight while it renders
+    assert 'http_requests_in_flight{method="GET",route="/metrics"} 1.0' in body
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_is_off_by_default():
+    assert not get_settings().METRICS_ENABLED
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.get("/metrics")
+
+    assert response.status_code == 404
@@ -0,0 +1,35 @@
+from microbench import STAGES, make_docs, regressions, run
+
+
+def test_every_stage_runs_on_generated_docs():
+    results = run([20], repeat=1, menu_size=(2, 4))
+
+    assert results["calibration_seconds"] > 0
+    assert set(results["sizes"]["20"]) == set(STAGES)
+    for stats in results["sizes"]["20"].values():
+        assert stats["seconds"] >= 0 and stats["peak_kib"] >= 0
+
+
+def test_stages_do_not_touch_the_shared_docs():
+    docs = make_docs(10, menu_size=(2, 4))
+    before = [dict(doc) for doc in docs]
+    run_docs = {name: prepare(docs) for name, (prepare, _) in STAGES.items()}
+    for name, (_, stage) in STAGES.items():
+        stage(run_docs[name])
+    assert docs == before
+
+
+def test_regressions_against_baseline():
+    baseline = {"calibration_seconds": 0.1, "sizes": {"1000": {"render_json": {"seconds": 0.010, "peak_kib": 100.0}}}}
+
+    def results(seconds, peak_kib, calibration=0.1, size="1000"):
+        return {"calibration_seconds": calibration,
+                "sizes": {size: {"render_json": {"seconds": seconds, "peak_kib": peak_kib}}}}
+
+    assert regressions(results(0.014, 110.0), baseline) == []
+    found = regressions(results(0.020, 200.0), baseline)
+    assert len(found) == 2 and found[0].startswith("render_json @ 1000")
+    # Twice as slow on a machine that is twice as slow is fine
+    assert regressions(results(0.020, 100.0, calibration=0.2), baseline) == []
+    # Sizes or stages without a baseline are not checked
+    assert regressions(results(1.0, 1.0, size="10"), baseline) == []
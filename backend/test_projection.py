@@ -0,0 +1,96 @@
+import pytest
+from bson import ObjectId
+from geo_index import GeoIndex
+from search import (
+    PROFILES,
+    apply_projection,
+    build_search_pipeline,
+    miles_to_meters,
+    projection_spec,
+    resolve_fields,
+)
+from search_cache import render_json
+
+LA = (34.052235, -118.243683)
+
+RESTAURANT = {
+    "_id": "6560a1b2c3d4e5f601234567",
+    "restaurant_id": "abc123xyz",
+    "name": "McDonald's",
+    "address": "123 Main St, Anytown, USA",
+    "latitude": LA[0],
+    "longitude": LA[1],
+    "chain_name": "McDonald's",
+    "created_date": "2024-01-01T00:00:00Z",
+    "last_modified_date": "2024-01-01T00:00:00Z",
+    "location": {"type": "Point", "coordinates": [LA[1], LA[0]]},
+    "menu_items": [
+        {
+            "menu_item_id": "item1",
+            "restaurant_id": "abc123xyz",
+            "name": "Hamburger",
+            "description": "Classic beef patty.",
+            "calories": 250,
+            "fat_g": 9,
+            "carbs_g": 31,
+            "protein_g": 12,
+            "sugar_g": 6,
+            "created_date": "2024-01-01T00:00:00Z",
+            "last_modified_date": "2024-01-01T00:00:00Z",
+        },
+    ],
+}
+
+
+def test_resolve_fields():
+    assert resolve_fields() is None
+    assert resolve_fields("card") == PROFILES["card"]
+    assert resolve_fields("card", "name, menu_items.calories") == ("name", "menu_items.calories")
+    with pytest.raises(ValueError):
+        resolve_fields("tiny")
+    with pytest.raises(ValueError):
+        resolve_fields(fields="name,$where")
+
+
+def test_projection_spec_collapses_overlapping_paths():
+    assert projection_spec(("menu_items", "menu_items.name", "name")) == {"menu_items": 1, "name": 1}
+    assert projection_spec(("menu_items.name", "menu_items")) == {"menu_items": 1}
+
+
+def test_card_profile_keeps_only_card_fields():
+    card = apply_projection(RESTAURANT, PROFILES["card"])
+    assert card == {
+        "_id": "6560a1b2c3d4e5f601234567",
+        "restaurant_id": "abc123xyz",
+        "name": "McDonald's",
+        "chain_name": "McDonald's",
+        "menu_items": [{"menu_item_id": "item1", "name": "Hamburger", "calories": 250}],
+    }
+    assert len(render_json([card])) < len(render_json([RESTAURANT])) / 2
+
+
+def test_detail_profile_drops_bookkeeping_fields():
+    detail = apply_projection(RESTAURANT, PROFILES["detail"])
+    assert "location" not in detail and "created_date" not in detail
+    assert "description" in detail["menu_items"][0]
+    assert "last_modified_date" not in detail["menu_items"][0]
+
+
+def test_pipeline_projects_last():
+    pipeline = build_search_pipeline(*LA, miles_to_meters(5), {"calories": (None, 300)}, fields=("name",))
+    assert pipeline[-1] == {"$project": {"name": 1, "distance_miles": 1}}
+
+    pipeline = build_search_pipeline(*LA, miles_to_meters(5), keep_distance=True, fields=("name",))
+    assert pipeline[-1] == {"$project": {"name": 1, "distance_miles": 1, "_distance": 1}}
+
+
+def test_index_search_applies_projection():
+    doc = dict(RESTAURANT, _id=ObjectId())
+    index = GeoIndex([doc])
+    results = index.search(*LA, miles_to_meters(5), {"calories": (None, 300)}, PROFILES["card"])
+    assert set(results[0]) == {"_id", "restaurant_id", "name", "chain_name", "menu_items", "distance_miles"}
+
+
+def test_render_json_handles_bson_types():
+    oid = ObjectId()
+    assert render_json({"_id": oid}) == f'{{"_id":"{oid}"}}'.encode()
@@ -0,0 +1,121 @@
+import math
+import httpx
+import pytest
+import pytest_asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import main
+from fakes import LA, make_restaurant
+from geo_index import GeoIndex
+from search import EARTH_RADIUS_METERS, miles_to_meters
+
+
+def make_restaurants():
+    return [make_restaurant(f"Restaurant {i}", LA[0], LA[1] + i * 0.001, 100 * i, restaurant_id=f"r{i}")
+            for i in range(10)]
+
+
+@pytest_asyncio.fixture
+async def client():
+    # Serve search from the in-memory index; the Motor client is never used
+    index, db_client = main.search_index.index, main.db.client
+    main.search_index.index = GeoIndex(make_restaurants())
+    main.db.client = AsyncIOMotorClient(serverSelectionTimeoutMS=100)
+    main.search_cache.clear()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            yield client
+    finally:
+        main.db.client.close()
+        main.search_index.index, main.db.client = index, db_client
+
+
+@pytest.mark.asyncio
+async def test_batch_results_are_keyed_by_request_index(client):
+    queries = [
+        {"lat": LA[0], "lng": LA[1], "mileage": 5},
+        {"lat": LA[0], "lng": LA[1], "mileage": 5, "max_calories": 300},
+        {"lat": 40.0, "lng": -74.0, "mileage": 1},
+    ]
+    response = await client.post("/restaurants/search/batch", json={"queries": queries, "profile": "card"})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert list(results) == ["0", "1", "2"]
+    assert len(results["0"]) == 10
+    assert [r["restaurant_id"] for r in results["1"]] == ["r0", "r1", "r2", "r3"]
+    assert results["2"] == []
+
+    single = await client.get("/restaurants/search", params={**queries[1], "profile": "card"})
+    assert single.json() == results["1"]
+
+
+@pytest.mark.asyncio
+async def test_identical_queries_run_once(client, monkeypatch):
+    monkeypatch.setattr(main.settings, "SEARCH_CACHE_ENABLED", True)
+    query = {"lat": LA[0], "lng": LA[1], "max_calories": 500}
+    misses = main.search_cache.misses
+
+    response = await client.post("/restaurants/search/batch", json={"queries": [query] * 20})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 20
+    assert all(results[str(i)] == results["0"] for i in range(20))
+    assert main.search_cache.misses == misses + 1
+
+
+@pytest.mark.asyncio
+async def test_batch_limits(client, monkeypatch):
+    monkeypatch.setattr(main.settings, "SEARCH_BATCH_MAX_QUERIES", 2)
+    query = {"lat": LA[0], "lng": LA[1]}
+
+    too_many = await client.post("/restaurants/search/batch", json={"queries": [query] * 3})
+    empty = await client.post("/restaurants/search/batch", json={"queries": []})
+
+    assert too_many.status_code == 400
+    assert empty.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_top_k_by_lowest_calorie_item(client):
+    params = {"lat": LA[0], "lng": LA[1], "min_calories": 300, "limit": 3, "sort": "lowest_calorie_item"}
+    response = await client.get("/restaurants/search", params={**params, "profile": "card"})
+
+    assert response.status_code == 200
+    assert "x-next-cursor" not in response.headers
+    results = response.json()
+    assert [r["restaurant_id"] for r in results] == ["r3", "r4", "r5"]
+    assert all("distance_miles" in r for r in results)
+
+    nearest = await client.get("/restaurants/search", params={"lat": LA[0], "lng": LA[1], "limit": 2})
+    assert [r["distance_miles"] for r in nearest.json()] == sorted(r["distance_miles"] for r in nearest.json())
+    assert "x-next-cursor" in nearest.headers
+
+    with_cursor = await client.get("/restaurants/search", params={**params, "cursor": nearest.headers["x-next-cursor"]})
+    assert with_cursor.status_code == 400
+
+
+def east_of_la(miles):
+    # Longitude `miles` east (negative: west) of LA along its parallel
+    return LA[1] + math.degrees(miles_to_meters(miles) / (EARTH_RADIUS_METERS * math.cos(math.radians(LA[0]))))
+
+
+@pytest.mark.asyncio
+async def test_cached_search_measures_from_the_callers_point(client, monkeypatch):
+    # LA is east of its grid cell's centre: "inside" is farther than a mile
+    # from the centre and "outside" closer, only the caller's point decides
+    monkeypatch.setattr(main.settings, "SEARCH_CACHE_ENABLED", True)
+    monkeypatch.setattr(main.search_index, "index", GeoIndex([
+        make_restaurant("here", *LA, 100),
+        make_restaurant("inside", LA[0], east_of_la(0.99), 100),
+        make_restaurant("outside", LA[0], east_of_la(-1.01), 100),
+    ]))
+    params = {"lat": LA[0], "lng": LA[1], "mileage": 1}
+
+    cached = await client.get("/restaurants/search", params=params)
+    paged = await client.get("/restaurants/search", params={**params, "limit": 10})
+
+    assert main.search_cache.snap(*LA) != LA
+    assert cached.headers["x-cache"] == "MISS"
+    assert [(r["name"], r["distance_miles"]) for r in cached.json()] == [("here", 0.0), ("inside", 0.99)]
+    assert cached.json() == paged.json()
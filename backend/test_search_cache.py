@@ -0,0 +1,73 @@
+import time
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from search import distance_meters
+from search_cache import SearchCache, render_json
+
+
+def test_nearby_searches_share_a_cell():
+    cache = SearchCache(maxsize=10, ttl=60, grid_degrees=0.001)
+    assert cache.snap(34.052235, -118.243683) == (34.052, -118.244)
+    assert cache.snap(34.05241, -118.24372) == (34.052, -118.244)
+    assert cache.snap(34.0526, -118.243683) == (34.053, -118.244)
+
+
+def test_zero_grid_disables_snapping():
+    cache = SearchCache(maxsize=10, ttl=60, grid_degrees=0)
+    assert cache.snap(34.052235, -118.243683) == (34.052235, -118.243683)
+
+
+def test_reach_covers_the_whole_cell():
+    cache = SearchCache(maxsize=10, ttl=60, grid_degrees=0.001)
+    lat, lng = cache.snap(34.0524999, -118.2435001)
+    assert distance_meters(lat, lng, [-118.2435001, 34.0524999]) < cache.reach(lat, lng)
+    assert SearchCache(maxsize=10, ttl=60, grid_degrees=0).reach(lat, lng) == 0
+
+
+def test_hits_and_misses_are_counted():
+    cache = SearchCache(maxsize=10, ttl=60, grid_degrees=0.001)
+    key = cache.key(34.052, -118.244, 5, {"calories": (None, 300)})
+
+    assert cache.get(key) is None
+    cache.set(key, [])
+    assert cache.get(key) == []
+    assert cache.get(cache.key(34.052, -118.244, 10, {"calories": (None, 300)})) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 1)
+    assert stats["hit_ratio"] == 1 / 3
+
+
+def test_dataset_version_change_invalidates():
+    cache = SearchCache(maxsize=10, ttl=60, grid_degrees=0.001)
+    cache.set_version(1)
+    key = cache.key(34.052, -118.244, 5)
+    cache.set(key, [])
+
+    assert not cache.set_version(1)
+    assert cache.get(key) == []
+
+    assert cache.set_version(2)
+    assert cache.get(key) is None
+    assert cache.key(34.052, -118.244, 5) != key
+
+
+def test_entries_expire_and_least_recently_used_is_evicted():
+    cache = SearchCache(maxsize=2, ttl=60, grid_degrees=0.001)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+
+    cache = SearchCache(maxsize=2, ttl=0.05, grid_degrees=0.001)
+    cache.set("a", b"1")
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+
+def test_render_json_matches_default_response():
+    content = [{"_id": "abc", "name": "Café", "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc)}]
+    assert render_json(content) == JSONResponse(jsonable_encoder(content)).body
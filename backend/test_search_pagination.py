@@ -0,0 +1,228 @@
+import json
+import httpx
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+import main
+from fakes import LA, FakeCollection, FakeDatabase, make_restaurant
+from config import get_settings
+from geo_index import GeoIndex
+from search import (
+    build_search_pipeline,
+    decode_cursor,
+    encode_cursor,
+    iter_search,
+    miles_to_meters,
+    query_fingerprint,
+    take_page,
+)
+
+def make_restaurants(count=23):
+    # Groups of five restaurants share a location, so pages cut through ties
+    return [make_restaurant(f"r{i}", LA[0], LA[1] + (i % 5) * 0.001, 100 * i) for i in range(count)]
+
+
+def make_index(count=23):
+    return GeoIndex(make_restaurants(count))
+
+
+def expected_names(restaurants):
+    return [doc["name"] for doc in GeoIndex(restaurants).search(*LA, miles_to_meters(5))]
+
+
+async def as_async(pairs):
+    for pair in pairs:
+        yield pair
+
+
+@pytest.mark.parametrize("doc_id", [
+    ObjectId("6560a1b2c3d4e5f601234567"),
+    # Strings that would pass ObjectId.is_valid stay strings
+    "6560a1b2c3d4e5f601234567",
+    "restaurant01",
+    42,
+])
+def test_cursor_round_trip(doc_id):
+    fingerprint = query_fingerprint(*LA, miles_to_meters(5), {"calories": (None, 300)})
+    token = encode_cursor(1234.5678, doc_id, fingerprint)
+    distance, decoded = decode_cursor(token, fingerprint)
+    assert (distance, decoded) == (1234.5678, doc_id)
+    assert type(decoded) is type(doc_id)
+
+
+def test_cursor_rejects_other_search_and_garbage():
+    radius = miles_to_meters(5)
+    token = encode_cursor(10.0, "abc", query_fingerprint(*LA, radius))
+
+    with pytest.raises(ValueError):
+        decode_cursor(token, query_fingerprint(*LA, radius, {"calories": (None, 300)}))
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", query_fingerprint(*LA, radius))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit", [1, 4, 5, 7, 23, 50])
+async def test_pages_cover_every_result_once_in_order(limit):
+    index = make_index()
+    radius = miles_to_meters(5)
+    expected = [doc["name"] for doc in index.search(*LA, radius)]
+
+    seen = []
+    after = None
+    while True:
+        page, after = await take_page(as_async(index.iter_search(*LA, radius, after=after)), limit)
+        assert len(page) <= limit
+        seen.extend(doc["name"] for doc in page)
+        if after is None:
+            break
+
+    assert seen == expected
+
+
+@pytest.mark.asyncio
+async def test_pages_with_nutrient_filter():
+    index = make_index()
+    radius = miles_to_meters(5)
+    ranges = {"calories": (None, 1000)}
+
+    first, after = await take_page(as_async(index.iter_search(*LA, radius, ranges)), 6)
+    rest, end = await take_page(as_async(index.iter_search(*LA, radius, ranges, after)), 6)
+
+    assert len(first) == 6 and len(rest) == 5 and end is None
+    assert all(doc["menu_items"][0]["calories"] <= 1000 for doc in first + rest)
+
+
+def test_pipeline_resumes_strictly_after_the_cursor():
+    doc_id = ObjectId()
+    pipeline = build_search_pipeline(*LA, miles_to_meters(5), after=(120.5, doc_id), keep_distance=True)
+
+    # The index scan starts at the cursor's distance, ties are broken by _id
+    assert pipeline[0]["$geoNear"]["minDistance"] == 120.5
+    assert pipeline[1] == {"$match": {"$or": [
+        {"_distance": {"$gt": 120.5}},
+        {"_distance": 120.5, "_id": {"$gt": doc_id}},
+    ]}}
+
+
+@pytest.mark.asyncio
+async def test_mongo_results_order_distance_ties_by_id():
+    restaurants = make_restaurants(10)
+    # $geoNear leaves ties in whatever order it finds them
+    collection = FakeCollection(reversed(restaurants))
+
+    pairs = [pair async for pair in iter_search(collection, *LA, miles_to_meters(5))]
+
+    assert [doc["name"] for _, doc in pairs] == expected_names(restaurants)
+    assert [(distance, doc["_id"]) for distance, doc in pairs] == sorted((d, doc["_id"]) for d, doc in pairs)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit", [1, 4, 5, 7, 23])
+async def test_mongo_pages_cover_every_result_once(limit):
+    restaurants = make_restaurants()
+    collection = FakeCollection(reversed(restaurants))
+    radius = miles_to_meters(5)
+
+    seen = []
+    after = None
+    while True:
+        page, after = await take_page(iter_search(collection, *LA, radius, after=after, batch_size=limit + 1), limit)
+        seen.extend(doc["name"] for doc in page)
+        if after is None:
+            break
+
+    assert seen == expected_names(restaurants)
+
+
+@pytest.mark.asyncio
+async def test_mongo_pages_resume_from_twelve_character_string_ids():
+    # 12 characters: ObjectId.is_valid accepts these, Mongo must not see ObjectIds
+    restaurants = [dict(doc, _id=f"restaurant{i:02d}") for i, doc in enumerate(make_restaurants())]
+    collection = FakeCollection(reversed(restaurants))
+    radius = miles_to_meters(5)
+    fingerprint = query_fingerprint(*LA, radius)
+
+    seen = []
+    after = None
+    while True:
+        page, after = await take_page(iter_search(collection, *LA, radius, after=after), 4)
+        seen.extend(doc["name"] for doc in page)
+        if after is None:
+            break
+        after = decode_cursor(encode_cursor(*after, fingerprint), fingerprint)
+        assert isinstance(after[1], str)
+
+    assert seen == expected_names(restaurants)
+
+
+@pytest_asyncio.fixture(params=["memory", "mongo"])
+async def client(request, monkeypatch):
+    # The same restaurants served by the in-process index or by $geoNear
+    restaurants = make_restaurants()
+    database = FakeDatabase([dict(doc) for doc in reversed(restaurants)], version=None)
+    monkeypatch.setattr(main.db, "client", {get_settings().DB_NAME: database})
+    index = GeoIndex(restaurants) if request.param == "memory" else None
+    monkeypatch.setattr(main.search_index, "index", index)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        client.expected = expected_names(restaurants)
+        yield client
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit", [1, 5, 7])
+async def test_next_cursor_header_walks_every_page(client, limit):
+    params = {"lat": LA[0], "lng": LA[1], "limit": limit}
+    seen = []
+    pages = 0
+    while True:
+        response = await client.get("/restaurants/search", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= limit
+        seen.extend(doc["name"] for doc in page)
+        pages += 1
+        if "x-next-cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["x-next-cursor"]
+
+    assert seen == client.expected
+    assert pages == -(-len(client.expected) // limit)
+
+
+@pytest.mark.asyncio
+async def test_page_size_cap_is_read_per_request(client, monkeypatch):
+    monkeypatch.setattr(main.settings, "SEARCH_MAX_PAGE_SIZE", 5)
+    params = {"lat": LA[0], "lng": LA[1]}
+
+    capped = await client.get("/restaurants/search", params={**params, "limit": 5})
+    too_large = await client.get("/restaurants/search", params={**params, "limit": 6})
+
+    assert capped.status_code == 200 and len(capped.json()) == 5
+    assert too_large.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_pages_with_next_cursor_line(client):
+    params = {"lat": LA[0], "lng": LA[1], "stream": "true", "limit": 7}
+    seen = []
+    while True:
+        response = await client.get("/restaurants/search", params=params)
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        if "next_cursor" not in lines[-1]:
+            seen.extend(doc["name"] for doc in lines)
+            break
+        assert len(lines) == 8
+        seen.extend(doc["name"] for doc in lines[:-1])
+        params["cursor"] = lines[-1]["next_cursor"]
+
+    assert seen == client.expected
+    assert len(set(seen)) == len(seen)
+
+
+@pytest.mark.asyncio
+async def test_unlimited_stream_has_no_cursor_line(client):
+    response = await client.get("/restaurants/search", params={"lat": LA[0], "lng": LA[1], "stream": "true"})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [doc["name"] for doc in lines] == client.expected
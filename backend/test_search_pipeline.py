@@ -0,0 +1,123 @@
+import os
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from fakes import LA, make_restaurant
+from search import (
+    build_search_pipeline,
+    filter_menu_items,
+    miles_to_meters,
+    nutrient_ranges,
+    search_with_aggregation,
+    search_with_find,
+)
+
+# Load environment variables
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+DB_NAME = os.getenv("DB_NAME")
+
+def test_filter_menu_items_keeps_only_matching_items():
+    doc = filter_menu_items(make_restaurant("Test", *LA, 250, 550, None, 300), {"calories": (None, 300)})
+    assert [item["calories"] for item in doc["menu_items"]] == [250, 300]
+
+
+def test_filter_menu_items_drops_restaurant_without_matches():
+    ranges = {"calories": (None, 300)}
+    assert filter_menu_items(make_restaurant("Test", *LA, 550, None), ranges) is None
+    assert filter_menu_items({"name": "No menu"}, ranges) is None
+
+
+def test_filter_menu_items_without_limit_is_passthrough():
+    doc = make_restaurant("Test", *LA, 900)
+    assert filter_menu_items(doc, None) is doc
+    assert filter_menu_items(doc, {}) is doc
+
+
+def test_filter_menu_items_requires_one_item_to_match_every_range():
+    doc = {
+        "name": "Test",
+        "menu_items": [
+            {"name": "salad", "calories": 200, "protein_g": 5},
+            {"name": "chicken", "calories": 450, "protein_g": 40},
+            {"name": "bowl", "calories": 380, "protein_g": 30},
+        ],
+    }
+    ranges = nutrient_ranges(max_calories=400, min_protein_g=20)
+    assert [item["name"] for item in filter_menu_items(doc, ranges)["menu_items"]] == ["bowl"]
+
+
+def test_nutrient_ranges_skips_unbounded_fields():
+    assert nutrient_ranges() == {}
+    assert nutrient_ranges(max_calories=300, min_protein_g=10, max_sugar_g=None) == {
+        "calories": (None, 300),
+        "protein_g": (10, None),
+    }
+
+
+def test_pipeline_without_calorie_filter_only_geo():
+    pipeline = build_search_pipeline(*LA, miles_to_meters(5))
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages == ["$geoNear", "$set", "$unset"]
+    assert pipeline[0]["$geoNear"]["near"]["coordinates"] == [LA[1], LA[0]]
+    assert "query" not in pipeline[0]["$geoNear"]
+
+
+def test_pipeline_with_calorie_filter_filters_server_side():
+    ranges = nutrient_ranges(max_calories=300, min_protein_g=10)
+    pipeline = build_search_pipeline(*LA, miles_to_meters(5), ranges)
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages == ["$geoNear", "$set", "$match", "$set", "$unset"]
+    assert pipeline[0]["$geoNear"]["query"] == {
+        "menu_items": {"$elemMatch": {"calories": {"$lte": 300}, "protein_g": {"$gte": 10}}}
+    }
+    cond = pipeline[1]["$set"]["menu_items"]["$filter"]["cond"]
+    assert {"$lte": ["$$item.calories", 300]} in cond["$and"]
+    assert {"$gte": ["$$item.protein_g", 10]} in cond["$and"]
+
+
+def test_pipeline_lowest_calorie_sort_keeps_top_k():
+    pipeline = build_search_pipeline(*LA, miles_to_meters(5), sort="lowest_calorie_item", limit=10)
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages == ["$geoNear", "$set", "$set", "$sort", "$limit", "$unset"]
+    assert pipeline[3]["$sort"] == {"_lowest_calories": 1, "_distance": 1, "_id": 1}
+    assert pipeline[4]["$limit"] == 10
+    assert pipeline[-1]["$unset"] == ["_distance", "_lowest_calories"]
+
+    # Distance order is cut by the caller, never by $limit
+    pipeline = build_search_pipeline(*LA, miles_to_meters(5), limit=10)
+    assert "$limit" not in [next(iter(stage)) for stage in pipeline]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ranges", [
+    None,
+    {"calories": (None, 150)},
+    {"calories": (None, 300)},
+    {"calories": (None, 600)},
+    {"calories": (200, 400), "protein_g": (10, None)},
+])
+async def test_aggregation_matches_python_filter(ranges):
+    # Compares both search paths against the seeded database (run seed_db.py first)
+    if not MONGODB_URI:
+        pytest.skip("MONGODB_URI not found in .env")
+
+    client = AsyncIOMotorClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+    try:
+        try:
+            await client.admin.command('ping')
+        except Exception as e:
+            pytest.skip(f"MongoDB not reachable: {e}")
+
+        collection = client[DB_NAME]["restaurants"]
+        radius = miles_to_meters(5)
+        expected = await search_with_find(collection, *LA, radius, ranges)
+        actual = await search_with_aggregation(collection, *LA, radius, ranges)
+
+        # Python and Mongo haversines may disagree in the last rounded digit
+        for e, a in zip(sorted(expected, key=lambda d: d["_id"]), sorted(actual, key=lambda d: d["_id"])):
+            assert a.pop("distance_miles") == pytest.approx(e.pop("distance_miles"), abs=0.002)
+        assert sorted(actual, key=lambda d: d["_id"]) == sorted(expected, key=lambda d: d["_id"])
+    finally:
+        client.close()
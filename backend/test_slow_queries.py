@@ -0,0 +1,212 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+from fakes import LA, FakeDatabase, make_restaurant
+from config import get_settings
+from geo_index import GeoIndex
+from search import miles_to_meters
+import main
+from profiling import ProfilingMiddleware
+from slow_queries import SlowQueryLog, summarize_explain
+
+# Trimmed explain("executionStats") replies
+FIND_EXPLAIN = {
+    "queryPlanner": {
+        "winningPlan": {
+            "stage": "FETCH",
+            "inputStage": {"stage": "GEO_NEAR_2DSPHERE", "indexName": "location_2dsphere"},
+        },
+    },
+    "executionStats": {"nReturned": 12, "executionTimeMillis": 40, "totalKeysExamined": 180, "totalDocsExamined": 95},
+}
+# explain() of a $geoNear pipeline: the plan sits in the $geoNearCursor stage
+GEO_NEAR_EXPLAIN = {
+    "explainVersion": "1",
+    "stages": [
+        {
+            "$geoNearCursor": {
+                "queryPlanner": {
+                    "namespace": "golden_starfish.restaurants",
+                    "winningPlan": {
+                        "stage": "GEO_NEAR_2DSPHERE",
+                        "keyPattern": {"location": "2dsphere"},
+                        "indexName": "location_2dsphere",
+                        "inputStages": [
+                            {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "location_2dsphere"}},
+                            {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "location_2dsphere"}},
+                        ],
+                    },
+                    "rejectedPlans": [],
+                },
+                "executionStats": {"executionSuccess": True, "nReturned": 30, "executionTimeMillis": 310,
+                                   "totalKeysExamined": 4200, "totalDocsExamined": 3900},
+            },
+            "nReturned": 30,
+            "executionTimeMillisEstimate": 305,
+        },
+        {"$addFields": {"distance_miles": {"$round": [{"$divide": ["$_distance", {"$const": 1609.344}]}, 3]}},
+         "nReturned": 30, "executionTimeMillisEstimate": 305},
+        {"$project": {"_distance": False, "_id": True}, "nReturned": 30, "executionTimeMillisEstimate": 305},
+    ],
+    "ok": 1.0,
+}
+
+
+def test_summarize_explain():
+    assert summarize_explain(FIND_EXPLAIN) == {
+        "indexes": ["location_2dsphere"],
+        "stages": ["FETCH", "GEO_NEAR_2DSPHERE"],
+        "collection_scan": False,
+        "keys_examined": 180,
+        "docs_examined": 95,
+        "returned": 12,
+        "execution_ms": 40,
+    }
+    assert summarize_explain(GEO_NEAR_EXPLAIN) == {
+        "indexes": ["location_2dsphere"],
+        "stages": ["GEO_NEAR_2DSPHERE", "FETCH", "IXSCAN", "FETCH", "IXSCAN"],
+        "collection_scan": False,
+        "keys_examined": 4200,
+        "docs_examined": 3900,
+        "returned": 30,
+        "execution_ms": 310,
+    }
+
+
+@pytest.mark.asyncio
+async def test_slow_searches_are_explained_in_a_bounded_ring():
+    log = SlowQueryLog(threshold_ms=100, maxsize=2)
+    database = FakeDatabase(explain=FIND_EXPLAIN)
+    command = {"find": "restaurants", "filter": {}}
+    assert not log.is_slow(99) and log.is_slow(100)
+
+    entry = log.record(150, {"backend": "near"}, {"lat": 1, "lng": 2}, database, command)
+    await log._task
+    assert entry["explain"]["indexes"] == ["location_2dsphere"]
+    assert database.commands == [{"explain": command, "verbosity": "executionStats"}]
+
+    log.record(200, {"backend": "memory"}, {})
+    log.record(300, {"backend": "geoNear"}, {}, FakeDatabase(), command)
+    await log._task
+    entries = log.entries()
+    assert [entry["elapsed_ms"] for entry in entries] == [300, 200]
+    assert entries[0]["explain"] == {"error": "explain not allowed"}
+    assert entries[1]["explain"] is None
+
+
+@pytest.mark.asyncio
+async def test_one_explain_at_a_time():
+    log = SlowQueryLog(threshold_ms=1)
+    database = FakeDatabase(explain=FIND_EXPLAIN, delay=0.05)
+
+    first = log.record(5, {}, {}, database, {"find": "restaurants"})
+    second = log.record(5, {}, {}, database, {"find": "restaurants"})
+    await log.stop()
+
+    assert first["explain"] is None
+    assert second["explain"] == {"skipped": "another explain is running"}
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoint_requires_token(monkeypatch):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        monkeypatch.setattr(main.settings, "ADMIN_TOKEN", None)
+        assert (await client.get("/admin/slow-queries")).status_code == 404
+
+        monkeypatch.setattr(main.settings, "ADMIN_TOKEN", "s3cret")
+        assert (await client.get("/admin/slow-queries", headers={"X-Admin-Token": "nope"})).status_code == 403
+        response = await client.get("/admin/slow-queries", headers={"X-Admin-Token": "s3cret"})
+
+    assert response.status_code == 200
+    assert response.json()["threshold_ms"] == main.slow_queries.threshold_ms
+
+
+@pytest.mark.asyncio
+async def test_profiling_header_returns_report():
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        return {"total": sum(range(1000))}
+
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(app, admin_token="secret"))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        plain = await client.get("/work")
+        anonymous = await client.get("/work", headers={"X-Profile": "1"})
+        wrong_token = await client.get("/work", headers={"X-Profile": "1", "X-Admin-Token": "guess"})
+        profiled = await client.get("/work", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+
+    assert plain.json() == anonymous.json() == wrong_token.json() == {"total": 499500}
+    assert profiled.headers["x-profiled-status"] == "200"
+    assert profiled.headers["content-type"].startswith("text/plain")
+    assert "cumulative" in profiled.text and "function calls" in profiled.text
+
+
+@pytest.mark.asyncio
+async def test_profiling_header_is_ignored_without_admin_token():
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        return {"total": 1}
+
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(app, admin_token=None))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/work", headers={"X-Profile": "1", "X-Admin-Token": ""})
+
+    assert response.json() == {"total": 1}
+    assert "x-profiled-status" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_slow_search_is_logged(monkeypatch):
+    # In-memory index, so there is no Mongo command to explain
+    monkeypatch.setattr(main.search_index, "index", GeoIndex([]))
+    monkeypatch.setattr(main.db, "client", AsyncIOMotorClient(serverSelectionTimeoutMS=100))
+    monkeypatch.setattr(main.slow_queries, "threshold_ms", 0.001)
+    main.search_cache.clear()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.get("/restaurants/search", params={"lat": 34.05, "lng": -118.24, "max_calories": 500,
+                                                                   "limit": 5, "profile": "card"})
+
+    main.db.client.close()
+    assert response.status_code == 200
+    entry = main.slow_queries.entries()[0]
+    assert entry["shape"] == {"backend": "memory", "filters": ["calories"], "sort": "distance", "paged": True,
+                              "stream": False, "projected": True}
+    assert entry["params"]["limit"] == 5 and entry["explain"] is None
+
+
+@pytest.mark.asyncio
+async def test_slow_cached_search_explains_the_snapped_query(monkeypatch):
+    # A cache miss searches from the grid cell, so that is what gets explained
+    database = FakeDatabase([make_restaurant("near", *LA, 300)], version=None)
+    monkeypatch.setattr(main.db, "client", {get_settings().DB_NAME: database})
+    monkeypatch.setattr(main.search_index, "index", None)
+    monkeypatch.setattr(main.settings, "SEARCH_CACHE_ENABLED", True)
+    monkeypatch.setattr(main.settings, "SEARCH_MENU_LAYOUT", "embedded")
+    monkeypatch.setattr(main.settings, "SEARCH_USE_AGGREGATION", True)
+    monkeypatch.setattr(main.slow_queries, "threshold_ms", 0.001)
+    monkeypatch.setattr(main.slow_queries, "explain", False)
+    recorded = []
+    record = main.slow_queries.record
+    monkeypatch.setattr(main.slow_queries, "record", lambda *args: recorded.append(args) or record(*args))
+    main.search_cache.clear()
+
+    lat, lng = LA[0] + 0.0003, LA[1] - 0.0004
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.get("/restaurants/search", params={"lat": lat, "lng": lng})
+
+    assert response.headers["x-cache"] == "MISS"
+    snapped = main.search_cache.snap(lat, lng)
+    assert snapped != (lat, lng)
+    _, shape, params, _, command = recorded[0]
+    searched = database["restaurants"].pipelines[0][0]["$geoNear"]["near"]["coordinates"]
+    assert command["pipeline"][0]["$geoNear"]["near"]["coordinates"] == searched == [snapped[1], snapped[0]]
+    # Widened so the cell's candidates cover every point in the cell
+    widened = database["restaurants"].pipelines[0][0]["$geoNear"]["maxDistance"]
+    assert command["pipeline"][0]["$geoNear"]["maxDistance"] == widened
+    assert widened == miles_to_meters(5) + main.search_cache.reach(*snapped)
+    assert (params["lat"], params["lng"]) == snapped and shape["backend"] == "geoNear"
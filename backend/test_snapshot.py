@@ -0,0 +1,102 @@
+import importlib.util
+import sys
+from types import SimpleNamespace
+import pytest
+from geo_index import GeoIndex
+from fakes import LA, FakeDatabase, make_restaurant
+from index_manager import GeoIndexManager
+from search import miles_to_meters
+from snapshot import Snapshot, write_snapshot
+
+def make_restaurants():
+    return [
+        make_restaurant("far", 34.20, -118.243683, 200),
+        make_restaurant("here", *LA, 250, 550),
+        make_restaurant("near", 34.07, -118.243683, 700, 120),
+        make_restaurant("nowhere", 40.0, -74.0, 100),
+        make_restaurant("empty menu", 34.06, -118.243683),
+    ]
+
+
+def test_mapped_snapshot_answers_like_the_in_memory_index(tmp_path):
+    path = str(tmp_path / "restaurants.snapshot")
+    index = GeoIndex(make_restaurants(), version=4)
+    write_snapshot(path, index)
+
+    snapshot = Snapshot(path)
+    mapped = snapshot.to_index()
+    assert mapped.version == 4
+    assert len(mapped) == len(index)
+    # Shared pages are never written to
+    assert not mapped.lats.flags.writeable
+    assert not mapped.menus.columns["calories"].flags.writeable
+
+    for ranges in (None, {"calories": (None, 300)}, {"protein_g": (10, None)}):
+        for sort in ("distance", "lowest_calorie_item"):
+            args = (*LA, miles_to_meters(50), ranges)
+            assert mapped.search(*args, sort=sort) == index.search(*args, sort=sort)
+    assert mapped.search(*LA, miles_to_meters(5), fields=("name",)) == index.search(*LA, miles_to_meters(5),
+                                                                                     fields=("name",))
+    assert [doc["name"] for doc in mapped.docs] == [doc["name"] for doc in index.docs]
+    assert mapped.docs[-1]["name"] == "empty menu"
+
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "empty.snapshot")
+    write_snapshot(path, GeoIndex([]))
+    mapped = Snapshot(path).to_index()
+    assert len(mapped) == 0
+    assert mapped.search(*LA, miles_to_meters(5)) == []
+
+
+def test_rewrite_swaps_without_disturbing_mapped_readers(tmp_path):
+    path = str(tmp_path / "restaurants.snapshot")
+    write_snapshot(path, GeoIndex(make_restaurants(), version=1))
+    old = Snapshot(path).to_index()
+
+    write_snapshot(path, GeoIndex(make_restaurants()[:2], version=2))
+    new = Snapshot(path).to_index()
+
+    assert (old.version, len(old)) == (1, 5)
+    assert (new.version, len(new)) == (2, 2)
+    assert [r["name"] for r in old.search(*LA, miles_to_meters(5))] == ["here", "empty menu", "near"]
+    assert list(tmp_path.iterdir()) == [tmp_path / "restaurants.snapshot"]
+
+
+@pytest.mark.asyncio
+async def test_workers_share_one_snapshot(tmp_path):
+    path = str(tmp_path / "restaurants.snapshot")
+    database = FakeDatabase(make_restaurants(), version=7)
+    first, second = GeoIndexManager(path), GeoIndexManager(path)
+
+    await first.refresh(database, force=True)
+    await second.refresh(database, force=True)
+    # The second worker mapped what the first wrote
+    assert database["restaurants"].finds == 1
+    assert first.index.version == second.index.version == 7
+    assert not second.index.lats.flags.owndata
+
+    assert not await second.refresh(database)
+
+    database["meta"].docs[0]["version"] = 8
+    database["restaurants"].docs.pop()
+    assert await first.refresh(database)
+    assert await second.refresh(database)
+    assert database["restaurants"].finds == 2
+    assert len(first.index) == len(second.index) == 4
+
+
+@pytest.mark.asyncio
+async def test_snapshot_lock_without_fcntl(tmp_path, monkeypatch):
+    # Windows has no fcntl: the module still imports and locks via msvcrt
+    calls = []
+    msvcrt = SimpleNamespace(LK_LOCK=1, LK_UNLCK=0, locking=lambda fd, mode, size: calls.append(mode))
+    monkeypatch.setitem(sys.modules, "fcntl", None)
+    monkeypatch.setitem(sys.modules, "msvcrt", msvcrt)
+    spec = importlib.util.spec_from_file_location("snapshot_windows", sys.modules["snapshot"].__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    async with module.snapshot_lock(str(tmp_path / "restaurants.snapshot")):
+        assert calls == [msvcrt.LK_LOCK]
+    assert calls == [msvcrt.LK_LOCK, msvcrt.LK_UNLCK]
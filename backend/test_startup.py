@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+# Cold start budgets; they leave headroom over a typical run here
+# (~0.6 s of imports, under a second to the first response)
+IMPORT_BUDGET_MS = 1500
+FIRST_REQUEST_BUDGET_MS = 3000
+
+# Only loaded by the requests that need them
+DEFERRED_MODULES = ("jose", "httpx", "numpy", "motor")
+
+FIRST_REQUEST = """
+import asyncio, json, sys
+import main
+
+async def first_request():
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/livez", "raw_path": b"/livez", "query_string": b"",
+             "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80)}
+    await main.app(scope, receive, send)
+    return messages[0]["status"]
+
+status = asyncio.run(first_request())
+print(json.dumps({"status": status, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (DEFERRED_MODULES,)
+
+
+def run_python(*args, env=None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=BACKEND, capture_output=True, text=True, check=True, env=env)
+
+
+def import_time_ms(stderr: str) -> float:
+    # -X importtime lines: "import time: self [us] | cumulative | name", nested
+    # imports are indented; top-level entries add up to the total
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total / 1000
+
+
+def test_import_time_budget():
+    result = run_python("-X", "importtime", "-c", "import main; main.app")
+    total = import_time_ms(result.stderr)
+    print(f"import main + create_app: {total:.0f} ms")
+    assert total < IMPORT_BUDGET_MS, f"imports took {total:.0f} ms, budget {IMPORT_BUDGET_MS} ms"
+
+
+def test_time_to_first_request():
+    started = time.perf_counter()
+    result = run_python("-c", FIRST_REQUEST)
+    elapsed = (time.perf_counter() - started) * 1000
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    print(f"process launch to first response: {elapsed:.0f} ms")
+
+    assert report["status"] == 200
+    assert report["loaded"] == [], "heavy modules loaded before any request needed them"
+    assert elapsed < FIRST_REQUEST_BUDGET_MS, f"first response after {elapsed:.0f} ms, budget {FIRST_REQUEST_BUDGET_MS} ms"
+
+
+def test_import_reads_no_settings():
+    # No MONGODB_URI, SECRET_KEY, ...: Settings() would fail validation. The
+    # routers are imported too, as create_app() does
+    env = {key: value for key, value in os.environ.items() if key in ("PATH", "SYSTEMROOT", "PYTHONPATH")}
+    result = run_python("-c", "import config, main, auth_routes, search_routes; "
+                              "print(config.get_settings.cache_info().currsize)", env=env)
+    assert result.stdout.strip() == "0"
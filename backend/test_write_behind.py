@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from fakes import FakeCollection
+from write_behind import WriteBehindBuffer
+
+
+@pytest.mark.asyncio
+async def test_flushes_full_batches_and_drains_on_stop():
+    collection = FakeCollection(name="users")
+    buffer = WriteBehindBuffer(batch_size=10, flush_interval=5)
+    buffer.start(collection)
+
+    for i in range(25):
+        await buffer.put({"user_id": f"guest-{i}"})
+    await buffer.stop()
+
+    assert collection.batches == [10, 10, 5]
+    assert [doc["user_id"] for doc in collection.docs] == [f"guest-{i}" for i in range(25)]
+    assert buffer.stats() == {"pending": 0, "flushed": 25, "failed": 0, "batches": 3}
+
+
+@pytest.mark.asyncio
+async def test_flushes_partial_batch_after_interval():
+    collection = FakeCollection(name="users")
+    buffer = WriteBehindBuffer(batch_size=100, flush_interval=0.02)
+    buffer.start(collection)
+
+    await buffer.put({"user_id": "guest"})
+    await asyncio.sleep(0.1)
+    assert len(collection.docs) == 1
+
+    await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure():
+    collection = FakeCollection(name="users", delay=0.5)
+    buffer = WriteBehindBuffer(maxsize=2, batch_size=1, flush_interval=0, enqueue_timeout=0.05)
+    buffer.start(collection)
+
+    with pytest.raises(asyncio.TimeoutError):
+        for i in range(10):
+            await buffer.put({"user_id": f"guest-{i}"})
+
+    await buffer.stop()
+    assert buffer.failed == 0
+    assert len(collection.docs) == buffer.flushed
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_and_duplicates_counted():
+    collection = FakeCollection(name="users", fail_inserts=1, reject={"guest-1"})
+    buffer = WriteBehindBuffer(batch_size=3, flush_interval=5)
+    buffer.start(collection)
+
+    for i in range(3):
+        await buffer.put({"user_id": f"guest-{i}"})
+    await buffer.stop()
+
+    assert [doc["user_id"] for doc in collection.docs] == ["guest-0", "guest-2"]
+    assert (buffer.flushed, buffer.failed) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_put_requires_running_buffer():
+    with pytest.raises(RuntimeError):
+        await WriteBehindBuffer().put({"user_id": "guest"})
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Optional
+from pymongo.errors import BulkWriteError
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    """Bounded queue of documents flushed to a collection in batches.
+
+    A background task drains the queue with unordered insert_many, flushing
+    once `batch_size` documents are waiting or `flush_interval` seconds
+    after the first one arrived. `put` blocks for at most `enqueue_timeout`
+    seconds when the queue is full and then raises asyncio.TimeoutError, so
+    callers can shed load instead of queueing without limit.
+    """
+
+    def __init__(self, maxsize: int = 1000, batch_size: int = 100, flush_interval: float = 0.05,
+                 enqueue_timeout: float = 1.0, max_attempts: int = 3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._collection = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    def start(self, collection):
+        self._collection = collection
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, doc: dict):
+        if self._task is None:
+            raise RuntimeError("Write-behind buffer is not running")
+        await asyncio.wait_for(self._queue.put(doc), timeout=self.enqueue_timeout)
+
+    async def stop(self):
+        # Flush everything already accepted before shutting down
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _flush(self, batch: list):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._collection.insert_many(batch, ordered=False)
+                self.flushed += len(batch)
+                break
+            except BulkWriteError as e:
+                # Unordered: everything except the reported errors was written
+                errors = len(e.details.get("writeErrors", []))
+                self.flushed += len(batch) - errors
+                self.failed += errors
+                print(f"Write-behind flush: {errors} of {len(batch)} documents rejected")
+                break
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.failed += len(batch)
+                    print(f"Write-behind flush failed, dropped {len(batch)} documents: {e}")
+                    break
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        self.batches += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            doc = await self._queue.get()
+            if doc is _STOP:
+                break
+
+            batch = [doc]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    doc = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if doc is _STOP:
+                    stopping = True
+                    break
+                batch.append(doc)
+
+            await self._flush(batch)